@@ -0,0 +1,42 @@
+import os
+import threading
+import numpy as np
+from core.logging import llm_extractor_logger
+
+
+# -------------------- Config --------------------
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", 64))
+MAX_EMBED_CHARS = 4000  # the encoder truncates long inputs anyway; don't tokenize whole pages
+
+_encoder = None
+_encoder_pid = None
+_lock = threading.Lock()
+
+
+def get_encoder():
+    """The sentence-transformers encoder for this process, loaded on first use (and after a fork), CPU only."""
+    global _encoder, _encoder_pid
+    with _lock:
+        if _encoder is None or _encoder_pid != os.getpid():
+            # imported lazily: torch is heavy and most tasks never embed anything
+            from sentence_transformers import SentenceTransformer
+            _encoder = SentenceTransformer(EMBEDDING_MODEL, device="cpu")
+            _encoder_pid = os.getpid()
+            llm_extractor_logger.info(f"Loaded embedding model {EMBEDDING_MODEL}")
+    return _encoder
+
+
+def embed_texts(texts, batch_size=EMBEDDING_BATCH_SIZE):
+    """L2-normalized float32 embeddings, one row per text, so dot products are cosine similarities."""
+    texts = [(text or "")[:MAX_EMBED_CHARS] for text in texts]
+    if not texts:
+        return np.zeros((0, 0), dtype=np.float32)
+    embeddings = get_encoder().encode(
+        texts,
+        batch_size=batch_size,
+        normalize_embeddings=True,
+        convert_to_numpy=True,
+        show_progress_bar=False,
+    )
+    return np.asarray(embeddings, dtype=np.float32)
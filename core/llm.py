@@ -0,0 +1,176 @@
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from django.db import connections
+from openai import OpenAI, APIConnectionError, APIStatusError, APITimeoutError, RateLimitError
+from core.logging import llm_extractor_logger
+
+
+# -------------------- Config --------------------
+# Keep these at or below the account's rate limits for the models in use
+REQUESTS_PER_MINUTE = int(os.getenv("LLM_REQUESTS_PER_MINUTE", 60))
+TOKENS_PER_MINUTE = int(os.getenv("LLM_TOKENS_PER_MINUTE", 200000))
+MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", 8))  # calls in flight per worker process
+MAX_RETRIES = 6
+BACKOFF_BASE = 1.0     # seconds
+BACKOFF_CAP = 60.0
+
+
+def estimate_tokens(text):
+    """Rough LLM token count (about 4 characters per token for English text)."""
+    return (len(text) + 3) // 4
+
+
+class TokenBucket:
+    """Thread-safe token bucket refilled continuously at capacity per minute."""
+
+    def __init__(self, per_minute):
+        self.capacity = float(per_minute)
+        self.tokens = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self, amount=1):
+        # a single request larger than the bucket waits for a full bucket instead of forever
+        amount = min(amount, self.capacity)
+        while True:
+            with self.lock:
+                self._refill()
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return
+                wait = (amount - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class AdaptiveConcurrency:
+    """
+    AIMD limit on calls in flight: halved whenever the API throttles us,
+    raised by one after a streak of successful calls.
+    """
+
+    def __init__(self, maximum, minimum=1, increase_after=10):
+        self.maximum = maximum
+        self.minimum = minimum
+        self.limit = maximum
+        self.in_flight = 0
+        self.increase_after = increase_after
+        self.successes = 0
+        self.condition = threading.Condition()
+
+    def __enter__(self):
+        with self.condition:
+            while self.in_flight >= self.limit:
+                self.condition.wait()
+            self.in_flight += 1
+        return self
+
+    def __exit__(self, *exc):
+        with self.condition:
+            self.in_flight -= 1
+            self.condition.notify_all()
+
+    def throttled(self):
+        with self.condition:
+            self.successes = 0
+            new_limit = max(self.minimum, self.limit // 2)
+            if new_limit != self.limit:
+                llm_extractor_logger.warning(f"LLM throttled, concurrency {self.limit} -> {new_limit}")
+            self.limit = new_limit
+
+    def succeeded(self):
+        with self.condition:
+            self.successes += 1
+            if self.successes >= self.increase_after and self.limit < self.maximum:
+                self.successes = 0
+                self.limit += 1
+                self.condition.notify_all()
+
+
+request_bucket = TokenBucket(REQUESTS_PER_MINUTE)
+token_bucket = TokenBucket(TOKENS_PER_MINUTE)
+concurrency = AdaptiveConcurrency(MAX_CONCURRENCY)
+
+_client = None
+
+
+def get_client():
+    global _client
+    if _client is None:
+        # retries are handled here so they share the rate limiter and concurrency controller
+        _client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"), max_retries=0)
+    return _client
+
+
+def _is_retryable(error):
+    if isinstance(error, (RateLimitError, APIConnectionError, APITimeoutError)):
+        return True
+    return isinstance(error, APIStatusError) and error.status_code >= 500
+
+
+def _retry_delay(error, attempt):
+    response = getattr(error, "response", None)
+    retry_after = response.headers.get("retry-after") if response is not None else None
+    if retry_after:
+        try:
+            return float(retry_after)
+        except ValueError:
+            pass
+    # exponential backoff with full jitter
+    return random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt))
+
+
+def chat_completion(**kwargs):
+    """
+    client.chat.completions.create() behind the shared request/token buckets and
+    adaptive concurrency limit, retrying 429/5xx/connection errors with backoff.
+    """
+    prompt_tokens = sum(estimate_tokens(str(m.get("content", ""))) for m in kwargs.get("messages", []))
+    for attempt in range(MAX_RETRIES + 1):
+        request_bucket.acquire()
+        token_bucket.acquire(prompt_tokens)
+        try:
+            with concurrency:
+                response = get_client().chat.completions.create(**kwargs)
+        except Exception as e:
+            if not _is_retryable(e) or attempt == MAX_RETRIES:
+                raise
+            if isinstance(e, RateLimitError):
+                concurrency.throttled()
+            delay = _retry_delay(e, attempt)
+            llm_extractor_logger.warning(f"LLM call failed ({e.__class__.__name__}), retry {attempt + 1} in {delay:.1f}s")
+            time.sleep(delay)
+            continue
+        concurrency.succeeded()
+        return response
+
+
+def _run_in_thread(fn, item):
+    try:
+        return fn(item)
+    finally:
+        # worker threads get their own DB connection; don't leak it
+        connections.close_all()
+
+
+def run_concurrently(fn, items, max_workers=MAX_CONCURRENCY):
+    """Apply fn to every item on a bounded thread pool; results are returned in order."""
+    items = list(items)
+    if not items:
+        return []
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(items))) as pool:
+        return list(pool.map(lambda item: _run_in_thread(fn, item), items))
+
+
+def items_per_run(run_seconds, tokens_per_item):
+    """How many LLM items fit in run_seconds under the configured request and token budgets."""
+    per_minute = min(REQUESTS_PER_MINUTE, TOKENS_PER_MINUTE // max(tokens_per_item, 1))
+    return max(1, int(per_minute * run_seconds / 60))
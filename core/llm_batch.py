@@ -0,0 +1,97 @@
+import io
+import json
+import os
+from abc import ABC, abstractmethod
+from django.conf import settings
+from django.utils.module_loading import import_string
+from openai import OpenAI
+
+
+BATCH_ENDPOINT = "/v1/chat/completions"
+COMPLETION_WINDOW = "24h"
+
+
+def build_batch_request(custom_id, **body):
+    """One JSONL line of a chat-completions batch."""
+    return {"custom_id": custom_id, "method": "POST", "url": BATCH_ENDPOINT, "body": body}
+
+
+def to_jsonl(requests):
+    return "\n".join(json.dumps(request, ensure_ascii=False) for request in requests) + "\n"
+
+
+def parse_batch_output(text):
+    """
+    Map custom_id -> assistant message content from a batch output/error file.
+    Requests that failed map to None so callers can tell them from missing ones.
+    """
+    results = {}
+    for line in text.splitlines():
+        if not line.strip():
+            continue
+        record = json.loads(line)
+        response = record.get("response") or {}
+        content = None
+        if response.get("status_code") == 200:
+            choices = (response.get("body") or {}).get("choices") or []
+            if choices:
+                content = (choices[0].get("message") or {}).get("content")
+        results[record["custom_id"]] = content
+    return results
+
+
+class BatchBackend(ABC):
+    """
+    Submits a JSONL file of chat-completion requests and polls it.
+
+    submit() returns an opaque batch id. poll() returns (status, results):
+    status is "in_progress", "completed" or "failed", and results is
+    {custom_id: content or None} once completed, else None.
+    """
+
+    @abstractmethod
+    def submit(self, jsonl, metadata=None):
+        ...
+
+    @abstractmethod
+    def poll(self, batch_id):
+        ...
+
+
+class OpenAIBatchBackend(BatchBackend):
+    # OPENAI_BASE_URL points this at a local fake server
+    FAILED_STATUSES = {"failed", "expired", "cancelled", "cancelling"}
+
+    def __init__(self):
+        self.client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+
+    def submit(self, jsonl, metadata=None):
+        batch_file = self.client.files.create(
+            file=("batch.jsonl", io.BytesIO(jsonl.encode("utf-8"))),
+            purpose="batch",
+        )
+        batch = self.client.batches.create(
+            input_file_id=batch_file.id,
+            endpoint=BATCH_ENDPOINT,
+            completion_window=COMPLETION_WINDOW,
+            metadata=metadata,
+        )
+        return batch.id
+
+    def poll(self, batch_id):
+        batch = self.client.batches.retrieve(batch_id)
+        if batch.status in self.FAILED_STATUSES:
+            return "failed", None
+        if batch.status != "completed":
+            return "in_progress", None
+        results = {}
+        # failed requests are listed in the error file; read it first so real output wins
+        for file_id in (batch.error_file_id, batch.output_file_id):
+            if file_id:
+                results.update(parse_batch_output(self.client.files.content(file_id).text))
+        return "completed", results
+
+
+def get_batch_backend():
+    """Instantiate the backend named by settings.LLM_BATCH_BACKEND (dotted path)."""
+    return import_string(getattr(settings, "LLM_BATCH_BACKEND", "core.llm_batch.OpenAIBatchBackend"))()
@@ -0,0 +1,108 @@
+import hashlib
+import json
+import os
+from datetime import timedelta
+from django.core.cache import cache
+from django.db.models import F
+from django.utils import timezone
+from core.llm import chat_completion
+from core.logging import llm_extractor_logger
+from processing.models import LLMResponseCache
+
+
+# -------------------- Config --------------------
+CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "true").lower() == "true"
+CACHE_TTL = timedelta(days=int(os.getenv("LLM_CACHE_TTL_DAYS", 30)))
+CACHE_MAX_ROWS = int(os.getenv("LLM_CACHE_MAX_ROWS", 50000))
+STATS_PREFIX = "llm_cache"
+
+
+def cache_key(model, prompt_version, messages):
+    """sha256 over model, prompt version and the exact messages sent."""
+    payload = json.dumps([model, prompt_version, messages], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def count_event(prompt_version, event):
+    """Bump a per-prompt-version counter: hits, misses, repaired, parse_failures."""
+    key = f"{STATS_PREFIX}:{prompt_version}:{event}"
+    try:
+        cache.add(key, 0, timeout=None)
+        cache.incr(key)
+    except Exception as e:
+        # metrics must never break an LLM call
+        llm_extractor_logger.warning(f"Could not record LLM {event} counter: {e}")
+
+
+def get_cached_response(key):
+    entry = LLMResponseCache.objects.filter(key=key, expires_at__gt=timezone.now()).only("id", "response").first()
+    if entry is None:
+        return None
+    LLMResponseCache.objects.filter(id=entry.id).update(hits=F("hits") + 1, last_used_at=timezone.now())
+    return entry.response
+
+
+def store_response(key, model, prompt_version, response, ttl=CACHE_TTL):
+    now = timezone.now()
+    LLMResponseCache.objects.update_or_create(
+        key=key,
+        defaults={
+            "model": model,
+            "prompt_version": prompt_version,
+            "response": response,
+            "expires_at": now + ttl,
+            "last_used_at": now,
+        },
+    )
+
+
+def cached_chat_completion(prompt_version, model, messages, validate=None, ttl=CACHE_TTL, **kwargs):
+    """
+    Return the assistant message content for these messages, from the cache when the
+    same model + prompt version + input was answered before. Bump prompt_version
+    whenever a prompt or its parsing changes. Answers that fail validate(content)
+    are returned but not stored, so a retry asks the model again.
+    """
+    key = cache_key(model, prompt_version, messages)
+    if CACHE_ENABLED:
+        cached = get_cached_response(key)
+        if cached is not None:
+            count_event(prompt_version, "hits")
+            return cached
+        count_event(prompt_version, "misses")
+
+    response = chat_completion(model=model, messages=messages, **kwargs)
+    message = response.choices[0].message
+    content = message.content if message else None
+    if CACHE_ENABLED and content and (validate is None or validate(content)):
+        store_response(key, model, prompt_version, content, ttl)
+    return content
+
+
+def cache_stats(extra_versions=()):
+    """
+    {prompt_version: {"hits", "misses", "hit_rate", "repaired", "parse_failures"}}
+    since the counters were last reset.
+    """
+    versions = set(LLMResponseCache.objects.values_list("prompt_version", flat=True).distinct()) | set(extra_versions)
+    stats = {}
+    for version in sorted(versions):
+        counters = {
+            event: cache.get(f"{STATS_PREFIX}:{version}:{event}", 0)
+            for event in ("hits", "misses", "repaired", "parse_failures")
+        }
+        total = counters["hits"] + counters["misses"]
+        counters["hit_rate"] = counters["hits"] / total if total else 0.0
+        stats[version] = counters
+    return stats
+
+
+def evict_llm_cache(max_rows=CACHE_MAX_ROWS):
+    """Drop expired entries, then the least recently used ones beyond max_rows."""
+    expired, _ = LLMResponseCache.objects.filter(expires_at__lte=timezone.now()).delete()
+    overflow = LLMResponseCache.objects.count() - max_rows
+    evicted = 0
+    if overflow > 0:
+        stale_ids = list(LLMResponseCache.objects.order_by("last_used_at").values_list("id", flat=True)[:overflow])
+        evicted, _ = LLMResponseCache.objects.filter(id__in=stale_ids).delete()
+    return expired, evicted
@@ -0,0 +1,110 @@
+import json
+import re
+from pydantic import ValidationError
+from core.llm_cache import count_event
+from core.logging import llm_extractor_logger
+
+
+_FENCE_RE = re.compile(r"^```(?:json)?\s*|\s*```$", re.IGNORECASE)
+_TRAILING_COMMA_RE = re.compile(r",\s*([}\]])")
+
+
+def _strict(schema):
+    """Structured outputs in strict mode want every property required, no extras and no defaults."""
+    if isinstance(schema, dict):
+        schema.pop("default", None)
+        if "properties" in schema:
+            schema["required"] = list(schema["properties"])
+            schema["additionalProperties"] = False
+        for value in schema.values():
+            _strict(value)
+    elif isinstance(schema, list):
+        for value in schema:
+            _strict(value)
+    return schema
+
+
+def response_format_for(model_cls):
+    """response_format payload asking the API to answer with model_cls's JSON schema."""
+    return {
+        "type": "json_schema",
+        "json_schema": {
+            "name": model_cls.__name__,
+            "strict": True,
+            "schema": _strict(model_cls.model_json_schema()),
+        },
+    }
+
+
+def _close_truncated(text):
+    """Close strings, arrays and objects left open by output cut off mid-answer."""
+    stack, in_string, escaped = [], False, False
+    for char in text:
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char in "{[":
+            stack.append("}" if char == "{" else "]")
+        elif char in "}]" and stack:
+            stack.pop()
+    if in_string:
+        text += '"'
+    text = _TRAILING_COMMA_RE.sub(r"\1", text.rstrip().rstrip(","))
+    return text + "".join(reversed(stack))
+
+
+def repair_json(content):
+    """
+    Cheap local fixes for the usual formatting slips: markdown fences, prose around
+    the JSON, trailing commas and output truncated before the closing brackets.
+    """
+    text = _FENCE_RE.sub("", content.strip())
+    starts = [i for i in (text.find("{"), text.find("[")) if i != -1]
+    if starts:
+        text = text[min(starts):]
+    return _close_truncated(_TRAILING_COMMA_RE.sub(r"\1", text))
+
+
+def parse_model_output(model_cls, content, prompt_version, coerce=None):
+    """
+    Validate the model's answer against model_cls, trying repair_json() when it does
+    not parse as is. coerce can reshape the decoded JSON first (e.g. legacy formats).
+    Returns the model instance, or None after counting a parse failure.
+    """
+    if not content:
+        count_event(prompt_version, "parse_failures")
+        return None
+    for attempt, text in enumerate((content, None)):
+        try:
+            if text is None:
+                text = repair_json(content)
+            data = json.loads(text)
+            if coerce is not None:
+                data = coerce(data)
+            result = model_cls.model_validate(data)
+        except (ValueError, ValidationError):
+            continue
+        if attempt:
+            count_event(prompt_version, "repaired")
+        return result
+    count_event(prompt_version, "parse_failures")
+    llm_extractor_logger.warning(f"Unparseable {prompt_version} response: {content[:200]!r}")
+    return None
+
+
+def is_valid_for(model_cls, coerce=None):
+    """validate= callback for cached_chat_completion: only cache answers that parse."""
+    def validate(content):
+        try:
+            data = json.loads(content)
+            model_cls.model_validate(coerce(data) if coerce else data)
+            return True
+        except (ValueError, ValidationError):
+            return False
+    return validate
@@ -0,0 +1,27 @@
+import os
+from django.db import transaction
+
+
+# -------------------- Config --------------------
+# each stage hands its new rows straight to the next one; the beat schedule only sweeps up stragglers
+PIPELINE_CHAINING = os.getenv("PIPELINE_CHAINING", "true").lower() == "true"
+
+
+def enqueue_stage(task, ids, logger):
+    """
+    Queue the next pipeline stage for just the rows in ids once the current
+    transaction commits. A broker failure is logged, not raised: the rows stay
+    pending and the next sweep picks them up.
+    """
+    ids = list(ids)
+    if not PIPELINE_CHAINING or not ids:
+        return
+
+    def enqueue():
+        try:
+            # fail fast when the broker is down, and don't wait on the result backend
+            task.apply_async((ids,), retry=False, ignore_result=True)
+        except Exception as e:
+            logger.error(f"Could not queue {task.name} for {len(ids)} rows: {e}")
+
+    transaction.on_commit(enqueue)
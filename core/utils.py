@@ -2,9 +2,36 @@ import os
 import sys
 import pathlib
 import django
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
 
 def init_django():
     BASE_DIR = pathlib.Path(__file__).resolve().parent.parent.parent
     sys.path.append(str(BASE_DIR))
     os.environ.setdefault("DJANGO_SETTINGS_MODULE", "lighthouse.settings")
     django.setup()
+
+
+TRACKING_PARAM_PREFIXES = ("utm_", "mc_", "pk_", "hsa_")
+TRACKING_PARAMS = {"fbclid", "gclid", "dclid", "msclkid", "yclid", "igshid", "_ga", "_gl", "ref", "ref_src", "source", "trk"}
+
+
+def canonicalize_url(url):
+    """
+    Canonical form of a URL used as a dedup key: https, lowercase host without
+    'www.' or default port, no fragment, no trailing slash, tracking parameters
+    dropped and the remaining query sorted.
+    """
+    parts = urlsplit((url or "").strip())
+    if not parts.netloc:
+        return url
+    host = (parts.hostname or "").lower()
+    if host.startswith("www."):
+        host = host[4:]
+    if parts.port and parts.port not in (80, 443):
+        host = f"{host}:{parts.port}"
+    path = parts.path.rstrip("/")
+    query = sorted(
+        (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if key.lower() not in TRACKING_PARAMS and not key.lower().startswith(TRACKING_PARAM_PREFIXES)
+    )
+    return urlunsplit(("https", host, path, urlencode(query), ""))
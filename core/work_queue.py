@@ -0,0 +1,77 @@
+import os
+from datetime import timedelta
+from django.db import transaction
+from django.utils import timezone
+
+
+# -------------------- Config --------------------
+# how long a worker owns claimed rows; rows still in progress after that are put back in the queue
+WORK_LEASE_SECONDS = int(os.getenv("WORK_LEASE_SECONDS", 1800))
+IN_PROGRESS = "in_progress"
+
+
+class WorkQueue:
+    """
+    Claimable queue over a pipeline model's status column, so several workers can
+    poll the same stage without processing a row twice.
+
+    claim() locks a batch with SELECT ... FOR UPDATE SKIP LOCKED, moves it to
+    "in_progress" and stamps lease_expires_at. The stage then moves each row to
+    its next status as usual; rows it leaves unfinished are release()d, and rows
+    of a worker that died keep their lease until it runs out and the next claim
+    reclaims them. The model needs an "in_progress" status and a nullable
+    lease_expires_at field.
+    """
+
+    def __init__(self, model, logger, status_field="status", ready="pending", lease_seconds=WORK_LEASE_SECONDS):
+        self.model = model
+        self.logger = logger
+        self.status_field = status_field
+        self.ready = ready
+        self.lease = timedelta(seconds=lease_seconds)
+
+    def claim(self, queryset, limit, ids=None):
+        """
+        Claim up to limit rows of queryset (filtered to the statuses the stage
+        picks up, in the order it wants them) and return them, only among ids
+        when given (a run chained from the previous stage). Rows another worker
+        holds are skipped, not waited on.
+        """
+        self.reclaim_expired()
+        if ids is not None:
+            queryset = queryset.filter(id__in=ids)
+        expires = timezone.now() + self.lease
+        with transaction.atomic():
+            rows = list(queryset.select_for_update(skip_locked=True, of=("self",))[:limit])
+            if rows:
+                self.model.objects.filter(id__in=[row.id for row in rows]).update(
+                    **{self.status_field: IN_PROGRESS, "lease_expires_at": expires}
+                )
+        for row in rows:
+            setattr(row, self.status_field, IN_PROGRESS)
+            row.lease_expires_at = expires
+        return rows
+
+    def release(self, rows):
+        """
+        Put claimed rows that are still in progress back in the queue. The lease
+        identifies the claim, so rows reclaimed by another worker are left alone.
+        """
+        by_lease = {}
+        for row in rows:
+            by_lease.setdefault(row.lease_expires_at, []).append(row.id)
+        released = 0
+        for expires, ids in by_lease.items():
+            released += self.model.objects.filter(
+                id__in=ids, lease_expires_at=expires, **{self.status_field: IN_PROGRESS}
+            ).update(**{self.status_field: self.ready, "lease_expires_at": None})
+        return released
+
+    def reclaim_expired(self):
+        """Return rows whose lease ran out (their worker crashed or was killed) to the queue."""
+        reclaimed = self.model.objects.filter(
+            lease_expires_at__lt=timezone.now(), **{self.status_field: IN_PROGRESS}
+        ).update(**{self.status_field: self.ready, "lease_expires_at": None})
+        if reclaimed:
+            self.logger.warning(f"Reclaimed {reclaimed} expired {self.model.__name__} leases")
+        return reclaimed
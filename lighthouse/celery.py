@@ -10,7 +10,41 @@ app = Celery("lighthouse")
 app.config_from_object("django.conf:settings", namespace="CELERY")
 app.autodiscover_tasks()
 
-
-
-
-
+# ---- Queues ----
+# Each stage runs on the queue of the resource it is limited by, so a long browser
+# scrape never holds up cleaning or the LLM-bound stages.
+app.conf.task_routes = {
+    # Playwright: one pooled Chromium per worker process, reused across scrapes, memory-bound
+    "sources.tasks.run_scraper_task": {"queue": "browser"},
+    "sources.tasks.run_recrawl_task": {"queue": "browser"},
+    # lxml parsing (in a per-task process pool) and bulk writes, CPU-bound
+    "processing.tasks.run_cleaning_task": {"queue": "cpu-clean"},
+    "processing.tasks.purge_raw_blobs_task": {"queue": "cpu-clean"},
+    # waiting on OpenAI / Google APIs
+    "sources.tasks.collect_links_via_google_api_task": {"queue": "llm-io"},
+    "sources.tasks.refresh_google_queries_task": {"queue": "llm-io"},
+    "processing.tasks.run_llm_extraction_task": {"queue": "llm-io"},
+    "processing.tasks.poll_llm_batches_task": {"queue": "llm-io"},
+    "processing.tasks.evict_llm_cache_task": {"queue": "llm-io"},
+    "matching.tasks.run_matching_task": {"queue": "llm-io"},
+    "matching.tasks.rematch_startup_task": {"queue": "llm-io"},
+    "notifications.tasks.run_email_digest_task": {"queue": "mail"},
+}
+# anything not routed above waits on the API-bound workers
+app.conf.task_default_queue = "llm-io"
+
+# ---- Worker profiles ----
+# Options for one worker per queue: python -m lighthouse.worker <profile> [more worker options]
+WORKER_PROFILES = {
+    # few processes, recycled often: Chromium memory grows with every page
+    "browser": ["--queues=browser", "--pool=prefork", "--concurrency=2",
+                "--prefetch-multiplier=1", "--max-tasks-per-child=10"],
+    # one sweep at a time; it fans pages out to a process pool of one process per core. Prefork
+    # children are daemonic and may not start that pool, and the pool's processes exit after
+    # each sweep, which also caps lxml fragmentation
+    "cpu-clean": ["--queues=cpu-clean", "--pool=solo", "--prefetch-multiplier=1"],
+    # threads in one process share its LLM rate limits, cache client and embedding model
+    "llm-io": ["--queues=llm-io", "--pool=threads", "--concurrency=4", "--prefetch-multiplier=1"],
+    # one weekly digest; never send it twice in parallel
+    "mail": ["--queues=mail", "--pool=solo", "--prefetch-multiplier=1"],
+}
@@ -133,6 +133,27 @@ CELERY_TASK_ACKS_LATE = True
 # CELERY_TASK_TIME_LIMIT = 600  # 10 minutes per task
 # CELERY_TASK_SOFT_TIME_LIMIT = 540
 
+# ---- Cache ----
+# Shared by all workers: Google query rotation and LLM cache hit/miss counters
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": os.getenv("REDIS_CACHE_URL", "redis://localhost:6379/1"),
+    }
+}
+
+# ---- LLM Batch Mode ----
+# Send extraction and matching through the OpenAI Batch API (half price, results
+# within 24h) instead of synchronous calls; results are applied by poll_llm_batches.
+LLM_BATCH_MODE = os.getenv("LLM_BATCH_MODE", "false").lower() == "true"
+# dotted path of the core.llm_batch.BatchBackend implementation to use
+LLM_BATCH_BACKEND = os.getenv("LLM_BATCH_BACKEND", "core.llm_batch.OpenAIBatchBackend")
+
+# Stages chain into each other as soon as they have new rows (core.pipeline); the
+# scrape/clean/extract/match entries below only sweep up what chaining missed
+# (broker hiccups, rows released after errors, PIPELINE_CHAINING=false)
+PIPELINE_SWEEP_INTERVAL = timedelta(hours=int(os.getenv("PIPELINE_SWEEP_HOURS", 6)))
+
 CELERY_BEAT_SCHEDULE = {
     "collect_google_links": {
         "task": "sources.tasks.collect_links_via_google_api_task",
@@ -144,19 +165,35 @@ CELERY_BEAT_SCHEDULE = {
     },
     "run_scraper": {
         "task": "sources.tasks.run_scraper_task",
-        "schedule": timedelta(hours=1, minutes=30),
+        "schedule": PIPELINE_SWEEP_INTERVAL,
+    },
+    "run_recrawl": {
+        "task": "sources.tasks.run_recrawl_task",
+        "schedule": crontab(hour=2, minute=30),
     },
     "run_cleaners" : {
         "task" : "processing.tasks.run_cleaning_task",
-        "schedule" : timedelta(hours=2, minutes=5)
+        "schedule" : PIPELINE_SWEEP_INTERVAL
     },
     "run_llm_extraction": {
         "task": "processing.tasks.run_llm_extraction_task",
-        "schedule": timedelta(hours=2, minutes=6)
+        "schedule": PIPELINE_SWEEP_INTERVAL
     },
     "run_matching": {
         "task" : "matching.tasks.run_matching_task",
-        "schedule": timedelta(hours=4, minutes=15)
+        "schedule": PIPELINE_SWEEP_INTERVAL
+    },
+    "purge_raw_blobs": {
+        "task": "processing.tasks.purge_raw_blobs_task",
+        "schedule": crontab(hour=3, minute=30)
+    },
+    "evict_llm_cache": {
+        "task": "processing.tasks.evict_llm_cache_task",
+        "schedule": crontab(hour=3, minute=0)
+    },
+    "poll_llm_batches": {
+        "task": "processing.tasks.poll_llm_batches_task",
+        "schedule": timedelta(minutes=30)
     },
     "run_email_digest": {
         "task" : "notifications.tasks.run_email_digest_task",
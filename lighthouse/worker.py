@@ -0,0 +1,16 @@
+"""
+Start a Celery worker with one of the profiles in lighthouse.celery:
+
+    python -m lighthouse.worker browser --loglevel=INFO
+
+Options after the profile name are passed on and override the profile's.
+"""
+import sys
+from lighthouse.celery import WORKER_PROFILES, app
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or sys.argv[1] not in WORKER_PROFILES:
+        sys.exit(f"usage: python -m lighthouse.worker {{{','.join(WORKER_PROFILES)}}} [worker options]")
+    profile, extra = sys.argv[1], sys.argv[2:]
+    app.worker_main(["worker", f"--hostname={profile}@%h", *WORKER_PROFILES[profile], *extra])
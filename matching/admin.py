@@ -1,7 +1,9 @@
 from django.contrib import admin
 
-from .models import Startup , OpportunityMatch
+from .models import Startup , OpportunityMatch, StartupEmbedding, OpportunityEmbedding, MatchEvaluation
 
 admin.site.register(Startup)
 admin.site.register(OpportunityMatch)
-
+admin.site.register(StartupEmbedding)
+admin.site.register(OpportunityEmbedding)
+admin.site.register(MatchEvaluation)
@@ -3,3 +3,6 @@ from django.apps import AppConfig
 class SourcesConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "matching"
+
+    def ready(self):
+        from . import signals  # noqa: F401  (registers the Startup post_save handler)
@@ -0,0 +1,50 @@
+from core.llm_batch import build_batch_request
+from core.logging import matcher_logger
+from processing.batch import MAX_BATCH_ITEMS, submit_batch
+from processing.models import ProcessedOpportunity
+from .matcher import MATCHING_MODEL, MATCHING_RESPONSE_FORMAT, apply_matching_result, build_matching_messages, claim_llm_matching, close_without_judging, get_startups_to_judge, get_unmatched_startups
+from .scoring import matching_queue
+
+
+def submit_matching_batch(limit=MAX_BATCH_ITEMS, backend=None, ids=None):
+    opportunities = claim_llm_matching(limit, ids=ids)
+    try:
+        requests, item_ids = [], []
+        for opportunity in opportunities:
+            startups = list(get_startups_to_judge(opportunity))
+            if not startups:
+                close_without_judging(opportunity)
+                continue
+            requests.append(build_batch_request(
+                str(opportunity.id),
+                model=MATCHING_MODEL,
+                messages=build_matching_messages(opportunity, startups),
+                response_format=MATCHING_RESPONSE_FORMAT,
+            ))
+            item_ids.append(opportunity.id)
+
+        if not requests:
+            matcher_logger.info("No pending opportunities to batch for matching.")
+            return None
+
+        return submit_batch("matching", requests, item_ids, backend)
+    finally:
+        matching_queue.release(opportunities)
+
+
+def apply_matching_batch(job, results):
+    applied = 0
+    for opportunity in ProcessedOpportunity.objects.filter(id__in=job.item_ids, matching_status="batched"):
+        content = results.get(str(opportunity.id))
+        try:
+            if content is None:
+                raise ValueError("Request failed in batch")
+            if apply_matching_result(opportunity, get_unmatched_startups(opportunity), content):
+                applied += 1
+        except Exception as e:
+            matcher_logger.error(f"Error applying batch match for {opportunity.title}: {e}", exc_info=True)
+        if opportunity.matching_status == "batched":
+            # not applied (failed request or unparseable answer); retry on the next run
+            opportunity.matching_status = "pending"
+            opportunity.save(update_fields=["matching_status"])
+    return applied
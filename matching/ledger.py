@@ -0,0 +1,88 @@
+import hashlib
+from django.db.models import Q
+from django.utils import timezone
+from processing.models import ProcessedOpportunity
+from .models import MatchEvaluation, OpportunityMatch
+
+
+PROFILE_FIELDS = ("name", "description", "industry", "country", "keywords")
+
+
+def profile_hash(startup):
+    """sha256 of the profile fields matching looks at; edits to anything else don't trigger a rematch."""
+    profile = "\x1f".join(str(getattr(startup, field) or "") for field in PROFILE_FIELDS)
+    return hashlib.sha256(profile.encode("utf-8")).hexdigest()
+
+
+def record_verdicts(verdicts, prompt_version, source):
+    """Upsert one ledger row per (opportunity, startup, is_match, score) verdict."""
+    if not verdicts:
+        return
+    MatchEvaluation.objects.bulk_create(
+        [
+            MatchEvaluation(
+                opportunity=opportunity,
+                startup=startup,
+                profile_hash=profile_hash(startup),
+                prompt_version=prompt_version,
+                source=source,
+                is_match=is_match,
+                score=score,
+            )
+            for opportunity, startup, is_match, score in verdicts
+        ],
+        update_conflicts=True,
+        unique_fields=["opportunity", "startup"],
+        update_fields=["profile_hash", "prompt_version", "source", "is_match", "score", "evaluated_at"],
+    )
+
+
+def settled_pairs(opportunities, startups, prompt_versions):
+    """
+    (opportunity id, startup id) pairs with a verdict made against the startup's
+    current profile under one of prompt_versions; those don't need asking again.
+    """
+    hashes = {startup.id: profile_hash(startup) for startup in startups}
+    rows = MatchEvaluation.objects.filter(
+        opportunity__in=opportunities, startup_id__in=list(hashes), prompt_version__in=prompt_versions
+    ).values_list("opportunity_id", "startup_id", "profile_hash")
+    return {(opportunity_id, startup_id) for opportunity_id, startup_id, row_hash in rows if hashes[startup_id] == row_hash}
+
+
+def drop_stale_matches(startup, prompt_versions):
+    """
+    Delete the startup's not yet mailed matches on open opportunities that have
+    no verdict for its current profile (it was edited since), so they are
+    evaluated again like any other pair. Their old verdicts go too: a profile
+    edited back would otherwise find them settled with no match left.
+    Returns the number deleted.
+    """
+    current = MatchEvaluation.objects.filter(
+        startup=startup, profile_hash=profile_hash(startup), prompt_version__in=prompt_versions
+    ).values("opportunity_id")
+    stale = OpportunityMatch.objects.filter(
+        startup=startup, mailed_at__isnull=True, opportunity__in=open_opportunities()
+    ).exclude(opportunity_id__in=current)
+    opportunity_ids = list(stale.values_list("opportunity_id", flat=True))
+    if not opportunity_ids:
+        return 0
+    MatchEvaluation.objects.filter(startup=startup, opportunity_id__in=opportunity_ids).delete()
+    OpportunityMatch.objects.filter(startup=startup, opportunity_id__in=opportunity_ids).delete()
+    return len(opportunity_ids)
+
+
+def unsettled_open_opportunities(startup, prompt_versions):
+    """Open opportunities with neither a match for startup nor a verdict on its current profile."""
+    settled = MatchEvaluation.objects.filter(
+        startup=startup, profile_hash=profile_hash(startup), prompt_version__in=prompt_versions
+    ).values("opportunity_id")
+    return open_opportunities().exclude(id__in=settled).exclude(matches__startup=startup)
+
+
+def open_opportunities():
+    """Opportunities that have been through matching and are still open to applications."""
+    today = timezone.now().date()
+    return ProcessedOpportunity.objects.filter(
+        Q(deadline__isnull=True) | Q(deadline__gte=today),
+        matching_status__in=("matched", "no match"),
+    )
@@ -1,16 +1,23 @@
 import os
-import json
+from django.db import transaction
 from core.logging import matcher_logger 
 from core.utils import init_django
 init_django()
 
-from openai import OpenAI
+from core.llm_cache import cached_chat_completion
+from core.llm_schema import is_valid_for, parse_model_output, response_format_for
 from processing.models import ProcessedOpportunity
+from .ledger import record_verdicts, settled_pairs
 from .models import Startup, OpportunityMatch
+from .schemas import MatchingResult, wrap_match_list
+from .scoring import LLM_MATCHING_STATUSES, SCORING_ENABLED, matching_queue, score_pending_opportunities
+from .vector_index import shortlist_startups
 
 
 
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+MATCHING_MODEL = "gpt-5-mini"
+MATCHING_PROMPT_VERSION = "matching-v2"  # bump when MATCHING_PROMPT or its parsing changes
+MATCHING_RESPONSE_FORMAT = response_format_for(MatchingResult)
 
 MATCHING_PROMPT = """
 You are a precise opportunity-startup matcher.
@@ -19,15 +26,17 @@ Your job:
 Given a list of startup profiles and a single funding or partnership opportunity,
 decide which startups are specifically meant for the opportunity.
 
-Return ONLY valid JSON in this format (array of objects, one per startup):
-[
-  {
-    "startup_name": "Startup Name",
-    "is_match": true/false,
-    "confidence_score": 0.0,
-    "justification": ""
-  } 
-]
+Return ONLY valid JSON in this format ("matches" holds one object per startup):
+{
+  "matches": [
+    {
+      "startup_name": "Startup Name",
+      "is_match": true/false,
+      "confidence_score": 0.0,
+      "justification": ""
+    }
+  ]
+}
 
 Guidelines:
 - Consider each startup's industry, keywords, country, and description.
@@ -36,26 +45,38 @@ Guidelines:
   return is_match = true with a balanced confidence score (0.6-1.0).
 - If unrelated, return is_match = false with a low score (0.0-0.4).
 - Evaluate each startup independently with the opportunity.
-- Do NOT include any explanations, only return the JSON array as specified.
+- Do NOT include any explanations, only return the JSON object as specified.
 
 """
 
 def get_unmatched_startups(opportunity):
     matched_ids = OpportunityMatch.objects.filter(
         opportunity=opportunity
-    ).values_list("startup_id", flat=True)
+    ).exclude(status="candidate").values_list("startup_id", flat=True)
     return Startup.objects.exclude(id__in=matched_ids)
 
-def match_startups_to_opportunity(opportunity):
+def get_startups_to_judge(opportunity):
+    """The borderline candidates left by the scoring engine, else the most similar unmatched startups."""
+    candidate_ids = OpportunityMatch.objects.filter(
+        opportunity=opportunity, status="candidate"
+    ).values_list("startup_id", flat=True)
+    if candidate_ids.exists():
+        return Startup.objects.filter(id__in=candidate_ids)
     startups = get_unmatched_startups(opportunity)
-    if not startups.exists():
-        matcher_logger.info(f"All startups already matched for {opportunity.title}")
-        opportunity.matching_status = "matched"
-        opportunity.save(update_fields=["matching_status"])
-        return
+    settled = settled_pairs([opportunity], startups, (MATCHING_PROMPT_VERSION,))
+    return shortlist_startups(opportunity, startups.exclude(id__in=[startup_id for _, startup_id in settled]))
+
+def close_without_judging(opportunity):
+    """
+    Nothing is left to ask the LLM about (every pair is matched or settled in the
+    ledger): the opportunity is matched only if some startup matched it.
+    """
+    any_match = OpportunityMatch.objects.filter(opportunity=opportunity).exclude(status="candidate").exists()
+    opportunity.matching_status = "matched" if any_match else "no match"
+    opportunity.save(update_fields=["matching_status"])
 
-    matcher_logger.info(f"Matching {opportunity.title} with {startups.count()} startups...")
 
+def build_matching_messages(opportunity, startups):
     # Prepare startup batch text
     startups_text = []
     for s in startups:
@@ -76,69 +97,126 @@ def match_startups_to_opportunity(opportunity):
     Location: {opportunity.location}
     """
 
-    try:
-        response = client.chat.completions.create(
-            model="gpt-5-mini",
-            messages = [
-                {"role": "system", "content": "You are a JSON-only evaluator."},
-                {"role": "user", "content": MATCHING_PROMPT},
-                {"role": "user", "content": f"Startups:\n{startups_text_str}\n\nOpportunity:\n{opportunity_text}"},
-            ],
-        )
+    return [
+        {"role": "system", "content": "You are a JSON-only evaluator."},
+        {"role": "user", "content": MATCHING_PROMPT},
+        {"role": "user", "content": f"Startups:\n{startups_text_str}\n\nOpportunity:\n{opportunity_text}"},
+    ]
+
 
-        message = response.choices[0].message
-        if not message or not message.content:
-            raise ValueError("Empty model response")
-
-        matches = json.loads(message.content.strip())
-        any_match = False  # track if at least one startup matched
-
-        for match in matches:
-            startup_name = match.get("startup_name")
-            is_match = match.get("is_match", False)
-            confidence_score = float(match.get("confidence_score", 0.0))
-            justification = match.get("justification", "")
-
-            try:
-                startup = startups.get(name=startup_name)
-            except Startup.DoesNotExist:
-                matcher_logger.warning(f"Startup {startup_name} not found in DB, skipping")
-                continue
-
-            if is_match:
-                any_match = True
-                OpportunityMatch.objects.update_or_create(
-                    opportunity=opportunity,
-                    startup=startup,
-                    defaults={
-                        "confidence_score": confidence_score,
-                        "justification": justification,
-                        "status": "pending",
-                    }
-                )
-                matcher_logger.info(f"Matched: {opportunity.title} → {startup.name} ({confidence_score})")
-            else:
-                matcher_logger.info(f"No match: {opportunity.title} → {startup.name}")
+def normalize_name(name):
+    """Startup names as the model may echo them back: case and whitespace don't matter."""
+    return " ".join((name or "").split()).casefold()
+
+
+def apply_matching_result(opportunity, startups, content):
+    """
+    Store the matches from the model's answer; shared by the sync and batch paths.
+    Returns False when the answer could not be parsed (the opportunity stays pending).
+    Uses the same handful of queries however many startups were judged.
+    """
+    result = parse_model_output(MatchingResult, content, MATCHING_PROMPT_VERSION, coerce=wrap_match_list)
+    if result is None:
+        matcher_logger.error(f"Unparseable matching response for opportunity: {opportunity.title}")
+        return False
+
+    by_name, ambiguous = {}, set()
+    for startup in startups:
+        key = normalize_name(startup.name)
+        if key in by_name:
+            ambiguous.add(key)
+            matcher_logger.warning(
+                f"Startups {by_name[key].name!r} and {startup.name!r} differ only in case or spacing; "
+                f"answers for that name are skipped"
+            )
+        by_name[key] = startup
+    verdicts, rows = [], []
+    for match in result.matches:
+        key = normalize_name(match.startup_name)
+        if key in ambiguous:
+            continue
+        startup = by_name.get(key)
+        if startup is None:
+            matcher_logger.warning(f"Startup {match.startup_name} not found in DB, skipping")
+            continue
+
+        verdicts.append((opportunity, startup, match.is_match, match.confidence_score))
+        if match.is_match:
+            rows.append(OpportunityMatch(
+                opportunity=opportunity,
+                startup=startup,
+                confidence_score=match.confidence_score,
+                justification=match.justification,
+                status="pending",
+            ))
+            matcher_logger.info(f"Matched: {opportunity.title} → {startup.name} ({match.confidence_score})")
+        else:
+            matcher_logger.info(f"No match: {opportunity.title} → {startup.name}")
+
+    with transaction.atomic():
+        # confirmed candidates are upgraded in place (keeping their prescore and rank)
+        OpportunityMatch.objects.bulk_create(
+            rows,
+            update_conflicts=True,
+            unique_fields=["opportunity", "startup"],
+            update_fields=["confidence_score", "justification", "status"],
+        )
+        record_verdicts(verdicts, MATCHING_PROMPT_VERSION, "llm")
+        # candidates the model did not confirm are dropped; pre-score acceptances still count as matches
+        OpportunityMatch.objects.filter(opportunity=opportunity, status="candidate").delete()
+        any_match = bool(rows) or OpportunityMatch.objects.filter(opportunity=opportunity).exists()
 
         # Update matching_status based on whether any startup matched
         opportunity.matching_status = "matched" if any_match else "no match"
         opportunity.save(update_fields=["matching_status"])
+    return True
+
+
+def match_startups_to_opportunity(opportunity):
+    # only borderline candidates (or the most similar profiles) go to the LLM for the final judgment
+    startups = list(get_startups_to_judge(opportunity))  # evaluated once, for the prompt and the name lookup
+    if not startups:
+        matcher_logger.info(f"All startups already matched or judged for {opportunity.title}")
+        close_without_judging(opportunity)
+        return
+
+    matcher_logger.info(f"Matching {opportunity.title} with {len(startups)} startups...")
+
+    try:
+        content = cached_chat_completion(
+            MATCHING_PROMPT_VERSION,
+            MATCHING_MODEL,
+            build_matching_messages(opportunity, startups),
+            validate=is_valid_for(MatchingResult, coerce=wrap_match_list),
+            response_format=MATCHING_RESPONSE_FORMAT,
+        )
+        apply_matching_result(opportunity, startups, content)
 
-    except json.JSONDecodeError:
-        matcher_logger.error(f"Invalid JSON response for opportunity: {opportunity.title}", exc_info=True)
     except Exception as e:
         matcher_logger.error(f"Error matching startups to {opportunity.title}: {e}", exc_info=True)
 
 
+def claim_llm_matching(limit, ids=None):
+    """Claim the newest opportunities (among ids, if given) waiting for the LLM matcher; release them with matching_queue."""
+    return matching_queue.claim(
+        ProcessedOpportunity.objects.filter(matching_status__in=LLM_MATCHING_STATUSES).order_by('-created_at'), limit, ids=ids
+    )
+
+
 def run_matching():
-    opportunities = ProcessedOpportunity.objects.filter(matching_status="pending").order_by('-created_at')[:30]
-    if not opportunities.exists():
+    if SCORING_ENABLED:
+        score_pending_opportunities()
+    opportunities = claim_llm_matching(30)
+    if not opportunities:
         matcher_logger.info("No processed opportunities available for matching.")
         return
 
-    matcher_logger.info(f"Starting matching for {opportunities.count()} processed opportunities.")
-    for opp in opportunities:
-        match_startups_to_opportunity(opp)
+    matcher_logger.info(f"Starting matching for {len(opportunities)} processed opportunities.")
+    try:
+        for opp in opportunities:
+            match_startups_to_opportunity(opp)
+    finally:
+        matching_queue.release(opportunities)
     matcher_logger.info("Matching process completed.")
 
 if __name__ == "__main__":
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.6 on 2026-10-17 18:55
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('matching', '0004_opportunitymatch_mailed_at'),
+        ('processing', '0011_alter_cleanedopportunity_rejected_by'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StartupEmbedding',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('vector', models.BinaryField()),
+                ('model_name', models.CharField(max_length=255)),
+                ('profile_updated_at', models.DateTimeField(help_text='Startup.updated_at when the profile was encoded')),
+                ('startup', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='embedding', to='matching.startup')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='OpportunityEmbedding',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('vector', models.BinaryField()),
+                ('model_name', models.CharField(max_length=255)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('opportunity', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='embedding', to='processing.processedopportunity')),
+            ],
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.6 on 2026-10-17 19:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('matching', '0005_startupembedding_opportunityembedding'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='opportunitymatch',
+            name='prescore',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='opportunitymatch',
+            name='rank',
+            field=models.PositiveSmallIntegerField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='opportunitymatch',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('accepted', 'Accepted'), ('rejected', 'Rejected'), ('candidate', 'Candidate (awaiting LLM confirmation)')], default='pending', max_length=50),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.6 on 2026-10-17 19:50
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('matching', '0006_opportunitymatch_prescore_rank'),
+        ('processing', '0012_alter_processedopportunity_matching_status'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MatchEvaluation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('profile_hash', models.CharField(help_text='sha256 of the startup profile fields the verdict saw', max_length=64)),
+                ('prompt_version', models.CharField(max_length=50)),
+                ('source', models.CharField(choices=[('prescore', 'Embedding pre-score'), ('llm', 'LLM')], max_length=20)),
+                ('is_match', models.BooleanField()),
+                ('score', models.FloatField(default=0.0)),
+                ('evaluated_at', models.DateTimeField(auto_now=True)),
+                ('opportunity', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='evaluations', to='processing.processedopportunity')),
+                ('startup', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='evaluations', to='matching.startup')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('opportunity', 'startup'), name='unique_match_evaluation')],
+            },
+        ),
+    ]
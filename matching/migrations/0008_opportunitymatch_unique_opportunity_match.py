@@ -0,0 +1,28 @@
+# Generated by Django 5.2.6 on 2026-10-17 20:15
+
+from django.db import migrations, models
+from django.db.models import Max
+
+
+def remove_duplicate_matches(apps, schema_editor):
+    """Keep the newest row of each (opportunity, startup) pair so the constraint can be added."""
+    OpportunityMatch = apps.get_model("matching", "OpportunityMatch")
+    keep = list(
+        OpportunityMatch.objects.values("opportunity", "startup").annotate(latest=Max("id")).values_list("latest", flat=True)
+    )
+    OpportunityMatch.objects.exclude(id__in=keep).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('matching', '0007_matchevaluation'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_matches, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='opportunitymatch',
+            constraint=models.UniqueConstraint(fields=('opportunity', 'startup'), name='unique_opportunity_match'),
+        ),
+    ]
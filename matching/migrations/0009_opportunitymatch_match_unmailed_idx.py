@@ -0,0 +1,19 @@
+# Generated by Django 5.2.6 on 2026-10-17 20:40
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('matching', '0008_opportunitymatch_unique_opportunity_match'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='opportunitymatch',
+            index=models.Index(condition=models.Q(('mailed_at__isnull', True), models.Q(('status', 'candidate'), _negated=True)), fields=['opportunity', 'confidence_score'], name='match_unmailed_idx'),
+        ),
+    ]
@@ -35,14 +35,80 @@ class OpportunityMatch(models.Model):
     status = models.CharField(
         max_length=50,
         choices=[("pending", "Pending"), ("accepted", "Accepted"),
-                 ("rejected", "Rejected")],
+                 ("rejected", "Rejected"), ("candidate", "Candidate (awaiting LLM confirmation)")],
         default="pending"
     )
+    # embedding similarity from the batch scoring engine, and the startup's place in the opportunity's shortlist
+    prescore = models.FloatField(null=True, blank=True)
+    rank = models.PositiveSmallIntegerField(null=True, blank=True)
     # LLM explanation for the match
     justification = models.TextField(blank=True, null=True)
     matched_at = models.DateTimeField(auto_now_add=True)
     mailed_at = models.DateTimeField(null=True, blank=True)
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["opportunity", "startup"], name="unique_opportunity_match"),
+        ]
+        indexes = [
+            # digest: unmailed, confirmed matches grouped by opportunity by best confidence
+            models.Index(
+                fields=["opportunity", "confidence_score"],
+                condition=models.Q(mailed_at__isnull=True) & ~models.Q(status="candidate"),
+                name="match_unmailed_idx",
+            ),
+        ]
+
     def __str__(self):
         return f"{self.opportunity.title} → {self.startup.name} -> {self.mailed_at or 'Not Mailed'}"
- 
\ No newline at end of file
+ 
+
+
+class StartupEmbedding(models.Model):
+    """
+    Profile vector of a startup (description, industry, keywords, country) for
+    candidate retrieval; re-encoded when Startup.updated_at moves past profile_updated_at.
+    """
+    startup = models.OneToOneField(Startup, on_delete=models.CASCADE, related_name="embedding")
+    vector = models.BinaryField()  # float32, L2-normalized
+    model_name = models.CharField(max_length=255)
+    profile_updated_at = models.DateTimeField(help_text="Startup.updated_at when the profile was encoded")
+
+    def __str__(self):
+        return f"{self.startup.name} | {self.model_name}"
+
+
+class OpportunityEmbedding(models.Model):
+    opportunity = models.OneToOneField(ProcessedOpportunity, on_delete=models.CASCADE, related_name="embedding")
+    vector = models.BinaryField()  # float32, L2-normalized
+    model_name = models.CharField(max_length=255)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.opportunity.title[:30]} | {self.model_name}"
+
+
+class MatchEvaluation(models.Model):
+    """
+    Ledger of every opportunity-startup verdict, matches and non-matches, with the
+    startup profile and prompt version it was made against. A pair is only
+    re-evaluated once either of those changes.
+    """
+    SOURCES = [("prescore", "Embedding pre-score"), ("llm", "LLM")]
+
+    opportunity = models.ForeignKey(ProcessedOpportunity, on_delete=models.CASCADE, related_name="evaluations")
+    startup = models.ForeignKey(Startup, on_delete=models.CASCADE, related_name="evaluations")
+    profile_hash = models.CharField(max_length=64, help_text="sha256 of the startup profile fields the verdict saw")
+    prompt_version = models.CharField(max_length=50)
+    source = models.CharField(max_length=20, choices=SOURCES)
+    is_match = models.BooleanField()
+    score = models.FloatField(default=0.0)
+    evaluated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["opportunity", "startup"], name="unique_match_evaluation"),
+        ]
+
+    def __str__(self):
+        return f"{self.opportunity.title[:30]} → {self.startup.name}: {'match' if self.is_match else 'no match'} ({self.prompt_version})"
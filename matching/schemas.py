@@ -0,0 +1,18 @@
+from pydantic import BaseModel
+
+
+class StartupMatch(BaseModel):
+    startup_name: str
+    is_match: bool = False
+    confidence_score: float = 0.0
+    justification: str = ""
+
+
+class MatchingResult(BaseModel):
+    """Answer to MATCHING_PROMPT: one entry per startup in the request."""
+    matches: list[StartupMatch]
+
+
+def wrap_match_list(data):
+    # answers from before structured outputs were a bare array
+    return {"matches": data} if isinstance(data, list) else data
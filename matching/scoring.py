@@ -0,0 +1,219 @@
+import os
+import re
+import numpy as np
+from django.db import transaction
+from core.logging import matcher_logger
+from core.work_queue import WorkQueue
+from processing.models import ProcessedOpportunity
+from processing.prefilter import BROAD_REGIONS
+from .ledger import drop_stale_matches, open_opportunities, record_verdicts, settled_pairs, unsettled_open_opportunities
+from .models import OpportunityMatch, Startup
+from .vector_index import MATCH_TOP_K, get_startup_index, opportunity_vectors
+
+
+# -------------------- Config --------------------
+SCORING_ENABLED = os.getenv("MATCH_SCORING_ENABLED", "true").lower() == "true"
+SCORING_BATCH_SIZE = int(os.getenv("MATCH_SCORING_BATCH_SIZE", 500))
+# cosine similarity at or above which a pair is accepted without asking the LLM
+PRESCORE_ACCEPT = float(os.getenv("MATCH_PRESCORE_ACCEPT", 0.75))
+# pairs between PRESCORE_REVIEW and PRESCORE_ACCEPT go to the LLM; below it they are dropped
+PRESCORE_REVIEW = float(os.getenv("MATCH_PRESCORE_REVIEW", 0.45))
+PRESCORE_VERSION = "prescore-v1"  # ledger version of pre-score verdicts; bump when the masks or thresholds change meaning
+
+# Statuses the LLM matcher picks up: only the borderline ones once the scoring engine has run
+LLM_MATCHING_STATUSES = ("borderline",) if SCORING_ENABLED else ("pending", "borderline")
+
+# shared by scoring and the LLM matcher; a released or expired claim goes back to pending, which
+# re-scoring turns back into borderline while the opportunity still has candidates
+matching_queue = WorkQueue(ProcessedOpportunity, matcher_logger, status_field="matching_status")
+
+
+def _terms_present(texts, terms):
+    """Boolean matrix (texts x terms) of whole-word mentions."""
+    patterns = [re.compile(r"\b" + re.escape(term) + r"\b") for term in terms]
+    present = np.zeros((len(texts), len(terms)), dtype=bool)
+    for row, text in enumerate(texts):
+        lowered = text.lower()
+        for col, pattern in enumerate(patterns):
+            present[row, col] = bool(pattern.search(lowered))
+    return present
+
+
+def _startup_terms(startup):
+    terms = {startup.industry.strip().lower()}
+    terms.update(keyword.strip().lower() for keyword in (startup.keywords or "").split(","))
+    return {term for term in terms if len(term) > 1}
+
+
+def country_mask(opportunities, startups):
+    """
+    (opportunities x startups) pairs allowed on geography. An opportunity naming
+    specific countries (and no wider region) is only open to startups from those
+    countries; startups without a country are never excluded.
+    """
+    countries = sorted({s.country.strip().lower() for s in startups if s.country})
+    texts = [f"{o.title} {o.location or ''} {o.eligibility or ''}" for o in opportunities]
+    mentioned = _terms_present(texts, countries)
+    broad = _terms_present(texts, BROAD_REGIONS).any(axis=1)
+    restricted = mentioned.any(axis=1) & ~broad
+
+    column = {country: i for i, country in enumerate(countries)}
+    startup_countries = np.zeros((len(countries), len(startups)), dtype=bool)
+    no_country = np.zeros(len(startups), dtype=bool)
+    for j, startup in enumerate(startups):
+        if startup.country:
+            startup_countries[column[startup.country.strip().lower()], j] = True
+        else:
+            no_country[j] = True
+    in_country = (mentioned.astype(np.int32) @ startup_countries.astype(np.int32)) > 0
+    return ~restricted[:, None] | in_country | no_country[None, :]
+
+
+def industry_mask(opportunities, startups):
+    """
+    (opportunities x startups) pairs allowed on sector. An opportunity whose title,
+    category or eligibility names portfolio industries or keywords is only open to
+    startups sharing one of them; sector-agnostic opportunities are open to all.
+    """
+    startup_terms = [_startup_terms(s) for s in startups]
+    vocabulary = sorted(set().union(*startup_terms)) if startup_terms else []
+    texts = [f"{o.title} {o.category or ''} {o.eligibility or ''}" for o in opportunities]
+    mentioned = _terms_present(texts, vocabulary)
+
+    column = {term: i for i, term in enumerate(vocabulary)}
+    has_term = np.zeros((len(vocabulary), len(startups)), dtype=bool)
+    for j, terms in enumerate(startup_terms):
+        has_term[[column[term] for term in terms], j] = True
+    overlap = (mentioned.astype(np.int32) @ has_term.astype(np.int32)) > 0
+    return ~mentioned.any(axis=1)[:, None] | overlap
+
+
+def similarity_matrix(opportunities, startup_matrix):
+    """Cosine similarity of every opportunity to every startup, as one matrix product."""
+    vectors = opportunity_vectors(opportunities)
+    opportunity_matrix = np.vstack([vectors[o.id] for o in opportunities])
+    return opportunity_matrix @ startup_matrix.T
+
+
+def settled_versions():
+    from .matcher import MATCHING_PROMPT_VERSION  # imported here: matcher imports this module
+    return (PRESCORE_VERSION, MATCHING_PROMPT_VERSION)
+
+
+def score_opportunities(opportunities, top_k=MATCH_TOP_K, startup_ids=None):
+    """
+    Score a batch of opportunities against the whole portfolio (or just
+    startup_ids) at once. Each opportunity's top_k allowed startups above
+    PRESCORE_REVIEW are written to OpportunityMatch, ranked by similarity: clear
+    matches as pending (they go out in the digest) and borderline ones as
+    candidates for the LLM to confirm. Pairs with a verdict in the ledger for the
+    startup's current profile are skipped.
+    Returns the number of (accepted, candidate) pairs written.
+    """
+    opportunities = list(opportunities)
+    index = get_startup_index()
+    if not opportunities or not len(index.ids):
+        return 0, 0
+    startups_by_id = Startup.objects.in_bulk(startup_ids if startup_ids is not None else index.ids.tolist())
+    keep = [i for i, startup_id in enumerate(index.ids) if startup_id in startups_by_id]
+    startup_ids, startup_matrix = index.ids[keep], index.matrix[keep]
+    startups = [startups_by_id[startup_id] for startup_id in startup_ids.tolist()]
+
+    scores = similarity_matrix(opportunities, startup_matrix)
+    allowed = country_mask(opportunities, startups) & industry_mask(opportunities, startups)
+
+    # pairs already stored (earlier LLM matches, or candidates still awaiting confirmation) are not rewritten
+    existing = OpportunityMatch.objects.filter(opportunity__in=opportunities).values_list("opportunity_id", "startup_id", "status")
+    row_of = {o.id: i for i, o in enumerate(opportunities)}
+    column_of = {startup_id: j for j, startup_id in enumerate(startup_ids.tolist())}
+    has_matches, awaiting = set(), set()
+    for opportunity_id, startup_id, status in existing:
+        (awaiting if status == "candidate" else has_matches).add(opportunity_id)
+        if startup_id in column_of:
+            allowed[row_of[opportunity_id], column_of[startup_id]] = False
+    for opportunity_id, startup_id in settled_pairs(opportunities, startups, settled_versions()):
+        allowed[row_of[opportunity_id], column_of[startup_id]] = False
+    scores = np.where(allowed & (scores >= PRESCORE_REVIEW), scores, -np.inf)
+
+    k = min(top_k, scores.shape[1])
+    ranked = np.argsort(-scores, axis=1)[:, :k]
+    rows, verdicts, accepted, candidates = [], [], 0, 0
+    for i, opportunity in enumerate(opportunities):
+        any_accepted = False
+        for rank, j in enumerate(ranked[i], start=1):
+            score = float(scores[i, j])
+            if not np.isfinite(score):
+                break
+            clear = score >= PRESCORE_ACCEPT
+            rows.append(OpportunityMatch(
+                opportunity=opportunity,
+                startup=startups[j],
+                confidence_score=score if clear else 0.0,
+                prescore=score,
+                rank=rank,
+                status="pending" if clear else "candidate",
+                justification=f"Accepted on profile similarity {score:.2f} (rank {rank})" if clear else None,
+            ))
+            if clear:
+                accepted += 1
+                any_accepted = True
+                verdicts.append((opportunity, startups[j], True, score))
+            else:
+                candidates += 1
+                awaiting.add(opportunity.id)
+        if opportunity.id in awaiting:
+            opportunity.matching_status = "borderline"
+        elif any_accepted or opportunity.id in has_matches:
+            opportunity.matching_status = "matched"
+        else:
+            opportunity.matching_status = "no match"
+
+    with transaction.atomic():
+        OpportunityMatch.objects.bulk_create(rows)
+        # pre-score drops are not recorded: redoing them is one matrix product, not an LLM call
+        record_verdicts(verdicts, PRESCORE_VERSION, "prescore")
+        ProcessedOpportunity.objects.bulk_update(opportunities, ["matching_status"])
+    matcher_logger.info(
+        f"Pre-scored {len(opportunities)} opportunities x {len(startups)} startups: "
+        f"{accepted} accepted, {candidates} borderline pairs left for the LLM"
+    )
+    return accepted, candidates
+
+
+def score_pending_opportunities(limit=SCORING_BATCH_SIZE, ids=None):
+    opportunities = matching_queue.claim(
+        ProcessedOpportunity.objects.filter(matching_status="pending").order_by("-created_at"), limit, ids=ids
+    )
+    try:
+        return score_opportunities(opportunities)
+    finally:
+        matching_queue.release(opportunities)
+
+
+def rescore_startup(startup):
+    """
+    Re-evaluate one new or edited startup against the open opportunities it has
+    no verdict for under its current profile, leaving every other pair alone.
+    Unmailed matches made against an older profile are dropped and scored
+    again with the rest, so an edit can also take a match back. Opportunities
+    are claimed through matching_queue before their status is rewritten; ones
+    another worker holds are left to it.
+    """
+    with transaction.atomic():
+        dropped = drop_stale_matches(startup, settled_versions())
+    if dropped:
+        matcher_logger.info(f"Re-evaluating {dropped} unmailed matches of {startup.name} made before its last edit")
+
+    ids = list(unsettled_open_opportunities(startup, settled_versions()).values_list("id", flat=True))
+    accepted = candidates = 0
+    for start in range(0, len(ids), SCORING_BATCH_SIZE):
+        chunk = ids[start:start + SCORING_BATCH_SIZE]
+        opportunities = matching_queue.claim(open_opportunities(), len(chunk), ids=chunk)
+        try:
+            chunk_accepted, chunk_candidates = score_opportunities(opportunities, startup_ids=[startup.id])
+        finally:
+            # scored rows have their new status; a failed chunk goes back to pending and is scored in full
+            matching_queue.release(opportunities)
+        accepted += chunk_accepted
+        candidates += chunk_candidates
+    return accepted, candidates
@@ -0,0 +1,31 @@
+from django.db import transaction
+from django.db.models.signals import post_save, pre_save
+from django.dispatch import receiver
+from core.logging import matcher_logger
+from .ledger import profile_hash
+from .models import Startup
+
+
+@receiver(pre_save, sender=Startup)
+def remember_previous_profile(sender, instance, raw=False, **kwargs):
+    """Keep the hash of the profile as stored before this save, so the rematch can tell whether it changed."""
+    previous = None if raw or instance.pk is None else Startup.objects.filter(pk=instance.pk).first()
+    instance._previous_profile_hash = profile_hash(previous) if previous else None
+
+
+@receiver(post_save, sender=Startup)
+def rematch_startup_on_save(sender, instance, raw=False, **kwargs):
+    """A new or edited startup is re-evaluated against open opportunities once the save commits."""
+    if raw:  # loaddata
+        return
+    from .tasks import rematch_startup_task  # tasks import the matcher, which needs the app registry ready
+    previous_hash = getattr(instance, "_previous_profile_hash", None)
+
+    def enqueue():
+        try:
+            rematch_startup_task.apply_async((instance.id, previous_hash), retry=False)  # fail fast when the broker is down
+        except Exception as e:
+            # the profile is saved either way; don't fail the admin request over the broker
+            matcher_logger.error(f"Could not queue rematch for {instance.name}: {e}")
+
+    transaction.on_commit(enqueue)
@@ -1,19 +1,60 @@
 from celery import shared_task
 import logging
-from matching.matcher import match_startups_to_opportunity
-from processing.models import ProcessedOpportunity
+from django.conf import settings
+from django.db import transaction
+from matching.batch import submit_matching_batch
+from matching.matcher import claim_llm_matching, match_startups_to_opportunity
+from matching.ledger import drop_stale_matches, profile_hash, unsettled_open_opportunities
+from matching.models import Startup
+from matching.scoring import SCORING_ENABLED, matching_queue, rescore_startup, score_pending_opportunities, settled_versions
 from core.logging import matcher_logger
 
 @shared_task
-def run_matching_task():
+def run_matching_task(opportunity_ids=None):
+    if SCORING_ENABLED:
+        # clear matches and clear misses are settled locally; only borderline pairs reach the LLM
+        score_pending_opportunities(ids=opportunity_ids)
+
+    if settings.LLM_BATCH_MODE:
+        job = submit_matching_batch(ids=opportunity_ids)
+        return f"Submitted matching batch {job.batch_id}" if job else None
+
     opp_batch = 30  # cap per run
-    opportunities = ProcessedOpportunity.objects.filter(matching_status="pending").order_by('-created_at')[:opp_batch]
+    opportunities = claim_llm_matching(opp_batch, ids=opportunity_ids)
 
-    if not opportunities.exists():
+    if not opportunities:
         matcher_logger.info("No pending opportunities for matching.")
         return
 
-    matcher_logger.info(f"Starting matching for {opportunities.count()} pending opportunities.")
-    for opp in opportunities:
-        match_startups_to_opportunity(opp)
+    matcher_logger.info(f"Starting matching for {len(opportunities)} pending opportunities.")
+    try:
+        for opp in opportunities:
+            match_startups_to_opportunity(opp)
+    finally:
+        # unparseable answers and errors go back in the queue for the next run
+        matching_queue.release(opportunities)
     matcher_logger.info("Matching process completed.")
+
+
+@shared_task(ignore_result=True)  # queued from admin saves: don't wait on the result backend
+def rematch_startup_task(startup_id, previous_profile_hash=None):
+    """
+    Evaluate only the pairs a new or edited startup profile affects, not the
+    whole portfolio. previous_profile_hash is the profile as stored before the
+    save (None for a new startup); a save that left it as it was changes nothing.
+    """
+    startup = Startup.objects.filter(id=startup_id).first()
+    if startup is None:
+        return
+    if previous_profile_hash == profile_hash(startup):
+        matcher_logger.info(f"Profile of {startup.name} unchanged, nothing to rematch")
+        return
+    if not SCORING_ENABLED:
+        # let the LLM matcher look again at the open opportunities this profile has no verdict on
+        with transaction.atomic():
+            drop_stale_matches(startup, settled_versions())
+            reopened = unsettled_open_opportunities(startup, settled_versions()).update(matching_status="pending")
+        matcher_logger.info(f"Reopened {reopened} opportunities for {startup.name}")
+    else:
+        accepted, candidates = rescore_startup(startup)
+        matcher_logger.info(f"Rematched {startup.name}: {accepted} accepted, {candidates} borderline pairs for the LLM")
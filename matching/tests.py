@@ -0,0 +1,145 @@
+import json
+from unittest import mock
+from django.test import TestCase
+from core.llm_batch import BatchBackend
+from matching.batch import submit_matching_batch
+from matching.ledger import record_verdicts
+from matching.matcher import MATCHING_PROMPT_VERSION, apply_matching_result
+from matching.models import MatchEvaluation, OpportunityMatch, Startup
+from processing.batch import poll_batches
+from processing.models import LLMBatchJob, ProcessedOpportunity
+from sources.models import RawOpportunity
+
+
+def make_opportunity(title):
+    raw = RawOpportunity.objects.create(source_type="static", source_name="test", url=f"https://example.org/{title}", raw_content="c")
+    return ProcessedOpportunity.objects.create(raw_opportunity=raw, title=title, description="d", location="Ethiopia")
+
+
+def make_startups(count):
+    return [
+        Startup.objects.create(name=f"Startup {i}", description="d", industry="Agritech", country="Ethiopia")
+        for i in range(count)
+    ]
+
+
+def answer(names, is_match=lambda i: i % 2 == 0):
+    return json.dumps({"matches": [
+        {"startup_name": name, "is_match": is_match(i), "confidence_score": 0.8, "justification": "fits"}
+        for i, name in enumerate(names)
+    ]})
+
+
+class ApplyMatchingResultTests(TestCase):
+    def assertConstantQueries(self, count):
+        opportunity = make_opportunity(f"call-{count}")
+        startups = make_startups(count)
+        content = answer([startup.name for startup in startups])
+        # savepoint, upsert matches, upsert verdicts, drop candidates, save status, release
+        with self.assertNumQueries(6):
+            self.assertTrue(apply_matching_result(opportunity, startups, content))
+        self.assertEqual(opportunity.matches.count(), (count + 1) // 2)
+        self.assertEqual(opportunity.evaluations.count(), count)
+        self.assertEqual(opportunity.matching_status, "matched")
+
+    def test_query_count_for_3_startups(self):
+        self.assertConstantQueries(3)
+
+    def test_query_count_for_30_startups(self):
+        self.assertConstantQueries(30)
+
+    def test_names_match_regardless_of_case_and_spacing(self):
+        opportunity = make_opportunity("call")
+        startups = make_startups(2)
+        apply_matching_result(opportunity, startups, answer(["  STARTUP   0 ", "startup 1"], is_match=lambda i: True))
+        self.assertEqual(
+            sorted(opportunity.matches.values_list("startup__name", flat=True)), ["Startup 0", "Startup 1"]
+        )
+
+    def test_confirmed_candidate_is_upgraded_in_place(self):
+        opportunity = make_opportunity("call")
+        startup, other = make_startups(2)
+        OpportunityMatch.objects.create(opportunity=opportunity, startup=startup, status="candidate", prescore=0.5, rank=1)
+        OpportunityMatch.objects.create(opportunity=opportunity, startup=other, status="candidate", prescore=0.4, rank=2)
+        apply_matching_result(opportunity, [startup, other], answer([startup.name, other.name], is_match=lambda i: i == 0))
+        match = opportunity.matches.get()
+        self.assertEqual((match.startup, match.status, match.prescore, match.rank), (startup, "pending", 0.5, 1))
+
+    def test_names_differing_only_in_case_are_not_attributed(self):
+        opportunity = make_opportunity("call")
+        first = Startup.objects.create(name="Green Farm", description="d", industry="Agritech")
+        second = Startup.objects.create(name="green  farm", description="d", industry="Agritech")
+        with self.assertLogs("matcher", level="WARNING"):
+            apply_matching_result(opportunity, [first, second], answer(["Green Farm"], is_match=lambda i: True))
+        self.assertFalse(opportunity.matches.exists())
+        self.assertFalse(MatchEvaluation.objects.filter(opportunity=opportunity).exists())
+
+    def test_unparseable_answer_leaves_the_opportunity_pending(self):
+        opportunity = make_opportunity("call")
+        self.assertFalse(apply_matching_result(opportunity, make_startups(1), "not json"))
+        opportunity.refresh_from_db()
+        self.assertEqual(opportunity.matching_status, "pending")
+
+
+class InMemoryBatchBackend(BatchBackend):
+    """Keeps submitted batches in memory; answer(custom_id) gives each request's content (None = failed)."""
+
+    def __init__(self, answer):
+        self.answer = answer
+        self.batches = {}
+
+    def submit(self, jsonl, metadata=None):
+        batch_id = f"batch_{len(self.batches)}"
+        self.batches[batch_id] = [json.loads(line)["custom_id"] for line in jsonl.splitlines()]
+        return batch_id
+
+    def poll(self, batch_id):
+        return "completed", {custom_id: self.answer(custom_id) for custom_id in self.batches[batch_id]}
+
+
+class MatchingBatchTests(TestCase):
+    def setUp(self):
+        self.startups = make_startups(2)
+        self.opportunities = [make_opportunity(f"call-{i}") for i in range(2)]
+        for opportunity in self.opportunities:
+            opportunity.matching_status = "borderline"
+            opportunity.save()
+            for startup in self.startups:
+                OpportunityMatch.objects.create(opportunity=opportunity, startup=startup, status="candidate", prescore=0.6)
+
+    def statuses(self):
+        return [o.matching_status for o in ProcessedOpportunity.objects.order_by("id")]
+
+    def test_partial_results_are_applied_and_failed_requests_go_back_to_pending(self):
+        first, second = self.opportunities
+        backend = InMemoryBatchBackend(
+            lambda custom_id: answer([s.name for s in self.startups], is_match=lambda i: i == 0)
+            if custom_id == str(first.id) else None
+        )
+        job = submit_matching_batch(backend=backend)
+        self.assertEqual(self.statuses(), ["batched", "batched"])
+        self.assertEqual(poll_batches(backend=backend), 1)
+        self.assertEqual(self.statuses(), ["matched", "pending"])
+        self.assertEqual(list(first.matches.values_list("startup__name", "status")), [("Startup 0", "pending")])
+        self.assertEqual(second.matches.filter(status="candidate").count(), 2)  # still waiting for a verdict
+        job.refresh_from_db()
+        self.assertEqual(job.status, "applied")
+
+    def test_recording_failure_after_upload_leaves_items_claimable(self):
+        backend = InMemoryBatchBackend(lambda custom_id: None)
+        with mock.patch("processing.batch.mark_batched", side_effect=RuntimeError("db down")):
+            with self.assertRaises(RuntimeError):
+                submit_matching_batch(backend=backend)
+        self.assertEqual(len(backend.batches), 1)
+        self.assertFalse(LLMBatchJob.objects.exists())
+        self.assertEqual(self.statuses(), ["pending", "pending"])
+
+    def test_opportunity_with_every_pair_settled_as_no_match_stays_no_match(self):
+        OpportunityMatch.objects.all().delete()
+        first, second = self.opportunities
+        record_verdicts([(first, startup, False, 0.1) for startup in self.startups], MATCHING_PROMPT_VERSION, "llm")
+        second.matching_status = "matched"
+        second.save()
+        backend = InMemoryBatchBackend(lambda custom_id: None)
+        self.assertIsNone(submit_matching_batch(backend=backend))
+        self.assertEqual(self.statuses(), ["no match", "matched"])
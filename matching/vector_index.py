@@ -0,0 +1,156 @@
+import os
+import threading
+import numpy as np
+from django.db.models import F, Max, Q
+from core.embeddings import EMBEDDING_MODEL, embed_texts
+from core.logging import matcher_logger
+from .models import OpportunityEmbedding, Startup, StartupEmbedding
+
+
+# -------------------- Config --------------------
+MATCH_TOP_K = int(os.getenv("MATCH_TOP_K", 10))  # startups sent to the LLM per opportunity
+
+
+def startup_text(startup):
+    return f"{startup.name}. {startup.industry}. {startup.keywords or ''}. {startup.country or ''}. {startup.description}"
+
+
+def opportunity_text(opportunity):
+    return (
+        f"{opportunity.title}. {opportunity.category or ''}. {opportunity.location or ''}. "
+        f"{opportunity.eligibility or ''}. {opportunity.description}"
+    )
+
+
+def to_bytes(vector):
+    return np.asarray(vector, dtype=np.float32).tobytes()
+
+
+def from_bytes(data):
+    return np.frombuffer(bytes(data), dtype=np.float32)
+
+
+def refresh_startup_embeddings():
+    """Encode startups that are new, edited since their last encoding, or encoded with another model."""
+    stale = list(Startup.objects.filter(
+        Q(embedding__isnull=True)
+        | Q(embedding__profile_updated_at__lt=F("updated_at"))
+        | ~Q(embedding__model_name=EMBEDDING_MODEL)
+    ))
+    if not stale:
+        return 0
+    vectors = embed_texts([startup_text(startup) for startup in stale])
+    StartupEmbedding.objects.bulk_create(
+        [
+            StartupEmbedding(
+                startup=startup,
+                vector=to_bytes(vector),
+                model_name=EMBEDDING_MODEL,
+                profile_updated_at=startup.updated_at,
+            )
+            for startup, vector in zip(stale, vectors)
+        ],
+        update_conflicts=True,
+        unique_fields=["startup"],
+        update_fields=["vector", "model_name", "profile_updated_at"],
+    )
+    matcher_logger.info(f"Encoded {len(stale)} new or updated startup profiles")
+    return len(stale)
+
+
+def opportunity_vectors(opportunities):
+    """{opportunity id: vector}, encoding (and storing) the ones not embedded yet in one batch."""
+    opportunities = list(opportunities)
+    stored = {
+        row.opportunity_id: from_bytes(row.vector)
+        for row in OpportunityEmbedding.objects.filter(
+            opportunity__in=opportunities, model_name=EMBEDDING_MODEL
+        )
+    }
+    missing = [opportunity for opportunity in opportunities if opportunity.id not in stored]
+    if missing:
+        vectors = embed_texts([opportunity_text(opportunity) for opportunity in missing])
+        OpportunityEmbedding.objects.bulk_create(
+            [
+                OpportunityEmbedding(opportunity=opportunity, vector=to_bytes(vector), model_name=EMBEDDING_MODEL)
+                for opportunity, vector in zip(missing, vectors)
+            ],
+            update_conflicts=True,
+            unique_fields=["opportunity"],
+            update_fields=["vector", "model_name"],
+        )
+        stored.update({opportunity.id: vector for opportunity, vector in zip(missing, vectors)})
+    return stored
+
+
+class StartupIndex:
+    """In-memory matrix of startup vectors (one row per startup), reloaded only when the table changes."""
+
+    def __init__(self):
+        self.ids = np.zeros(0, dtype=np.int64)
+        self.matrix = np.zeros((0, 0), dtype=np.float32)
+        self.version = None
+        self._lock = threading.Lock()
+
+    def _current_version(self):
+        stats = StartupEmbedding.objects.filter(model_name=EMBEDDING_MODEL).aggregate(
+            latest=Max("profile_updated_at"), total=Max("id")
+        )
+        return (StartupEmbedding.objects.count(), stats["latest"], stats["total"])
+
+    def refresh(self):
+        refresh_startup_embeddings()
+        version = self._current_version()
+        with self._lock:
+            if version == self.version:
+                return self
+            rows = list(StartupEmbedding.objects.filter(model_name=EMBEDDING_MODEL).values_list("startup_id", "vector"))
+            self.ids = np.array([startup_id for startup_id, _ in rows], dtype=np.int64)
+            self.matrix = np.vstack([from_bytes(vector) for _, vector in rows]) if rows else np.zeros((0, 0), dtype=np.float32)
+            self.version = version
+        return self
+
+    def top_k(self, vector, k, candidate_ids=None):
+        """[(startup id, cosine similarity)] of the k most similar startups, best first."""
+        if not len(self.ids):
+            return []
+        scores = self.matrix @ vector
+        if candidate_ids is not None:
+            mask = np.isin(self.ids, list(candidate_ids))
+            scores = np.where(mask, scores, -np.inf)
+        k = min(k, int(np.isfinite(scores).sum()))
+        if k <= 0:
+            return []
+        best = np.argpartition(-scores, k - 1)[:k]
+        best = best[np.argsort(-scores[best])]
+        return [(int(self.ids[i]), float(scores[i])) for i in best]
+
+
+_index = None
+_index_pid = None
+
+
+def get_startup_index():
+    """The startup index for this process, brought up to date with the Startup table."""
+    global _index, _index_pid
+    if _index is None or _index_pid != os.getpid():
+        _index = StartupIndex()
+        _index_pid = os.getpid()
+    return _index.refresh()
+
+
+def shortlist_startups(opportunity, startups, k=MATCH_TOP_K):
+    """
+    Narrow the candidate startups queryset to the k profiles most similar to the
+    opportunity, so prompt size stays flat as the portfolio grows.
+    """
+    candidate_ids = set(startups.values_list("id", flat=True))
+    if len(candidate_ids) <= k:
+        return startups
+    vector = opportunity_vectors([opportunity])[opportunity.id]
+    ranked = get_startup_index().top_k(vector, k, candidate_ids)
+    matcher_logger.info(
+        f"Shortlisted {len(ranked)}/{len(candidate_ids)} startups for {opportunity.title} "
+        f"(best similarity {ranked[0][1]:.2f})" if ranked else f"No indexed startups for {opportunity.title}"
+    )
+    return Startup.objects.filter(id__in=[startup_id for startup_id, _ in ranked])
@@ -156,6 +156,7 @@ def send_central_digest():
     top_opportunity_ids = (
         OpportunityMatch.objects
         .filter(mailed_at__isnull=True)
+        .exclude(status="candidate")  # pre-scored pairs the LLM hasn't confirmed yet
         .values('opportunity')
         .annotate(max_confidence=Max('confidence_score'))
         .order_by('-max_confidence')[:6]  # Take top 6 opportunities
@@ -170,6 +171,7 @@ def send_central_digest():
     pending_matches = (
         OpportunityMatch.objects
         .filter(opportunity_id__in=top_opportunity_ids, mailed_at__isnull=True)
+        .exclude(status="candidate")
         .select_related('opportunity', 'startup')
     )
 
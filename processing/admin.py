@@ -1,5 +1,7 @@
 from django.contrib import admin
-from .models import ProcessedOpportunity , CleanedOpportunity
+from .models import ProcessedOpportunity , CleanedOpportunity, LLMBatchJob, LLMResponseCache
 
 admin.site.register(ProcessedOpportunity)
-admin.site.register(CleanedOpportunity)
\ No newline at end of file
+admin.site.register(CleanedOpportunity)
+admin.site.register(LLMBatchJob)
+admin.site.register(LLMResponseCache)
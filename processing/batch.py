@@ -0,0 +1,126 @@
+from django.db import transaction
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from core.llm_batch import build_batch_request, get_batch_backend, to_jsonl
+from core.logging import llm_extractor_logger
+from core.pipeline import enqueue_stage
+from processing.llm_extractor import EXTRACTION_MODEL, EXTRACTION_RESPONSE_FORMAT, apply_extraction_result, build_extraction_messages, awaiting_matching, extraction_queue, pending_extraction_queryset
+from processing.models import CleanedOpportunity, LLMBatchJob, ProcessedOpportunity
+from processing.prefilter import prefilter_items
+from processing.relevance import relevance_filter
+
+
+MAX_BATCH_ITEMS = 5000  # well under the Batch API's 50k requests / 200 MB per file
+
+# kind -> function(job, results) that applies a completed batch
+BATCH_APPLIERS = {
+    "extraction": "processing.batch.apply_extraction_batch",
+    "matching": "matching.batch.apply_matching_batch",
+}
+
+
+def submit_batch(kind, requests, item_ids, backend=None):
+    """
+    Upload the requests as one batch, then record the job and move item_ids to
+    "batched" in one transaction. The upload happens outside any transaction:
+    a paid batch must never be orphaned by a rollback that sends its items
+    out again.
+    """
+    backend = backend or get_batch_backend()
+    batch_id = backend.submit(to_jsonl(requests), metadata={"kind": kind})
+    try:
+        with transaction.atomic():
+            job = LLMBatchJob.objects.create(kind=kind, batch_id=batch_id, item_ids=item_ids)
+            mark_batched(kind, item_ids)
+    except Exception:
+        llm_extractor_logger.error(f"{kind} batch {batch_id} was uploaded but could not be recorded; cancel it with the provider")
+        raise
+    llm_extractor_logger.info(f"Submitted {kind} batch {batch_id} with {len(item_ids)} requests")
+    return job
+
+
+def submit_extraction_batch(limit=MAX_BATCH_ITEMS, backend=None, ids=None):
+    claimed = extraction_queue.claim(pending_extraction_queryset(), limit, ids=ids)
+    try:
+        items = relevance_filter(prefilter_items(claimed))
+        if not items:
+            llm_extractor_logger.info("No pending items to batch.")
+            return None
+
+        requests = [
+            build_batch_request(
+                str(item.id),
+                model=EXTRACTION_MODEL,
+                messages=build_extraction_messages(item),
+                response_format=EXTRACTION_RESPONSE_FORMAT,
+            )
+            for item in items
+        ]
+        return submit_batch("extraction", requests, [item.id for item in items], backend)
+    finally:
+        # only reached by items still in progress: a failed upload
+        extraction_queue.release(claimed)
+
+
+def apply_extraction_batch(job, results):
+    from matching.tasks import run_matching_task  # imported here: matching imports this module
+    applied = 0
+    items = list(CleanedOpportunity.objects.filter(id__in=job.item_ids, status="batched").select_related("raw_opportunity"))
+    for item in items:
+        content = results.get(str(item.id))
+        if content is None:
+            # request failed inside the batch; put it back for the next run
+            item.status = "pending"
+            item.save(update_fields=["status"])
+            continue
+        try:
+            apply_extraction_result(item, content)
+            applied += 1
+        except Exception as e:
+            item.status = "pending"
+            item.save(update_fields=["status"])
+            llm_extractor_logger.error(f"Error applying batch result for {item.url}: {e}", exc_info=True)
+    enqueue_stage(run_matching_task, awaiting_matching(items), llm_extractor_logger)
+    return applied
+
+
+def mark_batched(kind, item_ids):
+    if kind == "extraction":
+        CleanedOpportunity.objects.filter(id__in=item_ids).update(status="batched")
+    else:
+        ProcessedOpportunity.objects.filter(id__in=item_ids).update(matching_status="batched")
+
+
+def release_items(job):
+    """Return a failed batch's items to the pending queue."""
+    if job.kind == "extraction":
+        CleanedOpportunity.objects.filter(id__in=job.item_ids, status="batched").update(status="pending")
+    else:
+        ProcessedOpportunity.objects.filter(id__in=job.item_ids, matching_status="batched").update(matching_status="pending")
+
+
+def poll_batches(backend=None):
+    """Check every submitted batch once and apply the ones that have completed."""
+    backend = backend or get_batch_backend()
+    finished = 0
+    for job in LLMBatchJob.objects.filter(status="submitted").order_by("submitted_at"):
+        try:
+            status, results = backend.poll(job.batch_id)
+        except Exception as e:
+            llm_extractor_logger.error(f"Polling batch {job.batch_id} failed: {e}", exc_info=True)
+            continue
+
+        if status == "in_progress":
+            continue
+        if status == "failed":
+            release_items(job)
+            job.status = "failed"
+            llm_extractor_logger.warning(f"{job.kind} batch {job.batch_id} failed, {len(job.item_ids)} items back to pending")
+        else:
+            applied = import_string(BATCH_APPLIERS[job.kind])(job, results)
+            job.status = "applied"
+            llm_extractor_logger.info(f"Applied {applied}/{len(job.item_ids)} results from {job.kind} batch {job.batch_id}")
+        job.completed_at = timezone.now()
+        job.save(update_fields=["status", "completed_at"])
+        finished += 1
+    return finished
@@ -2,14 +2,48 @@ from core.utils import init_django
 init_django()
 
 from sources.models import RawOpportunity
+from sources.blob_store import load_raw_html
 from processing.models import CleanedOpportunity
+from processing.dedup import content_hash, find_originals, cluster_near_duplicates
 from bs4 import BeautifulSoup
+from lxml import etree
+import multiprocessing
+import os
 import re
+from html.entities import html5 as HTML5_ENTITIES
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from django.db import transaction
+from core.llm import estimate_tokens
 from core.logging import cleaner_logger
+from core.work_queue import WorkQueue
 
 
-def clean_html(html_content):
-    """Extract visible text from raw HTML and remove scripts/styles."""
+# tags whose text BeautifulSoup's get_text() never returns (decomposed, or non-default string containers)
+SKIPPED_TAGS = {"script", "style", "noscript", "template", "rt", "rp"}
+CLEANER_WORKERS = os.cpu_count() or 1
+MIN_PARALLEL_PAGES = 4  # below this, forking workers costs more than it saves
+
+raw_queue = WorkQueue(RawOpportunity, cleaner_logger)
+
+# libxml2 keeps the content of these as raw text where html.parser reads tags and entities in it
+RAW_TEXT_TAGS = ("title", "textarea", "xmp", "plaintext", "iframe", "noembed", "noframes")
+
+_XML_DECLARATION_RE = re.compile(r"^\s*<\?xml[^>]*\?>")
+_CHAR_REF_RE = re.compile(r"&(?:#([0-9]+)|#[xX]([0-9a-fA-F]+)|([A-Za-z][A-Za-z0-9]*))(;?)")
+# entities HTML allows without the ';' (&copy, &amp, ...); libxml2 also decodes them as a prefix (&copyx)
+_LEGACY_ENTITY_RE = re.compile("|".join(sorted((name for name in HTML5_ENTITIES if not name.endswith(";")), key=len, reverse=True)))
+_HTML_PARSER = etree.HTMLParser()
+
+
+def _normalize_text(text):
+    # Clean excessive whitespace and line breaks
+    text = re.sub(r'\n+', '\n', text)
+    return re.sub(r'\s+', ' ', text).strip()
+
+
+def clean_html_bs4(html_content):
+    """Reference cleaner (BeautifulSoup + html.parser); clean_html falls back to it on inputs lxml can't mirror."""
     soup = BeautifulSoup(html_content, "html.parser")
 
     # Remove <script> and <style> tags
@@ -18,39 +52,395 @@ def clean_html(html_content):
 
     # Get visible text
     text = soup.get_text(separator="\n")
+    return _normalize_text(text)
 
-    # Clean excessive whitespace and line breaks
-    text = re.sub(r'\n+', '\n', text)
-    text = re.sub(r'\s+', ' ', text).strip()
 
-    return text
+def _char_refs_decode_alike(html_content):
+    """
+    False when the page has a character reference the two parsers decode
+    differently: unknown names (html.parser keeps them, minus the ';'), legacy
+    names without ';' followed by more letters, references cut off by the end
+    of the page, numeric ones without ';' and code points lxml replaces with
+    U+FFFD (NUL, surrogates, out of range). Other stray '&' (R&D, a=1&b=2) read
+    the same in both.
+    """
+    for match in _CHAR_REF_RE.finditer(html_content):
+        decimal, hexadecimal, name, semicolon = match.groups()
+        if not semicolon:
+            if match.end() == len(html_content) or not name or _LEGACY_ENTITY_RE.match(name):
+                return False
+        elif name:
+            if f"{name};" not in HTML5_ENTITIES:
+                return False
+        else:
+            code = int(decimal) if decimal else int(hexadecimal, 16)
+            if code == 0 or 0xD800 <= code <= 0xDFFF or code > 0x10FFFF:
+                return False
+    return True
 
-def process_raw_opportunities(batch_size=50):
-    raw_entries = RawOpportunity.objects.filter(
-        status="pending"
-    )
 
-    if not raw_entries.exists():
-        cleaner_logger.info("No pending raw opportunities to process.")
+def _top_level_elements(root):
+    # libxml2 opens another top-level <html> for content that follows </html>
+    return [root, *(node for node in root.itersiblings() if isinstance(node.tag, str))]
+
+
+def _parse_html(html_content):
+    """lxml tree of the page, or None when the reference cleaner must be used instead."""
+    if not html_content or "<![CDATA[" in html_content or "\x00" in html_content:
+        return None
+    if "&" in html_content and not _char_refs_decode_alike(html_content):
+        return None
+    try:
+        root = etree.fromstring(_XML_DECLARATION_RE.sub("", html_content, count=1), _HTML_PARSER)
+    except (etree.ParserError, etree.XMLSyntaxError, ValueError):
+        return None
+    if root is None:
+        return None
+    for element in _top_level_elements(root):
+        for raw in element.iter(*RAW_TEXT_TAGS):
+            # markup or entities inside raw text read differently; plain text in them is the same
+            if raw.text and ("<" in raw.text or "&" in raw.text):
+                return None
+    return root
+
+
+def _clean_tree(root, html_content):
+    if root is None:
+        return clean_html_bs4(html_content) if html_content else ""
+    return _normalize_text("\n".join(
+        part for element in _top_level_elements(root) for part in _visible_text_parts(element)
+    ))
+
+
+def clean_html(html_content):
+    """
+    Extract visible text from raw HTML and remove scripts/styles.
+
+    Parses with lxml and walks the tree once, skipping script/style subtrees,
+    instead of building a BeautifulSoup tree; output is the same as
+    clean_html_bs4 (golden cases in processing/tests.py). Inputs the two
+    parsers read differently go through the reference cleaner: CDATA sections
+    (which libxml2 drops in HTML), NUL bytes, character references they decode
+    differently, raw-text elements holding markup, and documents lxml refuses.
+    One known gap: a stray tag libxml2 ignores (e.g. </p> with no open <p>)
+    wedged between two words without whitespace doesn't separate them.
+    """
+    return _clean_tree(_parse_html(html_content), html_content)
+
+
+def _visible_text_parts(root):
+    """Text nodes under root in document order, skipping SKIPPED_TAGS subtrees and root's own tail."""
+    parts = []
+    walker = etree.iterwalk(root, events=("start", "end", "comment", "pi"))
+    for event, element in walker:
+        if event in ("comment", "pi"):
+            if element.tail:
+                parts.append(element.tail)
+        elif event == "start":
+            if element.tag in SKIPPED_TAGS:
+                walker.skip_subtree()
+            elif element.text:
+                parts.append(element.text)
+        elif element.tail and element is not root:
+            parts.append(element.tail)
+    return parts
+
+
+# -------------------- Main-content extraction --------------------
+BOILERPLATE_TAGS = {"nav", "header", "footer", "aside", "form", "button", "select", "iframe", "svg"}
+# page-level containers are never dropped, whatever their class says (<body class="right-sidebar">)
+STRUCTURAL_TAGS = {"html", "body", "main", "article"}
+BOILERPLATE_RE = re.compile(
+    r"cookie|consent|banner|menu|navbar|breadcrumb|footer|header|sidebar|widget|related|share|social|"
+    r"comment|popup|modal|newsletter|subscribe|promo|advert|sponsor|pagination|skip-link",
+    re.IGNORECASE,
+)
+CONTENT_HINT_RE = re.compile(r"article|content|main|post|entry|body|story|opportunit|grant|call", re.IGNORECASE)
+TEXT_BLOCK_TAGS = {"p", "li", "td", "pre", "blockquote", "dd", "h2", "h3", "h4"}
+CANDIDATE_TAGS = {"div", "section", "article", "main", "td", "ul", "ol", "table", "body"}
+MIN_BLOCK_CHARS = 25
+MIN_MAIN_CONTENT_CHARS = 250
+MAX_HEADINGS = 20
+MAX_DATES = 15
+
+DATE_RE = re.compile(
+    r"\b\d{4}-\d{2}-\d{2}\b"
+    r"|\b\d{1,2}(?:st|nd|rd|th)?\s+(?:Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Sept|Oct|Nov|Dec)[a-z]*\.?,?\s+\d{4}\b"
+    r"|\b(?:Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Sept|Oct|Nov|Dec)[a-z]*\.?\s+\d{1,2}(?:st|nd|rd|th)?,?\s+\d{4}\b"
+    r"|\b\d{1,2}/\d{1,2}/\d{4}\b",
+    re.IGNORECASE,
+)
+
+
+def _element_text(element):
+    return _normalize_text("\n".join(_visible_text_parts(element)))
+
+
+def _is_boilerplate(element):
+    if element.tag in STRUCTURAL_TAGS:
+        return False
+    if element.tag in BOILERPLATE_TAGS:
+        return True
+    hints = f"{element.get('class', '')} {element.get('id', '')} {element.get('role', '')}"
+    return bool(hints.strip()) and bool(BOILERPLATE_RE.search(hints)) and not CONTENT_HINT_RE.search(hints)
+
+
+def _text_stats(root):
+    """
+    Visible text length and in-link text length of every element, computed in a
+    single post-order pass so scoring never re-walks a subtree.
+    """
+    lengths, link_lengths = {}, {}
+    for _, element in etree.iterwalk(root, events=("end",)):
+        if element.tag in SKIPPED_TAGS:
+            lengths[element] = link_lengths[element] = 0
+            continue
+        length = len((element.text or "").strip())
+        link_length = 0
+        for child in element:
+            length += lengths.get(child, 0) + len((child.tail or "").strip())
+            link_length += link_lengths.get(child, 0)
+        lengths[element] = length
+        link_lengths[element] = length if element.tag == "a" else link_length
+    return lengths, link_lengths
+
+
+def _best_content_node(body):
+    """
+    Readability-style scoring: every text block credits its parent fully and its
+    grandparent by half (more for commas and length); candidates are then
+    discounted by the share of their text that sits in links.
+    """
+    lengths, link_lengths = _text_stats(body)
+    scores = {}
+    for block in body.iter(*TEXT_BLOCK_TAGS):
+        if lengths.get(block, 0) < MIN_BLOCK_CHARS:
+            continue
+        text = _element_text(block)
+        score = 1 + text.count(",") + min(len(text) // 100, 3)
+        parent = block.getparent()
+        if parent is None:
+            continue
+        scores[parent] = scores.get(parent, 0) + score
+        grandparent = parent.getparent()
+        if grandparent is not None:
+            scores[grandparent] = scores.get(grandparent, 0) + score / 2
+
+    best, best_score = None, 0
+    for node, score in scores.items():
+        if node.tag not in CANDIDATE_TAGS and node.tag not in TEXT_BLOCK_TAGS:
+            continue
+        hints = f"{node.get('class', '')} {node.get('id', '')}"
+        if CONTENT_HINT_RE.search(hints):
+            score *= 1.25
+        length = lengths.get(node, 0)
+        link_density = min(link_lengths.get(node, 0) / length, 1.0) if length else 1.0
+        score *= 1 - link_density
+        if score > best_score:
+            best, best_score = node, score
+    return best
+
+
+def _page_metadata(root, full_text):
+    title = root.findtext(".//title") or ""
+    og_title = root.xpath("string(//meta[@property='og:title']/@content)")
+    headings = []
+    for heading in root.iter("h1", "h2", "h3"):
+        text = _element_text(heading)
+        if text and text not in headings:
+            headings.append(text)
+        if len(headings) >= MAX_HEADINGS:
+            break
+    dates = list(dict.fromkeys(match.group(0) for match in DATE_RE.finditer(full_text)))[:MAX_DATES]
+    return {
+        "title": _normalize_text(og_title or title) or (headings[0] if headings else ""),
+        "headings": headings,
+        "dates": dates,
+    }
+
+
+def _drop_tree(element):
+    """Remove element and its subtree, keeping its tail text in place."""
+    parent = element.getparent()
+    if element.tail:
+        previous = element.getprevious()
+        if previous is not None:
+            previous.tail = (previous.tail or "") + element.tail
+        else:
+            parent.text = (parent.text or "") + element.tail
+    parent.remove(element)
+
+
+def extract_main_content(html_content, cleaned_text=None, root=None):
+    """
+    Compact main-body text plus a metadata block for the LLM.
+
+    Menus, cookie banners, related-post lists, footers and other link-heavy
+    blocks are dropped, and the densest text container is kept. Falls back to
+    the full cleaned text when no convincing main block is found. Returns
+    {"main_text", "metadata": {title, headings, dates, tokens: {full, main}}}.
+    The parsed tree is modified in place.
+    """
+    root = _parse_html(html_content) if root is None else root
+    cleaned_text = _clean_tree(root, html_content) if cleaned_text is None else cleaned_text
+    main_text = ""
+    metadata = {"title": "", "headings": [], "dates": []}
+
+    if root is not None:
+        metadata = _page_metadata(root, cleaned_text)
+        for element in list(root.iter(etree.Element)):
+            if element.getparent() is not None and _is_boilerplate(element):
+                _drop_tree(element)
+        body = root.find("body")
+        node = _best_content_node(body if body is not None else root)
+        if node is not None:
+            main_text = _element_text(node)
+
+    if len(main_text) < MIN_MAIN_CONTENT_CHARS:
+        main_text = cleaned_text
+    metadata["tokens"] = {"full": estimate_tokens(cleaned_text), "main": estimate_tokens(main_text)}
+    return {"main_text": main_text, "metadata": metadata}
+
+
+def clean_document(html_content):
+    """Full cleaned text plus main-content extraction for one page, from a single parse (runs in pool workers)."""
+    root = _parse_html(html_content)
+    cleaned_text = _clean_tree(root, html_content)
+    if not cleaned_text:
+        return cleaned_text, None
+    return cleaned_text, extract_main_content(html_content, cleaned_text, root)
+
+
+def _can_fork_workers():
+    # daemonic processes (e.g. some worker pools) may not have children
+    return not multiprocessing.current_process().daemon
+
+
+def clean_many(html_contents, pool=None, cleaner=clean_html):
+    """
+    Clean HTML documents, in parallel when a process pool is given. Serially,
+    documents are read from the iterable one at a time as they are cleaned.
+    """
+    if pool is not None:
+        html_contents = list(html_contents)  # the pool submits every document up front anyway
+    if pool is None or len(html_contents) < MIN_PARALLEL_PAGES:
+        return [cleaner(html) for html in html_contents]
+    chunksize = max(1, len(html_contents) // (CLEANER_WORKERS * 4))
+    return list(pool.map(cleaner, html_contents, chunksize=chunksize))
+
+
+@contextmanager
+def cleaner_pool():
+    """Process pool sized to the machine, or None where worker processes can't be forked."""
+    if CLEANER_WORKERS < 2 or not _can_fork_workers():
+        yield None
         return
-    
-    cleaner_logger.info(f"Processing {len(raw_entries)} raw opportunities")
+    try:
+        pool = ProcessPoolExecutor(max_workers=CLEANER_WORKERS)
+    except (OSError, AssertionError) as e:
+        cleaner_logger.warning(f"Could not start cleaner pool, cleaning serially: {e}")
+        yield None
+        return
+    try:
+        yield pool
+    finally:
+        pool.shutdown()
+
 
-    for raw in raw_entries:
-        cleaned_text = clean_html(raw.raw_content)
-        if cleaned_text: 
-            CleanedOpportunity.objects.create(
-                raw_opportunity=raw,
-                source_name=raw.source_name,
-                url=raw.url,
-                cleaned_content=cleaned_text
-            )
-            raw.status = "cleaned"
+def _clean_chunk(raw_chunk, pool=None):
+    """
+    Clean one chunk of RawOpportunity rows and persist it with bulk writes in a
+    single transaction. Returns the ids of the CleanedOpportunity rows created.
+    """
+    cleaned_rows = []
+    documents = clean_many(load_raw_html(raw_chunk), pool, cleaner=clean_document)
+    for raw, (cleaned_text, main) in zip(raw_chunk, documents):
+        raw.raw_content = None  # release the HTML as soon as it is cleaned
+        if cleaned_text:
+            cleaned_rows.append((raw, cleaned_text, main, content_hash(cleaned_text)))
 
-        raw.save()
-        cleaner_logger.info(f"Updated status for: {raw.url}")
-    cleaner_logger.info("Processing Raw Opportunities complete.")
+    originals = find_originals({digest for _, _, _, digest in cleaned_rows})
+    firsts, duplicates = [], []
+    full_tokens = main_tokens = 0
+    for raw, cleaned_text, main, digest in cleaned_rows:
+        cleaned = CleanedOpportunity(
+            raw_opportunity=raw,
+            source_name=raw.source_name,
+            url=raw.url,
+            cleaned_content=cleaned_text,
+            main_content=main["main_text"],
+            content_metadata=main["metadata"],
+            content_hash=digest,
+        )
+        full_tokens += main["metadata"]["tokens"]["full"]
+        main_tokens += main["metadata"]["tokens"]["main"]
+        if digest in originals:
+            duplicates.append(cleaned)
+        else:
+            # first copy of this content in the chunk becomes the original for the rest
+            originals[digest] = cleaned
+            firsts.append(cleaned)
+        raw.status = "cleaned"
+
+    with transaction.atomic():
+        CleanedOpportunity.objects.bulk_create(firsts)
+        for cleaned in duplicates:
+            original = originals[cleaned.content_hash]
+            cleaned.duplicate_of_id = original.id
+            cleaned.status = "duplicate"
+            cleaner_logger.info(f"Duplicate content: {cleaned.url} -> {original.url}")
+        CleanedOpportunity.objects.bulk_create(duplicates)
+        RawOpportunity.objects.bulk_update([raw for raw, _, _, _ in cleaned_rows], ["status"])
+    if full_tokens:
+        cleaner_logger.info(
+            f"Main-content extraction: ~{full_tokens} -> ~{main_tokens} tokens "
+            f"({100 * (1 - main_tokens / full_tokens):.0f}% reduction) for {len(cleaned_rows)} pages"
+        )
+    return [cleaned.id for cleaned in firsts + duplicates]
+
+
+def process_raw_opportunities(batch_size=200, raw_ids=None):
+    """
+    Clean every pending RawOpportunity (or just the pending ones among raw_ids),
+    batch_size rows at a time, and return the ids of the new CleanedOpportunity rows.
+    Rows are claimed with keyset pagination on id and only the needed columns, so
+    memory stays flat however large the pending backlog is; each chunk is
+    cleaned across a process pool. Chunks claimed by another cleaner are skipped.
+    """
+    with cleaner_pool() as pool:
+        return _process_pending(batch_size, pool, raw_ids)
+
+
+def _process_pending(batch_size, pool, raw_ids=None):
+    last_id = 0
+    seen = 0
+    cleaned_ids = []
+    while True:
+        raw_chunk = raw_queue.claim(
+            RawOpportunity.objects
+            .filter(status="pending", id__gt=last_id)
+            .order_by("id")
+            .only("id", "source_name", "url", "raw_content", "content_hash", "status"),
+            batch_size,
+            ids=raw_ids,
+        )
+        if not raw_chunk:
+            break
+        last_id = raw_chunk[-1].id
+        try:
+            cleaned_ids += _clean_chunk(raw_chunk, pool)
+        finally:
+            raw_queue.release(raw_chunk)  # pages that gave no text stay pending, as before
+        seen += len(raw_chunk)
+        cleaner_logger.info(f"Cleaned chunk up to id {last_id} ({len(cleaned_ids)}/{seen} so far)")
+
+    if not seen:
+        cleaner_logger.info("No pending raw opportunities to process.")
+        return []
+    cleaner_logger.info(f"Processing Raw Opportunities complete. Cleaned {len(cleaned_ids)} of {seen}.")
+    return cleaned_ids
 
 
 if __name__ == "__main__":
     process_raw_opportunities()
+    cluster_near_duplicates()
@@ -0,0 +1,175 @@
+import hashlib
+import re
+from collections import Counter
+from django.db import connection, transaction
+from django.db.models import Q
+from processing.models import CleanedOpportunity, SimHashBand
+from core.logging import cleaner_logger
+
+
+def content_hash(cleaned_text):
+    """sha256 of cleaned page text; identical pages collapse to one hash whatever URL they came from."""
+    return hashlib.sha256(cleaned_text.encode("utf-8")).hexdigest()
+
+
+def find_originals(digests):
+    """Map each content hash to the first non-duplicate CleanedOpportunity that has it, in one query."""
+    originals = {}
+    rows = (
+        CleanedOpportunity.objects
+        .filter(content_hash__in=list(digests), duplicate_of__isnull=True)
+        .exclude(status="duplicate")
+        .order_by("id")
+        .only("id", "url", "content_hash")
+    )
+    for row in rows:
+        originals.setdefault(row.content_hash, row)
+    return originals
+
+
+# -------------------- Near-duplicate detection --------------------
+SIMHASH_BITS = 64
+SIMHASH_BANDS = 4              # 4 x 16-bit bands: any pair within 3 bits shares at least one band
+SIMHASH_MAX_DISTANCE = 3
+SHINGLE_SIZE = 3
+# pg_advisory_xact_lock key that serializes band index lookups and inserts across workers
+BAND_INDEX_LOCK_ID = 0x53494D48
+BAND_BITS = SIMHASH_BITS // SIMHASH_BANDS
+BAND_MASK = (1 << BAND_BITS) - 1
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def simhash(text):
+    """64-bit SimHash over word shingles of the cleaned text."""
+    words = _WORD_RE.findall(text.lower())
+    shingles = Counter(
+        " ".join(words[i:i + SHINGLE_SIZE]) for i in range(max(len(words) - SHINGLE_SIZE + 1, 1))
+    )
+    weights = [0] * SIMHASH_BITS
+    for shingle, count in shingles.items():
+        h = int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest(), "big")
+        for bit in range(SIMHASH_BITS):
+            weights[bit] += count if h >> bit & 1 else -count
+    return sum(1 << bit for bit, weight in enumerate(weights) if weight > 0)
+
+
+def to_signed(value):
+    return value - (1 << 64) if value >= 1 << 63 else value
+
+
+def to_unsigned(value):
+    return value + (1 << 64) if value < 0 else value
+
+
+def simhash_bands(value):
+    return [(band, value >> (band * BAND_BITS) & BAND_MASK) for band in range(SIMHASH_BANDS)]
+
+
+def hamming_distance(a, b):
+    return bin(a ^ b).count("1")
+
+
+def find_near_duplicate(value):
+    """Closest indexed document within SIMHASH_MAX_DISTANCE bits, found through the band index."""
+    band_filter = Q()
+    for band, key in simhash_bands(value):
+        band_filter |= Q(band=band, key=key)
+    candidate_ids = SimHashBand.objects.filter(band_filter).values_list("cleaned_opportunity_id", flat=True).distinct()
+    candidates = CleanedOpportunity.objects.filter(id__in=candidate_ids).only("id", "url", "simhash")
+
+    best, best_distance = None, SIMHASH_MAX_DISTANCE + 1
+    for candidate in candidates:
+        distance = hamming_distance(value, to_unsigned(candidate.simhash))
+        if distance < best_distance or (best is not None and distance == best_distance and candidate.id < best.id):
+            best, best_distance = candidate, distance
+    return best
+
+
+def _lock_band_index():
+    """
+    Hold the band index until the current transaction ends, so two workers
+    can't both miss each other's near-duplicate and become representatives.
+    Only PostgreSQL needs it; SQLite already serializes writers.
+    """
+    if connection.vendor == "postgresql":
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_advisory_xact_lock(%s)", [BAND_INDEX_LOCK_ID])
+
+
+def _index_simhash(cleaned, value):
+    """Store a document's SimHash and add it to the band index as a cluster representative."""
+    cleaned.simhash = to_signed(value)
+    cleaned.save(update_fields=["simhash"])
+    SimHashBand.objects.bulk_create([
+        SimHashBand(cleaned_opportunity=cleaned, band=band, key=key) for band, key in simhash_bands(value)
+    ])
+
+
+def cluster_near_duplicates(batch_size=500, ids=None):
+    """
+    Index newly cleaned documents and fold near-duplicates into their cluster.
+
+    Pending documents close to an indexed one become 'duplicate' of it and never
+    reach LLM extraction; every other document becomes the representative of a
+    new cluster and is added to the band index. Only pending documents are
+    picked up, oldest first, so extraction (which needs the hash) is never held
+    up by older history; see backfill_simhashes() for that. With ids (the rows
+    a cleaning run just created) exactly those are handled, however many.
+    Each lookup-and-insert runs under the band index lock, and a document that
+    a concurrent pass already hashed is skipped.
+    """
+    to_index = (
+        CleanedOpportunity.objects
+        .filter(status="pending", simhash__isnull=True)
+        .order_by("id")
+        .only("id", "url", "status", "cleaned_content")
+    )
+    if ids is None:
+        chunks = [to_index[:batch_size]]
+    else:
+        ids = list(ids)
+        chunks = (to_index.filter(id__in=ids[i:i + batch_size]) for i in range(0, len(ids), batch_size))
+    clustered = indexed = 0
+    for cleaned in (row for chunk in chunks for row in chunk):
+        value = simhash(cleaned.cleaned_content)
+        with transaction.atomic():
+            _lock_band_index()
+            if not CleanedOpportunity.objects.filter(id=cleaned.id, simhash__isnull=True).exists():
+                continue
+            representative = find_near_duplicate(value)
+            if representative:
+                cleaned.simhash = to_signed(value)
+                cleaned.status = "duplicate"
+                cleaned.duplicate_of = representative
+                cleaned.justification = f"Near duplicate of cleaned opportunity #{representative.id}"
+                cleaned.save(update_fields=["simhash", "status", "duplicate_of", "justification"])
+                cleaner_logger.info(f"Near duplicate: {cleaned.url} -> {representative.url}")
+                clustered += 1
+                continue
+            _index_simhash(cleaned, value)
+            indexed += 1
+    cleaner_logger.info(f"Near-duplicate pass: indexed {indexed}, clustered {clustered} duplicates.")
+    return clustered
+
+
+def backfill_simhashes(batch_size=500):
+    """
+    Index one batch of documents that were already extracted (or rejected)
+    before they had a hash, so new pages are matched against them too. They are
+    indexed as they are, never re-labelled. Returns how many were indexed.
+    """
+    to_index = list(
+        CleanedOpportunity.objects
+        .filter(simhash__isnull=True)
+        .exclude(status__in=["pending", "in_progress", "duplicate"])
+        .order_by("id")
+        .only("id", "cleaned_content")[:batch_size]
+    )
+    for cleaned in to_index:
+        value = simhash(cleaned.cleaned_content)
+        with transaction.atomic():
+            _lock_band_index()
+            if CleanedOpportunity.objects.filter(id=cleaned.id, simhash__isnull=True).exists():
+                _index_simhash(cleaned, value)
+    return len(to_index)
@@ -1,15 +1,30 @@
 from django.utils import timezone
 import os
-import json
+import time
 from core.utils import init_django
 init_django()
 from django.utils.dateparse import parse_date
 from processing.models import CleanedOpportunity, ProcessedOpportunity
-from openai import OpenAI
+from core.llm import estimate_tokens, items_per_run, run_concurrently
+from core.llm_cache import cached_chat_completion
+from core.llm_schema import is_valid_for, parse_model_output, response_format_for
+from processing.prefilter import prefilter_items
+from processing.relevance import relevance_filter
+from processing.schemas import ExtractionResult
 from core.logging import llm_extractor_logger
+from core.work_queue import WORK_LEASE_SECONDS, WorkQueue
 
 
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+# Each run gets this long of the LLM rate budget; the batch size follows from it
+EXTRACTION_RUN_SECONDS = int(os.getenv("EXTRACTION_RUN_SECONDS", 600))
+AVG_DOCUMENT_TOKENS = 2500  # main content + metadata block, see build_llm_input
+EXTRACTION_MODEL = "gpt-5.1"
+EXTRACTION_PROMPT_VERSION = "extraction-v2"  # bump when EXTRACTION_PROMPT or its parsing changes
+EXTRACTION_RESPONSE_FORMAT = response_format_for(ExtractionResult)
+MAX_EXTRACTION_ATTEMPTS = 3  # unparseable answers are retried on later runs before the item is dropped
+REJECTION_STAGES = {stage for stage, _ in CleanedOpportunity.REJECTION_STAGES}
+# a claim must outlive the run that processes it
+extraction_queue = WorkQueue(CleanedOpportunity, llm_extractor_logger, lease_seconds=max(WORK_LEASE_SECONDS, 2 * EXTRACTION_RUN_SECONDS))
 current_year = timezone.now().year
 current_date = timezone.now().date()
 EXTRACTION_PROMPT = f"""
@@ -87,91 +102,170 @@ Rules:
 
 """
 
-def extract_opportunity_data(cleaned_opportunity):
-    """Send cleaned content to GPT and process if it's a valid opportunity."""
-    try:
-        response = client.chat.completions.create(
-            model="gpt-5.1",
-            messages=[
-                {"role": "system", "content": "You are a precise JSON-only information extractor."},
-                {"role": "user", "content": EXTRACTION_PROMPT},
-                {"role": "user", "content": cleaned_opportunity.cleaned_content},
-            ],
-        )
+def build_llm_input(cleaned_opportunity):
+    """Metadata block plus main-body text; pages cleaned before main-content extraction send the full text."""
+    if not cleaned_opportunity.main_content:
+        return cleaned_opportunity.cleaned_content
+    metadata = cleaned_opportunity.content_metadata or {}
+    lines = [f"Page title: {metadata.get('title', '')}", f"Source URL: {cleaned_opportunity.url}"]
+    if metadata.get("headings"):
+        lines.append("Headings: " + " | ".join(metadata["headings"]))
+    if metadata.get("dates"):
+        lines.append("Dates found on page: " + ", ".join(metadata["dates"]))
+    return "\n".join(lines) + "\n\nMain content:\n" + cleaned_opportunity.main_content
 
-        message = response.choices[0].message
-        if message is None or not message.content:
-            raise ValueError("Empty model response")
-
-        raw_output = message.content.strip()
-        data = json.loads(raw_output)
-
-        # Case 1: No opportunity found
-        if not data.get("is_opportunity", False):
-            cleaned_opportunity.justification = data.get("justification", "")
-            cleaned_opportunity.status = "garbage"
-            cleaned_opportunity.save()
-            llm_extractor_logger.info(f"Marked as garbage: {cleaned_opportunity.url}")
-            return
-        
-        # case 2: Geographic Failure
-        geo_scope = data.get("geo_scope")
-        if geo_scope not in ["ethiopia", "horn_of_africa"]:
-            cleaned_opportunity.status = "garbage"
-            cleaned_opportunity.justification = "Outside target geography"
-            cleaned_opportunity.save()
-            return
-
-        # case 3: No valid deadline
-        deadline_str = data.get("deadline")
-        deadline_obj = parse_date(deadline_str) if deadline_str else None
-        if not deadline_obj or deadline_obj < timezone.now().date():
-            cleaned_opportunity.justification = "Missing or expired deadline"
-            cleaned_opportunity.status = "garbage"
-            cleaned_opportunity.save()
-            llm_extractor_logger.info(f"Marked as garbage due to invalid deadline: {cleaned_opportunity.url}")
-            return
-        
-        # Case 3: Create ProcessedOpportunity
-        final_url = data.get("url") or cleaned_opportunity.url
-        ProcessedOpportunity.objects.create(
-            raw_opportunity=cleaned_opportunity.raw_opportunity,
-            title=data.get("title", "")[:500],
-            description=data.get("description", ""),
-            organization=data.get("organization", ""),
-            category=data.get("category", ""),
-            eligibility=data.get("eligibility", ""),
-            deadline=deadline_obj,
-            location=data.get("location", ""),
-            url=final_url,
-            posted_date=parse_date(data.get("posted_date")) if data.get("posted_date") else None,
-            confidence_score=float(data.get("confidence_score", 0.0)),
-            justification=data.get("justification", ""),
-        )
 
-        cleaned_opportunity.status = "processed"
-        cleaned_opportunity.save()
-        llm_extractor_logger.info(f"Processed successfully: {cleaned_opportunity.url}")
+def build_extraction_messages(cleaned_opportunity):
+    return [
+        {"role": "system", "content": "You are a precise JSON-only information extractor."},
+        {"role": "user", "content": EXTRACTION_PROMPT},
+        {"role": "user", "content": build_llm_input(cleaned_opportunity)},
+    ]
 
-    except json.JSONDecodeError:
+
+def record_failed_attempt(cleaned_opportunity):
+    """Leave the item pending for another run until MAX_EXTRACTION_ATTEMPTS, then give up on it."""
+    cleaned_opportunity.extraction_attempts += 1
+    if cleaned_opportunity.extraction_attempts >= MAX_EXTRACTION_ATTEMPTS:
         cleaned_opportunity.status = "garbage"
-        cleaned_opportunity.save()
-        llm_extractor_logger.warning(f"Invalid JSON for: {cleaned_opportunity.url}")
+        cleaned_opportunity.justification = f"Model output could not be parsed after {cleaned_opportunity.extraction_attempts} attempts"
+        llm_extractor_logger.warning(f"Giving up on unparseable extraction: {cleaned_opportunity.url}")
+    else:
+        cleaned_opportunity.status = "pending"
+        llm_extractor_logger.warning(
+            f"Unparseable extraction (attempt {cleaned_opportunity.extraction_attempts}): {cleaned_opportunity.url}"
+        )
+    cleaned_opportunity.save(update_fields=["extraction_attempts", "status", "justification"])
+
+
+def reject(cleaned_opportunity, stage, justification):
+    cleaned_opportunity.status = "garbage"
+    cleaned_opportunity.rejection_stage = stage
+    cleaned_opportunity.rejected_by = "llm"
+    cleaned_opportunity.justification = justification
+    cleaned_opportunity.save()
+
+
+def parse_model_date(value):
+    """Date from a YYYY-MM-DD model answer; None when missing or impossible (e.g. 2026-02-30)."""
+    try:
+        return parse_date(value) if value else None
+    except ValueError:
+        return None
+
+
+def apply_extraction_result(cleaned_opportunity, content):
+    """Validate the model's answer and mark the item processed or garbage; shared by the sync and batch paths."""
+    result = parse_model_output(ExtractionResult, content, EXTRACTION_PROMPT_VERSION)
+    if result is None:
+        record_failed_attempt(cleaned_opportunity)
+        return
+
+    # Case 1: No opportunity found
+    if not result.is_opportunity:
+        stage = result.rejection_stage if result.rejection_stage in REJECTION_STAGES else ""
+        reject(cleaned_opportunity, stage, result.justification)
+        llm_extractor_logger.info(f"Marked as garbage: {cleaned_opportunity.url}")
+        return
+
+    # case 2: Geographic Failure
+    if result.geo_scope not in ["ethiopia", "horn_of_africa"]:
+        reject(cleaned_opportunity, "geography", "Outside target geography")
+        return
+
+    # case 3: No valid deadline
+    deadline_obj = parse_model_date(result.deadline)
+    if not deadline_obj or deadline_obj < timezone.now().date():
+        reject(cleaned_opportunity, "deadline", "Missing or expired deadline")
+        llm_extractor_logger.info(f"Marked as garbage due to invalid deadline: {cleaned_opportunity.url}")
+        return
+
+    # Case 3: Create ProcessedOpportunity
+    ProcessedOpportunity.objects.create(
+        raw_opportunity=cleaned_opportunity.raw_opportunity,
+        title=result.title[:500],
+        description=result.description,
+        organization=result.organization,
+        category=result.category,
+        eligibility=result.eligibility,
+        deadline=deadline_obj,
+        location=result.location,
+        url=result.url or cleaned_opportunity.url,
+        posted_date=parse_model_date(result.posted_date),
+        confidence_score=result.confidence_score,
+        justification=result.justification,
+    )
+
+    cleaned_opportunity.status = "processed"
+    cleaned_opportunity.save()
+    llm_extractor_logger.info(f"Processed successfully: {cleaned_opportunity.url}")
+
+
+def extract_opportunity_data(cleaned_opportunity):
+    """Send cleaned content to GPT and process if it's a valid opportunity."""
+    try:
+        content = cached_chat_completion(
+            EXTRACTION_PROMPT_VERSION,
+            EXTRACTION_MODEL,
+            build_extraction_messages(cleaned_opportunity),
+            validate=is_valid_for(ExtractionResult),
+            response_format=EXTRACTION_RESPONSE_FORMAT,
+        )
+        apply_extraction_result(cleaned_opportunity, content)
 
     except Exception as e:
         llm_extractor_logger.error(f"Error on {cleaned_opportunity.url}: {e}", exc_info=True)
 
 
 # --- Batch Processing ---
+def extraction_batch_size():
+    """Items one run can push through within EXTRACTION_RUN_SECONDS of the configured RPM/TPM limits."""
+    tokens_per_item = estimate_tokens(EXTRACTION_PROMPT) + AVG_DOCUMENT_TOKENS
+    return items_per_run(EXTRACTION_RUN_SECONDS, tokens_per_item)
+
+
+def pending_extraction_queryset():
+    # only documents that went through the near-duplicate pass (simhash set) are extracted
+    return CleanedOpportunity.objects.filter(status="pending", simhash__isnull=False).order_by('-id')
+
+
+def pending_extraction_items(limit=None, ids=None):
+    """Claim the newest pending items (among ids, if given); release the ones left unfinished with extraction_queue."""
+    return extraction_queue.claim(pending_extraction_queryset(), limit or extraction_batch_size(), ids=ids)
+
+
+def awaiting_matching(items):
+    """Ids of the ProcessedOpportunity rows extracted from items that still wait for matching."""
+    return list(ProcessedOpportunity.objects.filter(
+        raw_opportunity_id__in=[item.raw_opportunity_id for item in items], matching_status="pending"
+    ).values_list("id", flat=True))
+
+
+def extract_many(items):
+    """
+    Run extract_opportunity_data over items concurrently, within the shared LLM rate
+    limits; items the local pre-filter or relevance model reject never reach the LLM.
+    """
+    items = relevance_filter(prefilter_items(items))
+    started = time.monotonic()
+    run_concurrently(extract_opportunity_data, items)
+    elapsed = time.monotonic() - started
+    llm_extractor_logger.info(
+        f"Extracted {len(items)} items in {elapsed:.1f}s ({len(items) / max(elapsed, 0.001) * 60:.1f} items/min)"
+    )
+
+
 def run_extraction():
-    pending_items = CleanedOpportunity.objects.filter(status="pending").order_by('-id')[:30]
-    if not pending_items.exists():
+    pending_items = pending_extraction_items()
+    if not pending_items:
         llm_extractor_logger.info("No pending items to process.")
         return
 
-    llm_extractor_logger.info(f"Starting extraction for {pending_items.count()} pending items...")
-    for item in pending_items:
-        extract_opportunity_data(item)
+    llm_extractor_logger.info(f"Starting extraction for {len(pending_items)} pending items...")
+    try:
+        extract_many(pending_items)
+    finally:
+        extraction_queue.release(pending_items)
     llm_extractor_logger.info("Extraction batch completed.")
 
 
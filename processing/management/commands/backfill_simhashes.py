@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from processing.dedup import backfill_simhashes
+
+
+class Command(BaseCommand):
+    help = "Add already extracted or rejected documents that have no SimHash yet to the near-duplicate index."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500)
+
+    def handle(self, *args, **options):
+        total = 0
+        while True:
+            indexed = backfill_simhashes(batch_size=options["batch_size"])
+            if not indexed:
+                break
+            total += indexed
+            self.stdout.write(f"Indexed {total} documents so far")
+        self.stdout.write(self.style.SUCCESS(f"Backfill complete: {total} documents indexed"))
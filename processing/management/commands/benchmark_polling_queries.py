@@ -0,0 +1,187 @@
+import random
+import re
+import statistics
+import time
+from datetime import timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Max
+from django.utils import timezone
+from matching.models import OpportunityMatch, Startup
+from matching.scoring import LLM_MATCHING_STATUSES, SCORING_BATCH_SIZE
+from processing.models import CleanedOpportunity, ProcessedOpportunity
+from sources.models import RawOpportunity, SourceRegistry
+from sources.scraper import sources_due_for_recrawl
+
+
+PENDING_SHARE = 0.02  # share of rows waiting in each queue; the rest has moved on
+STARTUPS = 200
+
+
+def polling_queries():
+    """
+    (label, queryset, must be index-only) for every query a stage polls its queue
+    with, shaped like the code that runs them. Index-only is checked on
+    PostgreSQL only, where it depends on the visibility map after VACUUM.
+    """
+    now = timezone.now()
+    return [
+        ("cleaner poll", RawOpportunity.objects.filter(status="pending", id__gt=0).order_by("id")
+         .only("id", "source_name", "url", "raw_content", "content_hash", "status")[:500], False),
+        ("extraction poll", CleanedOpportunity.objects.filter(status="pending", simhash__isnull=False).order_by("-id")[:100], False),
+        ("extraction backlog count", CleanedOpportunity.objects.filter(status="pending").values("id"), True),
+        ("scoring poll", ProcessedOpportunity.objects.filter(matching_status="pending").order_by("-created_at")[:SCORING_BATCH_SIZE], False),
+        ("llm matching poll", ProcessedOpportunity.objects.filter(matching_status__in=LLM_MATCHING_STATUSES).order_by("-created_at")[:30], False),
+        ("google scrape poll", SourceRegistry.objects.filter(active=True, source_type="google", last_scraped__isnull=True).order_by("-id")[:50], False),
+        ("google backlog count", SourceRegistry.objects.filter(active=True, source_type="google", last_scraped__isnull=True).values("id"), True),
+        ("recrawl poll", sources_due_for_recrawl(50), False),
+        ("digest top opportunities", OpportunityMatch.objects.filter(mailed_at__isnull=True).exclude(status="candidate")
+         .values("opportunity").annotate(max_confidence=Max("confidence_score")).order_by("-max_confidence")[:6], True),
+        # every claim first returns expired leases to the queue
+        ("raw lease reclaim", RawOpportunity.objects.filter(status="in_progress", lease_expires_at__lt=now).values("id"), False),
+        ("cleaned lease reclaim", CleanedOpportunity.objects.filter(status="in_progress", lease_expires_at__lt=now).values("id"), False),
+        ("matching lease reclaim", ProcessedOpportunity.objects.filter(matching_status="in_progress", lease_expires_at__lt=now).values("id"), False),
+    ]
+
+
+def full_scans(plan, vendor):
+    """Tables the plan reads in full."""
+    if vendor == "postgresql":
+        return re.findall(r"Seq Scan on (\w+)", plan)
+    # sqlite: "SCAN table" without "USING ... INDEX"
+    return re.findall(r"\bSCAN (\w+)(?! USING)\s*$", plan, re.MULTILINE)
+
+
+def is_index_only(plan, vendor):
+    return "Index Only Scan" in plan if vendor == "postgresql" else "COVERING INDEX" in plan
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed a throwaway test database with production-shaped queues and check that every "
+        "pipeline polling query uses its index and stays under a latency budget."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=1_000_000,
+                            help="raw and cleaned opportunities to seed; downstream tables get a tenth")
+        parser.add_argument("--payload-bytes", type=int, default=512,
+                            help="text per cleaned row, to give the heap a realistic width")
+        parser.add_argument("--budget-ms", type=float, default=50.0, help="median latency allowed per query")
+        parser.add_argument("--repeat", type=int, default=5)
+        parser.add_argument("--chunk", type=int, default=10_000)
+        parser.add_argument("--keepdb", action="store_true", help="keep (and reuse) the seeded test database")
+
+    def handle(self, *args, **options):
+        # the schema comes from the current models (indexes included), never the live database
+        connection.settings_dict.setdefault("TEST", {})["MIGRATE"] = False
+        old_name = connection.settings_dict["NAME"]
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False, keepdb=options["keepdb"])
+        try:
+            if not options["keepdb"] or not RawOpportunity.objects.exists():
+                self.seed(options["rows"], options["payload_bytes"], options["chunk"])
+            failures = self.check_queries(options["budget_ms"], options["repeat"])
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0, keepdb=options["keepdb"])
+        if failures:
+            raise CommandError(f"{len(failures)} polling queries failed: {', '.join(failures)}")
+        self.stdout.write(self.style.SUCCESS("All polling queries use their indexes within budget."))
+
+    def chunks(self, total, chunk):
+        for start in range(0, total, chunk):
+            yield range(start, min(start + chunk, total))
+
+    def seed(self, rows, payload_bytes, chunk):
+        rng = random.Random(0)
+        payload = ("<p>" + "x" * payload_bytes + "</p>")[:payload_bytes]
+        now = timezone.now()
+        started = time.perf_counter()
+
+        raw_ids = []
+        for block in self.chunks(rows, chunk):
+            created = RawOpportunity.objects.bulk_create([
+                RawOpportunity(
+                    source_type="static", source_name=f"source {i % 500}", url=f"https://example.org/{i}",
+                    content_hash=f"{i:064x}", content_size=payload_bytes,  # the HTML itself lives in RawContentBlob
+                    status="pending" if rng.random() < PENDING_SHARE else "cleaned",
+                )
+                for i in block
+            ])
+            raw_ids.extend(raw.id for raw in created)
+
+        for block in self.chunks(rows, chunk):
+            CleanedOpportunity.objects.bulk_create([
+                CleanedOpportunity(
+                    source_name=f"source {i % 500}", url=f"https://example.org/{i}", cleaned_content=payload,
+                    main_content=payload, simhash=rng.getrandbits(63),
+                    status="pending" if rng.random() < PENDING_SHARE else rng.choice(["processed", "garbage", "duplicate"]),
+                )
+                for i in block
+            ])
+
+        downstream = rows // 10
+        statuses = ["matched", "no match"]
+        for block in self.chunks(downstream, chunk):
+            ProcessedOpportunity.objects.bulk_create([
+                ProcessedOpportunity(
+                    raw_opportunity_id=raw_ids[i], title=f"Opportunity {i}", description=payload,
+                    matching_status=rng.choice(["pending", "borderline"]) if rng.random() < PENDING_SHARE else rng.choice(statuses),
+                )
+                for i in block
+            ])
+
+        for block in self.chunks(downstream, chunk):
+            SourceRegistry.objects.bulk_create([
+                SourceRegistry(
+                    name=f"Source {i}", source_type=rng.choice(["google", "custom"]),
+                    base_url=f"https://example.org/source/{i}", canonical_url=f"https://example.org/source/{i}",
+                    active=rng.random() < 0.9,
+                    last_scraped=None if rng.random() < PENDING_SHARE else now - timedelta(hours=rng.randint(1, 24 * 30)),
+                )
+                for i in block
+            ])
+
+        startup_ids = [
+            startup.id for startup in Startup.objects.bulk_create([
+                Startup(name=f"Startup {i}", description="", industry="fintech") for i in range(STARTUPS)
+            ])
+        ]
+        opportunity_ids = list(ProcessedOpportunity.objects.values_list("id", flat=True))
+        for block in self.chunks(downstream, chunk):
+            OpportunityMatch.objects.bulk_create([
+                OpportunityMatch(
+                    opportunity_id=opportunity_ids[i], startup_id=startup_ids[i % STARTUPS],
+                    confidence_score=rng.random(), status=rng.choice(["pending", "candidate"]),
+                    mailed_at=None if rng.random() < PENDING_SHARE else now,
+                )
+                for i in block
+            ])
+
+        with connection.cursor() as cursor:
+            cursor.execute("VACUUM ANALYZE" if connection.vendor == "postgresql" else "ANALYZE")
+        self.stdout.write(f"Seeded {rows:,} raw/cleaned and {downstream:,} downstream rows in {time.perf_counter() - started:.0f}s")
+
+    def check_queries(self, budget_ms, repeat):
+        vendor = connection.vendor
+        failures = []
+        self.stdout.write(f"{'query':<26} {'median ms':>10} {'scan':<12} result")
+        for label, queryset, index_only in polling_queries():
+            plan = queryset.explain(analyze=True) if vendor == "postgresql" else queryset.explain()
+            timings = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                list(queryset.all())
+                timings.append((time.perf_counter() - started) * 1000)
+            median = statistics.median(timings)
+
+            problems = [f"full scan of {table}" for table in full_scans(plan, vendor)]
+            if index_only and vendor == "postgresql" and not is_index_only(plan, vendor):
+                problems.append("not index-only")
+            if median > budget_ms:
+                problems.append(f"over {budget_ms:.0f} ms")
+            scan = "index-only" if is_index_only(plan, vendor) else "index"
+            self.stdout.write(f"{label:<26} {median:>10.1f} {scan:<12} {'; '.join(problems) or 'ok'}")
+            if problems:
+                failures.append(label)
+                self.stdout.write(plan)
+        return failures
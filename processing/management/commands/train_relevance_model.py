@@ -0,0 +1,111 @@
+import joblib
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Q
+from django.utils import timezone
+from sklearn.linear_model import LogisticRegression
+from sklearn.metrics import precision_recall_curve
+from sklearn.model_selection import train_test_split
+from core.embeddings import EMBEDDING_MODEL, embed_texts
+from processing.models import CleanedOpportunity
+from processing.relevance import document_text, save_artifact, score_texts
+
+
+REPORT_THRESHOLDS = (0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7)
+
+
+def labeled_opportunities(since=None):
+    """
+    processed -> 1, garbage -> 0. Rejections made by the pre-filter or the classifier
+    itself and unparseable LLM answers are not ground truth and are left out.
+    """
+    rows = CleanedOpportunity.objects.filter(status__in=["processed", "garbage"]).exclude(
+        Q(rejected_by__in=["prefilter", "classifier"]) | Q(justification__startswith="Model output could not be parsed")
+    )
+    if since is not None:
+        rows = rows.filter(created_at__gte=since)
+    rows = list(rows.only("id", "status", "main_content", "cleaned_content", "content_metadata"))
+    return rows, np.array([1 if row.status == "processed" else 0 for row in rows])
+
+
+def metrics_at(labels, scores, threshold):
+    predicted = scores >= threshold
+    true_positives = int(np.sum(predicted & (labels == 1)))
+    precision = true_positives / max(int(np.sum(predicted)), 1)
+    recall = true_positives / max(int(np.sum(labels == 1)), 1)
+    return precision, recall, 1 - float(np.mean(predicted))
+
+
+def pick_threshold(labels, scores, target_recall):
+    """Highest threshold that still keeps target_recall of the real opportunities."""
+    _, recall, thresholds = precision_recall_curve(labels, scores)
+    candidates = [t for r, t in zip(recall[:-1], thresholds) if r >= target_recall]
+    return float(max(candidates)) if candidates else float(thresholds.min())
+
+
+class Command(BaseCommand):
+    help = "Train the embedding relevance classifier on garbage/processed labels, or evaluate an existing artifact."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--target-recall", type=float, default=0.95,
+                            help="recall on held-out opportunities the threshold must keep")
+        parser.add_argument("--test-size", type=float, default=0.2)
+        parser.add_argument("--min-samples", type=int, default=100)
+        parser.add_argument("--evaluate", metavar="ARTIFACT",
+                            help="only report precision/recall of this artifact on documents labeled since it was trained")
+
+    def report(self, labels, scores, chosen):
+        self.stdout.write(f"{'threshold':>10} {'precision':>10} {'recall':>8} {'llm calls saved':>16}")
+        for threshold in sorted(set(REPORT_THRESHOLDS) | {chosen}):
+            precision, recall, saved = metrics_at(labels, scores, threshold)
+            marker = "  <- selected" if threshold == chosen else ""
+            self.stdout.write(f"{threshold:>10.3f} {precision:>10.3f} {recall:>8.3f} {saved:>15.1%}{marker}")
+
+    def evaluate(self, path):
+        artifact = joblib.load(path)
+        rows, labels = labeled_opportunities(since=artifact["trained_at"])
+        if len(set(labels)) < 2:
+            raise CommandError(f"Need both processed and garbage documents labeled since {artifact['trained_at']:%Y-%m-%d}")
+        scores = score_texts([document_text(row) for row in rows], artifact)
+        self.stdout.write(f"Model {artifact['version']} on {len(rows)} documents labeled since training:")
+        self.report(labels, scores, artifact["threshold"])
+
+    def handle(self, *args, **options):
+        if options["evaluate"]:
+            return self.evaluate(options["evaluate"])
+
+        rows, labels = labeled_opportunities()
+        positives = int(labels.sum())
+        if len(rows) < options["min_samples"] or positives < 10 or positives == len(rows):
+            raise CommandError(f"Not enough labeled data: {len(rows)} documents, {positives} processed")
+
+        self.stdout.write(f"Embedding {len(rows)} documents ({positives} processed) with {EMBEDDING_MODEL}...")
+        embeddings = embed_texts([document_text(row) for row in rows])
+        train_x, test_x, train_y, test_y = train_test_split(
+            embeddings, labels, test_size=options["test_size"], stratify=labels, random_state=0
+        )
+        classifier = LogisticRegression(class_weight="balanced", max_iter=1000)
+        classifier.fit(train_x, train_y)
+        test_scores = classifier.predict_proba(test_x)[:, 1]
+        threshold = pick_threshold(test_y, test_scores, options["target_recall"])
+        self.stdout.write(f"Held-out report ({len(test_y)} documents):")
+        self.report(test_y, test_scores, threshold)
+
+        # refit on everything for the shipped model; the threshold comes from the held-out split
+        classifier.fit(embeddings, labels)
+        precision, recall, saved = metrics_at(test_y, test_scores, threshold)
+        trained_at = timezone.now()
+        artifact = {
+            "version": trained_at.strftime("%Y%m%d%H%M%S"),
+            "trained_at": trained_at,
+            "embedding_model": EMBEDDING_MODEL,
+            "classifier": classifier,
+            "threshold": threshold,
+            "report": {"precision": precision, "recall": recall, "llm_calls_saved": saved,
+                       "samples": len(rows), "positives": positives},
+        }
+        path = save_artifact(artifact)
+        self.stdout.write(self.style.SUCCESS(
+            f"Saved relevance model {artifact['version']} to {path} (threshold {threshold:.3f}); "
+            "restart the workers to load it."
+        ))
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.6 on 2026-10-17 11:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('processing', '0003_processedopportunity_matching_status'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cleanedopportunity',
+            name='content_hash',
+            field=models.CharField(blank=True, db_index=True, help_text='sha256 of cleaned_content', max_length=64, null=True),
+        ),
+        migrations.AddField(
+            model_name='cleanedopportunity',
+            name='duplicate_of',
+            field=models.ForeignKey(blank=True, help_text='first cleaned opportunity seen with the same content', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='duplicates', to='processing.cleanedopportunity'),
+        ),
+        migrations.AlterField(
+            model_name='cleanedopportunity',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending LLM Processing'), ('processed', 'Processed Successfully'), ('garbage', 'Garbage / Irrelevant'), ('duplicate', 'Duplicate of an existing opportunity')], default='pending', max_length=20),
+        ),
+    ]
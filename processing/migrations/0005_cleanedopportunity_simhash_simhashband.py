@@ -0,0 +1,31 @@
+# Generated by Django 5.2.6 on 2026-10-17 12:25
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('processing', '0004_cleanedopportunity_content_hash_duplicate_of'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cleanedopportunity',
+            name='simhash',
+            field=models.BigIntegerField(blank=True, help_text='64-bit SimHash of cleaned_content (signed), null until indexed', null=True),
+        ),
+        migrations.CreateModel(
+            name='SimHashBand',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('band', models.PositiveSmallIntegerField()),
+                ('key', models.IntegerField()),
+                ('cleaned_opportunity', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='simhash_bands', to='processing.cleanedopportunity')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['band', 'key'], name='processing__band_e793f0_idx')],
+            },
+        ),
+    ]
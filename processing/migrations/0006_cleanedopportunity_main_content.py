@@ -0,0 +1,23 @@
+# Generated by Django 5.2.6 on 2026-10-17 14:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('processing', '0005_cleanedopportunity_simhash_simhashband'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cleanedopportunity',
+            name='main_content',
+            field=models.TextField(blank=True, default='', help_text='main body text without menus, banners and footers, sent to the LLM'),
+        ),
+        migrations.AddField(
+            model_name='cleanedopportunity',
+            name='content_metadata',
+            field=models.JSONField(blank=True, default=dict, help_text='title, headings, dates found and token counts'),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.6 on 2026-10-17 16:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('processing', '0006_cleanedopportunity_main_content'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LLMBatchJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('extraction', 'Extraction'), ('matching', 'Matching')], max_length=20)),
+                ('batch_id', models.CharField(max_length=255, unique=True)),
+                ('item_ids', models.JSONField(default=list)),
+                ('status', models.CharField(choices=[('submitted', 'Submitted'), ('applied', 'Results applied'), ('failed', 'Failed')], default='submitted', max_length=20)),
+                ('submitted_at', models.DateTimeField(auto_now_add=True)),
+                ('completed_at', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='cleanedopportunity',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending LLM Processing'), ('processed', 'Processed Successfully'), ('garbage', 'Garbage / Irrelevant'), ('duplicate', 'Duplicate of an existing opportunity'), ('batched', 'Submitted to LLM batch')], default='pending', max_length=20),
+        ),
+        migrations.AlterField(
+            model_name='processedopportunity',
+            name='matching_status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('matched', 'Matched'), ('no match', 'No Match'), ('batched', 'Submitted to LLM batch')], default='pending', help_text='This shows status of specific opportunity matching with a specific startup', max_length=20),
+        ),
+    ]
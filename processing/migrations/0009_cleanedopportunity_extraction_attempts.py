@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-17 17:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('processing', '0008_llmresponsecache'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cleanedopportunity',
+            name='extraction_attempts',
+            field=models.PositiveSmallIntegerField(default=0, help_text='LLM answers that could not be parsed so far'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.6 on 2026-10-17 17:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('processing', '0009_cleanedopportunity_extraction_attempts'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cleanedopportunity',
+            name='rejection_stage',
+            field=models.CharField(blank=True, choices=[('language', 'Language'), ('geography', 'Geography'), ('deadline', 'Deadline'), ('domain', 'Domain')], default='', help_text='extraction rule that rejected the page', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='cleanedopportunity',
+            name='rejected_by',
+            field=models.CharField(blank=True, choices=[('prefilter', 'Local pre-filter'), ('llm', 'LLM')], default='', help_text='whether the garbage decision was made locally or by the LLM', max_length=20),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-17 18:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('processing', '0010_cleanedopportunity_rejection_stage'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='cleanedopportunity',
+            name='rejected_by',
+            field=models.CharField(blank=True, choices=[('prefilter', 'Local pre-filter'), ('classifier', 'Relevance classifier'), ('llm', 'LLM')], default='', help_text='whether the garbage decision was made locally or by the LLM', max_length=20),
+        ),
+    ]
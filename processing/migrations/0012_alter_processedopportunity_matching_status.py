@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-17 19:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('processing', '0011_alter_cleanedopportunity_rejected_by'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='processedopportunity',
+            name='matching_status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('matched', 'Matched'), ('no match', 'No Match'), ('batched', 'Submitted to LLM batch'), ('borderline', 'Pre-scored, awaiting LLM confirmation')], default='pending', help_text='This shows status of specific opportunity matching with a specific startup', max_length=20),
+        ),
+    ]
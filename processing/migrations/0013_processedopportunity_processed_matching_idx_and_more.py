@@ -0,0 +1,24 @@
+# Generated by Django 5.2.6 on 2026-10-17 20:40
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY can't run in a transaction; it doesn't block pipeline writes
+    atomic = False
+
+    dependencies = [
+        ('processing', '0012_alter_processedopportunity_matching_status'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='processedopportunity',
+            index=models.Index(fields=['matching_status', '-created_at'], name='processed_matching_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='cleanedopportunity',
+            index=models.Index(condition=models.Q(('status', 'pending')), fields=['id'], name='cleaned_pending_idx'),
+        ),
+    ]
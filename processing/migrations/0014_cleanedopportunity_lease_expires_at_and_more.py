@@ -0,0 +1,44 @@
+# Generated by Django 5.2.6 on 2026-10-17 21:10
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY can't run in a transaction; it doesn't block pipeline writes
+    atomic = False
+
+    dependencies = [
+        ('processing', '0013_processedopportunity_processed_matching_idx_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cleanedopportunity',
+            name='lease_expires_at',
+            field=models.DateTimeField(blank=True, help_text='when an in-progress extraction claim lapses', null=True),
+        ),
+        migrations.AddField(
+            model_name='processedopportunity',
+            name='lease_expires_at',
+            field=models.DateTimeField(blank=True, help_text='when an in-progress matching claim lapses', null=True),
+        ),
+        migrations.AlterField(
+            model_name='cleanedopportunity',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending LLM Processing'), ('processed', 'Processed Successfully'), ('garbage', 'Garbage / Irrelevant'), ('duplicate', 'Duplicate of an existing opportunity'), ('batched', 'Submitted to LLM batch'), ('in_progress', 'Claimed by an extraction worker')], default='pending', max_length=20),
+        ),
+        migrations.AlterField(
+            model_name='processedopportunity',
+            name='matching_status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('matched', 'Matched'), ('no match', 'No Match'), ('batched', 'Submitted to LLM batch'), ('borderline', 'Pre-scored, awaiting LLM confirmation'), ('in_progress', 'Claimed by a matching worker')], default='pending', help_text='This shows status of specific opportunity matching with a specific startup', max_length=20),
+        ),
+        AddIndexConcurrently(
+            model_name='cleanedopportunity',
+            index=models.Index(condition=models.Q(('status', 'in_progress')), fields=['lease_expires_at'], name='cleaned_lease_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='processedopportunity',
+            index=models.Index(condition=models.Q(('matching_status', 'in_progress')), fields=['lease_expires_at'], name='processed_lease_idx'),
+        ),
+    ]
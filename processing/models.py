@@ -27,10 +27,21 @@ class ProcessedOpportunity(models.Model):
     justification = models.TextField(null=True, blank=True)
     matching_status = models.CharField(
         max_length=20,
-        choices=[("pending", "Pending"), ("matched", "Matched") , ('no match', "No Match")],
+        choices=[("pending", "Pending"), ("matched", "Matched") , ('no match', "No Match"), ("batched", "Submitted to LLM batch"),
+                 ("borderline", "Pre-scored, awaiting LLM confirmation"), ("in_progress", "Claimed by a matching worker")],
         default="pending",
         help_text="This shows status of specific opportunity matching with a specific startup"
     )
+    lease_expires_at = models.DateTimeField(null=True, blank=True, help_text="when an in-progress matching claim lapses")
+
+    class Meta:
+        indexes = [
+            # matching polls: matching_status IN (...) ORDER BY created_at DESC
+            models.Index(fields=["matching_status", "-created_at"], name="processed_matching_idx"),
+            # work queue reclaim: matching_status='in_progress' AND lease_expires_at < now
+            models.Index(fields=["lease_expires_at"], condition=models.Q(matching_status="in_progress"), name="processed_lease_idx"),
+        ]
+
     def __str__(self):
         return f" {self.title[:30]}... | status: {self.matching_status} "
 
@@ -45,14 +56,115 @@ class CleanedOpportunity(models.Model):
     source_name = models.CharField(max_length=255)
     url = models.TextField()
     cleaned_content = models.TextField()    
+    main_content = models.TextField(blank=True, default="", help_text="main body text without menus, banners and footers, sent to the LLM")
+    content_metadata = models.JSONField(default=dict, blank=True, help_text="title, headings, dates found and token counts")
+    content_hash = models.CharField(max_length=64, blank=True, null=True, db_index=True, help_text="sha256 of cleaned_content")
+    duplicate_of = models.ForeignKey(
+        "self",
+        on_delete=models.SET_NULL,
+        related_name="duplicates",
+        null=True, blank=True,
+        help_text="first cleaned opportunity seen with the same content"
+    )
+    simhash = models.BigIntegerField(null=True, blank=True, help_text="64-bit SimHash of cleaned_content (signed), null until indexed")
+    extraction_attempts = models.PositiveSmallIntegerField(default=0, help_text="LLM answers that could not be parsed so far")
     created_at = models.DateTimeField(auto_now_add=True)
     justification = models.TextField(null=True, blank=True, help_text='justification for garbage status')
+    REJECTION_STAGES = [
+        ("language", "Language"),
+        ("geography", "Geography"),
+        ("deadline", "Deadline"),
+        ("domain", "Domain"),
+    ]
+    rejection_stage = models.CharField(max_length=20, choices=REJECTION_STAGES, blank=True, default="", help_text="extraction rule that rejected the page")
+    rejected_by = models.CharField(
+        max_length=20,
+        choices=[("prefilter", "Local pre-filter"), ("classifier", "Relevance classifier"), ("llm", "LLM")],
+        blank=True, default="",
+        help_text="whether the garbage decision was made locally or by the LLM"
+    )
     STATUS_CHOICES = [
         ("pending", "Pending LLM Processing"),
         ("processed", "Processed Successfully"),
         ("garbage", "Garbage / Irrelevant"),
+        ("duplicate", "Duplicate of an existing opportunity"),
+        ("batched", "Submitted to LLM batch"),
+        ("in_progress", "Claimed by an extraction worker"),
     ]
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="pending")
+    lease_expires_at = models.DateTimeField(null=True, blank=True, help_text="when an in-progress extraction claim lapses")
+
+    class Meta:
+        indexes = [
+            # extraction poll (ORDER BY id DESC) and the backlog count; only the pending few rows are indexed
+            models.Index(fields=["id"], condition=models.Q(status="pending"), name="cleaned_pending_idx"),
+            # work queue reclaim: status='in_progress' AND lease_expires_at < now
+            models.Index(fields=["lease_expires_at"], condition=models.Q(status="in_progress"), name="cleaned_lease_idx"),
+        ]
 
     def __str__(self):
         return f"Cleaned | {self.source_name} | {self.status}"
+
+
+
+class SimHashBand(models.Model):
+    """
+    LSH index over CleanedOpportunity.simhash: each indexed document stores its
+    hash split into fixed-width bands, so near-duplicate candidates are found with
+    an indexed (band, key) lookup instead of a scan of the whole table.
+    """
+    cleaned_opportunity = models.ForeignKey(
+        CleanedOpportunity,
+        on_delete=models.CASCADE,
+        related_name="simhash_bands"
+    )
+    band = models.PositiveSmallIntegerField()
+    key = models.IntegerField()
+
+    class Meta:
+        indexes = [models.Index(fields=["band", "key"])]
+
+    def __str__(self):
+        return f"band {self.band} | {self.key} -> {self.cleaned_opportunity_id}"
+
+
+class LLMBatchJob(models.Model):
+    """
+    An extraction or matching batch submitted through core.llm_batch. item_ids
+    holds the CleanedOpportunity / ProcessedOpportunity ids it covers, which sit
+    in the "batched" status until the results are applied.
+    """
+    KIND_CHOICES = [("extraction", "Extraction"), ("matching", "Matching")]
+    STATUS_CHOICES = [
+        ("submitted", "Submitted"),
+        ("applied", "Results applied"),
+        ("failed", "Failed"),
+    ]
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    batch_id = models.CharField(max_length=255, unique=True)
+    item_ids = models.JSONField(default=list)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="submitted")
+    submitted_at = models.DateTimeField(auto_now_add=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.kind} batch {self.batch_id} | {len(self.item_ids)} items | {self.status}"
+
+
+class LLMResponseCache(models.Model):
+    """
+    Model answers keyed by sha256(model, prompt version, messages), shared by every
+    OpenAI call site through core.llm_cache. Rows expire after a TTL and the least
+    recently used ones are evicted past a row cap.
+    """
+    key = models.CharField(max_length=64, unique=True)
+    model = models.CharField(max_length=100)
+    prompt_version = models.CharField(max_length=50)
+    response = models.TextField()
+    hits = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_used_at = models.DateTimeField(db_index=True)
+    expires_at = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return f"{self.prompt_version} | {self.model} | {self.hits} hits"
@@ -0,0 +1,211 @@
+import os
+import re
+from dataclasses import dataclass
+from datetime import date
+from dateutil import parser as date_parser
+from django.utils import timezone
+from processing.cleaners import DATE_RE
+from processing.models import CleanedOpportunity
+from core.logging import llm_extractor_logger
+
+
+# -------------------- Config --------------------
+PREFILTER_ENABLED = os.getenv("PREFILTER_ENABLED", "true").lower() == "true"
+MIN_WORDS_FOR_LANGUAGE_CHECK = 40
+MIN_ENGLISH_STOPWORD_SHARE = 0.12  # English prose sits around 0.25; index/list pages can drop below 0.05
+MIN_FOREIGN_STOPWORD_SHARE = 0.05
+MAX_NON_LATIN_SHARE = 0.30  # e.g. Amharic (Ge'ez script) or Arabic pages
+DEADLINE_WINDOW_CHARS = 120  # how far after a deadline phrase to look for its date
+MIN_FUNDING_SCORE = 1
+
+ENGLISH_STOPWORDS = {
+    "the", "and", "of", "to", "in", "for", "is", "on", "that", "by", "with", "are", "be", "this",
+    "from", "or", "as", "at", "an", "will", "it", "your", "you", "our", "we", "their", "which",
+    "have", "has", "not", "all", "can", "who", "must", "should", "may", "more", "these", "its",
+}
+# Languages the target region's sites commonly publish in besides English (Latin script)
+FOREIGN_STOPWORDS = {
+    "french": {"le", "la", "les", "des", "du", "et", "est", "pour", "dans", "une", "sur", "avec", "par", "aux", "sont", "vous", "nous", "ce", "qui"},
+    "spanish": {"el", "los", "las", "del", "y", "es", "para", "con", "una", "por", "que", "se", "su", "sus", "como", "al"},
+    "portuguese": {"os", "as", "do", "da", "dos", "das", "e", "para", "com", "uma", "por", "que", "no", "na", "ao", "seu"},
+    "german": {"der", "die", "das", "und", "ist", "für", "mit", "den", "dem", "ein", "eine", "nicht", "auf", "sie", "wir"},
+    "italian": {"il", "gli", "della", "delle", "di", "e", "per", "con", "una", "che", "sono", "nel", "alla"},
+    "swahili": {"na", "ya", "wa", "za", "kwa", "ni", "katika", "la", "kuwa", "hii", "kama", "pia", "au", "cha"},
+}
+
+# Target geography, as the extraction prompt defines it
+TARGET_PLACES = (
+    "ethiopia", "ethiopian", "addis ababa", "amhara", "oromia", "tigray", "sidama", "afar region",
+    "dire dawa", "hawassa", "bahir dar", "mekelle", "adama", "gondar", "jimma",
+    "horn of africa", "djibouti", "eritrea", "somalia", "somaliland", "igad",
+)
+# Opportunities open to these wider regions can still include Ethiopia; leave those to the LLM
+BROAD_REGIONS = (
+    "africa", "african", "global", "worldwide", "international", "all countries", "any country",
+    "developing countries", "low- and middle-income", "lmic", "emerging markets",
+)
+DEADLINE_PHRASES_RE = re.compile(
+    r"deadline|closing date|closes on|close on|apply by|applications? close|due date|submission date|"
+    r"submit (?:by|before|no later than)|no later than|last date",
+    re.IGNORECASE,
+)
+FUNDING_TERMS = {
+    "grant": 2, "funding": 2, "call for proposals": 3, "request for proposal": 3, "rfp": 3,
+    "expression of interest": 3, "eoi": 2, "tender": 3, "procurement": 2, "bid": 1, "loan": 2,
+    "equity": 2, "investment": 1, "investor": 1, "venture capital": 2, "accelerator": 2,
+    "incubator": 1, "competition": 1, "challenge fund": 3, "award": 1, "contract": 1,
+    "financing": 2, "fund": 1, "apply": 1, "application": 1, "eligibility": 1, "eligible": 1,
+}
+
+_WORD_RE = re.compile(r"[^\W\d_]+")
+_FUNDING_RE = re.compile(r"\b(" + "|".join(re.escape(term) for term in FUNDING_TERMS) + r")s?\b", re.IGNORECASE)
+
+
+@dataclass
+class PrefilterResult:
+    passed: bool
+    rejection_stage: str = ""
+    justification: str = ""
+    funding_score: int = 0
+
+
+def _contains_any(text, terms):
+    return any(re.search(r"\b" + re.escape(term) + r"\b", text) for term in terms)
+
+
+def _stopword_share(words, stopwords):
+    return sum(1 for word in words if word in stopwords) / len(words)
+
+
+def looks_english(text):
+    """
+    Script check plus stopword shares. A Latin-script page only fails when another
+    language's function words clearly outnumber English ones, so terse English
+    index and listing pages pass; too-short texts get the benefit of the doubt.
+    """
+    words = _WORD_RE.findall(text.lower())
+    if len(words) < MIN_WORDS_FOR_LANGUAGE_CHECK:
+        return True
+    non_latin = sum(1 for word in words if ord(word[0]) > 0x24F)  # beyond Latin Extended-B
+    if non_latin / len(words) > MAX_NON_LATIN_SHARE:
+        return False
+    english = _stopword_share(words, ENGLISH_STOPWORDS)
+    if english >= MIN_ENGLISH_STOPWORD_SHARE:
+        return True
+    foreign = max(_stopword_share(words, stopwords) for stopwords in FOREIGN_STOPWORDS.values())
+    return foreign < max(MIN_FOREIGN_STOPWORD_SHARE, 2 * english)
+
+
+def mentions_target_region(text):
+    lowered = text.lower()
+    return _contains_any(lowered, TARGET_PLACES) or _contains_any(lowered, BROAD_REGIONS)
+
+
+_NUMERIC_DATE_RE = re.compile(r"(\d{1,2})/(\d{1,2})/\d{4}")
+_ISO_DATE_RE = re.compile(r"\d{4}-\d{2}-\d{2}")
+
+
+def _parse_date(value):
+    """
+    Date of a DATE_RE match. 03/04/2026 is 3 April in most of the world and
+    March 4 in the US, so an all-numeric date that reads both ways is unknown
+    (None) rather than a guess that could reject an open call as expired.
+    ISO dates are read year-month-day (dayfirst would swap them).
+    """
+    if _ISO_DATE_RE.fullmatch(value):
+        try:
+            return date.fromisoformat(value)
+        except ValueError:
+            return None
+    numeric = _NUMERIC_DATE_RE.fullmatch(value)
+    if numeric:
+        first, second = int(numeric.group(1)), int(numeric.group(2))
+        if first <= 12 and second <= 12 and first != second:
+            return None
+    try:
+        return date_parser.parse(value, dayfirst=True).date()
+    except (ValueError, OverflowError):
+        return None
+
+
+def deadline_dates(text):
+    """Dates that follow a deadline phrase ("Deadline: 30 June 2025", "apply by 2025-06-30", ...)."""
+    dates = []
+    for phrase in DEADLINE_PHRASES_RE.finditer(text):
+        window = text[phrase.end():phrase.end() + DEADLINE_WINDOW_CHARS]
+        match = DATE_RE.search(window)
+        if match:
+            parsed = _parse_date(match.group(0))
+            if parsed:
+                dates.append(parsed)
+    return dates
+
+
+def funding_score(text):
+    return sum(FUNDING_TERMS[match.group(1).lower()] for match in _FUNDING_RE.finditer(text))
+
+
+def prefilter(text, today=None):
+    """
+    Run the extraction prompt's hard rules locally, in the same order: language,
+    geography, deadline, domain. Only obvious cases are rejected; anything
+    uncertain passes through to the LLM.
+    """
+    today = today or timezone.now().date()
+    if not looks_english(text):
+        return PrefilterResult(False, "language", "Not written in English")
+    if not mentions_target_region(text):
+        return PrefilterResult(False, "geography", "Outside target geography")
+    deadlines = deadline_dates(text)
+    if deadlines and max(deadlines) < today:
+        return PrefilterResult(False, "deadline", "Missing or expired deadline")
+    score = funding_score(text)
+    if score < MIN_FUNDING_SCORE:
+        return PrefilterResult(False, "domain", "No funding, grant, tender or investment terms", score)
+    return PrefilterResult(True, funding_score=score)
+
+
+def prefilter_items(items):
+    """
+    Mark items the pre-filter rejects as garbage (bulk update) and return the rest,
+    which still need the LLM.
+    """
+    if not PREFILTER_ENABLED:
+        return list(items)
+    survivors, rejected = [], []
+    for item in items:
+        result = prefilter(item.cleaned_content)
+        if result.passed:
+            survivors.append(item)
+            continue
+        item.status = "garbage"
+        item.rejection_stage = result.rejection_stage
+        item.rejected_by = "prefilter"
+        item.justification = result.justification
+        rejected.append(item)
+        llm_extractor_logger.info(f"Pre-filter rejected ({result.rejection_stage}): {item.url}")
+    if rejected:
+        CleanedOpportunity.objects.bulk_update(rejected, ["status", "rejection_stage", "rejected_by", "justification"])
+    total = len(rejected) + len(survivors)
+    if total:
+        llm_extractor_logger.info(
+            f"Pre-filter rejected {len(rejected)}/{total} items, saving {100 * len(rejected) / total:.0f}% of LLM calls this run"
+        )
+    return survivors
+
+
+def prefilter_report(since=None):
+    """Share of extraction decisions made locally (pre-filter or relevance model) without an LLM call."""
+    rows = CleanedOpportunity.objects.all()
+    if since is not None:
+        rows = rows.filter(created_at__gte=since)
+    prefiltered = rows.filter(rejected_by="prefilter").count()
+    classified = rows.filter(rejected_by="classifier").count()
+    llm_calls = rows.filter(status="processed").count() + rows.filter(rejected_by="llm").count()
+    total = prefiltered + classified + llm_calls
+    return {
+        "prefiltered": prefiltered,
+        "classified": classified,
+        "llm_calls": llm_calls,
+        "saved_share": (prefiltered + classified) / total if total else 0.0,
+    }
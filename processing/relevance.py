@@ -0,0 +1,114 @@
+import os
+import threading
+from pathlib import Path
+import joblib
+import numpy as np
+from core.embeddings import EMBEDDING_MODEL, embed_texts
+from core.logging import llm_extractor_logger
+from processing.models import CleanedOpportunity
+
+
+# -------------------- Config --------------------
+RELEVANCE_ENABLED = os.getenv("RELEVANCE_ENABLED", "true").lower() == "true"
+RELEVANCE_MODEL_DIR = Path(os.getenv("RELEVANCE_MODEL_DIR", Path(__file__).resolve().parent.parent / "artifacts" / "relevance"))
+# Override the threshold stored in the artifact (chosen at training time for the target recall)
+RELEVANCE_THRESHOLD = os.getenv("RELEVANCE_THRESHOLD")
+ARTIFACT_PREFIX = "relevance-"
+
+_artifact = None
+_artifact_pid = None
+_lock = threading.Lock()
+
+
+def document_text(cleaned_opportunity):
+    """What the classifier sees: page title plus the main body the LLM would get."""
+    title = (cleaned_opportunity.content_metadata or {}).get("title", "")
+    body = cleaned_opportunity.main_content or cleaned_opportunity.cleaned_content
+    return f"{title}\n{body}" if title else body
+
+
+def artifact_path(version):
+    return RELEVANCE_MODEL_DIR / f"{ARTIFACT_PREFIX}{version}.joblib"
+
+
+def latest_artifact_path():
+    """Newest artifact in RELEVANCE_MODEL_DIR; versions are timestamps so names sort by age."""
+    if not RELEVANCE_MODEL_DIR.is_dir():
+        return None
+    artifacts = sorted(RELEVANCE_MODEL_DIR.glob(f"{ARTIFACT_PREFIX}*.joblib"))
+    return artifacts[-1] if artifacts else None
+
+
+def save_artifact(artifact):
+    RELEVANCE_MODEL_DIR.mkdir(parents=True, exist_ok=True)
+    path = artifact_path(artifact["version"])
+    joblib.dump(artifact, path)
+    return path
+
+
+def load_artifact(path=None):
+    """
+    The relevance artifact for this process, loaded once (and again after a fork).
+    Returns None when no model has been trained yet.
+    """
+    global _artifact, _artifact_pid
+    with _lock:
+        if path is not None:
+            return joblib.load(path)
+        if _artifact_pid != os.getpid():
+            latest = latest_artifact_path()
+            _artifact = joblib.load(latest) if latest else None
+            _artifact_pid = os.getpid()
+            if _artifact:
+                llm_extractor_logger.info(f"Loaded relevance model {_artifact['version']} from {latest}")
+        return _artifact
+
+
+def threshold_for(artifact):
+    return float(RELEVANCE_THRESHOLD) if RELEVANCE_THRESHOLD else artifact["threshold"]
+
+
+def score_texts(texts, artifact):
+    """Probability that each text is a real opportunity, from one batched encode."""
+    if artifact["embedding_model"] != EMBEDDING_MODEL:
+        raise ValueError(
+            f"Relevance model {artifact['version']} was trained on {artifact['embedding_model']}, "
+            f"but EMBEDDING_MODEL is {EMBEDDING_MODEL}"
+        )
+    if not texts:
+        return np.zeros(0)
+    return artifact["classifier"].predict_proba(embed_texts(texts))[:, 1]
+
+
+def relevance_filter(items):
+    """
+    Mark items scoring below the relevance threshold as garbage (bulk update) and
+    return the rest for the LLM. A no-op until a model has been trained. If the
+    model can't be loaded or scoring fails, every item goes on to the LLM.
+    """
+    items = list(items)
+    try:
+        artifact = load_artifact() if RELEVANCE_ENABLED and items else None
+        if artifact is None:
+            return items
+        threshold = threshold_for(artifact)
+        scores = score_texts([document_text(item) for item in items], artifact)
+    except Exception as e:
+        llm_extractor_logger.error(f"Relevance model failed, passing {len(items)} items through unfiltered: {e}", exc_info=True)
+        return items
+    survivors, rejected = [], []
+    for item, score in zip(items, scores):
+        if score >= threshold:
+            survivors.append(item)
+            continue
+        item.status = "garbage"
+        item.rejection_stage = "domain"
+        item.rejected_by = "classifier"
+        item.justification = f"Relevance score {score:.2f} below threshold {threshold:.2f} (model {artifact['version']})"
+        rejected.append(item)
+    if rejected:
+        CleanedOpportunity.objects.bulk_update(rejected, ["status", "rejection_stage", "rejected_by", "justification"])
+    llm_extractor_logger.info(
+        f"Relevance model {artifact['version']} rejected {len(rejected)}/{len(items)} items below {threshold:.2f}"
+    )
+    return survivors
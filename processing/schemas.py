@@ -0,0 +1,19 @@
+from pydantic import BaseModel
+
+
+class ExtractionResult(BaseModel):
+    """Answer to EXTRACTION_PROMPT; rejected pages leave the opportunity fields empty."""
+    is_opportunity: bool
+    rejection_stage: str = ""  # language | geography | deadline | domain
+    geo_scope: str = ""  # ethiopia | horn_of_africa
+    title: str = ""
+    description: str = ""
+    organization: str = ""
+    category: str = ""
+    eligibility: str = ""
+    deadline: str = ""  # YYYY-MM-DD
+    location: str = ""
+    url: str = ""
+    posted_date: str = ""
+    confidence_score: float = 0.0
+    justification: str = ""
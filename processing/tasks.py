@@ -1,28 +1,77 @@
 from celery import shared_task
 import logging
+from django.conf import settings
 from processing.cleaners import process_raw_opportunities
-from processing.models import CleanedOpportunity
-from processing.llm_extractor import extract_opportunity_data
+from sources.blob_store import purge_cleaned_blobs
+from processing.dedup import cluster_near_duplicates
+from core.llm_cache import cache_stats, evict_llm_cache
+from processing.batch import poll_batches, submit_extraction_batch
+from processing.llm_extractor import awaiting_matching, extract_many, extraction_queue, pending_extraction_items
+from processing.prefilter import prefilter_report
+from matching.tasks import run_matching_task
 from core.logging import cleaner_logger, llm_extractor_logger
+from core.pipeline import enqueue_stage
     
     
 # === Tasks ===
 @shared_task
-def run_cleaning_task():
-    process_raw_opportunities()
+def run_cleaning_task(raw_ids=None):
+    cleaned_ids = process_raw_opportunities(raw_ids=raw_ids)
+    # extraction only claims hashed rows, so hash exactly this run's rows before handing them on
+    cluster_near_duplicates(ids=cleaned_ids)
+    # the sweep run (no raw_ids) also picks up pending rows an earlier run left unhashed
+    if raw_ids is None:
+        cluster_near_duplicates()
+    # near-duplicates found above are skipped by the extraction claim, which only takes pending rows
+    enqueue_stage(run_llm_extraction_task, cleaned_ids, cleaner_logger)
     cleaner_logger.info("Cleaning complete")
     return "Cleaning Complete"
 
 @shared_task
-def run_llm_extraction_task():
-    pending_items = CleanedOpportunity.objects.filter(status="pending").order_by('-id')[:15]
-    if not pending_items.exists():
+def purge_raw_blobs_task():
+    purged = purge_cleaned_blobs()
+    return f"Purged {purged} raw HTML blobs"
+
+@shared_task
+def run_llm_extraction_task(cleaned_ids=None):
+    if settings.LLM_BATCH_MODE:
+        job = submit_extraction_batch(ids=cleaned_ids)
+        return f"Submitted extraction batch {job.batch_id}" if job else None
+
+    pending_items = pending_extraction_items(ids=cleaned_ids)
+    if not pending_items:
         llm_extractor_logger.info("No pending items to process.")
         return
 
-    llm_extractor_logger.info(f"Starting extraction for {pending_items.count()} pending items...")
-    for item in pending_items:
-        llm_extractor_logger.info(f"Extracting began for {item.source_name}")
-        extract_opportunity_data(item)
+    llm_extractor_logger.info(f"Starting extraction for {len(pending_items)} pending items...")
+    try:
+        extract_many(pending_items)
+    finally:
+        # items that errored go back to pending for the next run
+        extraction_queue.release(pending_items)
+    enqueue_stage(run_matching_task, awaiting_matching(pending_items), llm_extractor_logger)
     llm_extractor_logger.info("Extraction batch completed.")
-    return f"LLM extraction Complete for {pending_items.count()}"
+    return f"LLM extraction Complete for {len(pending_items)}"
+
+@shared_task
+def poll_llm_batches_task():
+    finished = poll_batches()
+    return f"{finished} LLM batches finished"
+
+@shared_task
+def evict_llm_cache_task():
+    expired, evicted = evict_llm_cache()
+    for prompt_version, stats in cache_stats().items():
+        llm_extractor_logger.info(
+            f"LLM cache {prompt_version}: {stats['hits']} hits / {stats['misses']} misses "
+            f"({stats['hit_rate']:.0%} hit rate), {stats['repaired']} repaired, "
+            f"{stats['parse_failures']} parse failures"
+        )
+    report = prefilter_report()
+    llm_extractor_logger.info(
+        f"Local gating: {report['prefiltered']} pre-filter + {report['classified']} relevance-model rejections "
+        f"vs {report['llm_calls']} decided by the LLM "
+        f"({report['saved_share']:.0%} of extraction calls saved)"
+    )
+    llm_extractor_logger.info(f"LLM cache eviction: {expired} expired, {evicted} over the size cap")
+    return f"Evicted {expired + evicted} LLM cache entries"
@@ -0,0 +1,330 @@
+import json
+from datetime import date, timedelta
+from unittest import mock
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+from core.llm_batch import BatchBackend
+from core.logging import cleaner_logger
+from core.work_queue import IN_PROGRESS, WorkQueue
+from processing.batch import poll_batches, submit_extraction_batch
+from processing.cleaners import clean_html, clean_html_bs4
+from processing.dedup import (
+    SIMHASH_BANDS, cluster_near_duplicates, hamming_distance, simhash, simhash_bands, to_signed, to_unsigned,
+)
+from processing.models import CleanedOpportunity, LLMBatchJob, ProcessedOpportunity, SimHashBand
+from processing.prefilter import _parse_date, deadline_dates
+from sources.models import RawOpportunity
+
+
+PAGE = """<!DOCTYPE html>
+<html lang="en">
+<head>
+  <meta charset="utf-8">
+  <title>Green Innovation Grant 2026 &ndash; Apply now</title>
+  <style>body { font-family: sans-serif; }</style>
+  <script>window.dataLayer = window.dataLayer || []; if (a && b) { track("view"); }</script>
+</head>
+<body class="home">
+  <!-- header -->
+  <nav><ul><li><a href="/?lang=en&amp;ref=nav">Home</a></li><li><a href="/calls?page=2&sort=date">Calls</a></li></ul></nav>
+  <main>
+    <h1>Green Innovation Grant</h1>
+    <p>Up to &euro;50,000 for R&D projects by early-stage startups&nbsp;in Africa.</p>
+    <p>Deadline: <time datetime="2026-03-31">31 March 2026</time> &mdash; eligibility &amp; rules below.</p>
+    <ul><li>Registered company</li><li>Fewer than 50 employees &lt; 5 years old</li></ul>
+    <table><tr><th>Stage</th><td>Seed</td></tr></table>
+    <noscript>Enable JavaScript to see the application form.</noscript>
+    <pre>  Contact:  grants@example.org  </pre>
+    <ruby>漢<rt>kan</rt></ruby>
+  </main>
+  <footer>&copy; 2026 Example Foundation</footer>
+  <template><p>hidden</p></template>
+</body>
+</html>
+"""
+
+
+class CleanHtmlGoldenTests(SimpleTestCase):
+    """clean_html (lxml) must produce exactly the text of the reference clean_html_bs4."""
+
+    def assertSameAsReference(self, html, expected=None):
+        reference = clean_html_bs4(html)
+        self.assertEqual(clean_html(html), reference)
+        if expected is not None:
+            self.assertEqual(reference, expected)
+
+    def test_full_page(self):
+        self.assertSameAsReference(PAGE)
+
+    def test_empty(self):
+        self.assertEqual(clean_html(""), "")
+        self.assertSameAsReference("<html><body></body></html>", "")
+
+    def test_scripts_styles_and_noscript_are_dropped(self):
+        self.assertSameAsReference("<p>a</p><script>b</script><style>c</style><noscript>d</noscript><p>e</p>", "a e")
+
+    def test_comments_and_processing_instructions(self):
+        self.assertSameAsReference("<p>a</p><!-- c --><p>b</p><?php echo 1 ?><p>c</p>", "a b c")
+
+    def test_raw_text_elements_holding_markup(self):
+        self.assertSameAsReference("<textarea><b>not bold</b></textarea>", "not bold")
+        self.assertSameAsReference("<p>a<xmp><i>x</i></xmp>b</p>", "a x b")
+        self.assertSameAsReference("<p>a</p><plaintext><b>y</b> z", "a y z")
+        self.assertSameAsReference("<title>T &amp; <b>x</b></title><p>b</p>", "T & x b")
+        self.assertSameAsReference("<iframe><b>i</b></iframe><noembed><b>n</b></noembed><noframes><b>f</b></noframes>")
+
+    def test_raw_text_elements_holding_plain_text(self):
+        self.assertSameAsReference("<title>Plain title</title><textarea>notes</textarea><p>b</p>", "Plain title notes b")
+
+    def test_content_after_closing_html(self):
+        self.assertSameAsReference("<html><body>a</body></html><!-- c --> z", "a z")
+        self.assertSameAsReference("<html><body><p>a</p></body></html>tail text", "a tail text")
+
+    def test_nul_byte(self):
+        self.assertSameAsReference("<p>a\x00b</p>", "a\x00b")
+
+    def test_unknown_and_unterminated_entities(self):
+        self.assertSameAsReference("<p>a &unknown; b</p>", "a &unknown b")
+        self.assertSameAsReference("<p>&notit; &copyx</p>")
+        self.assertSameAsReference("<p>x &amp")
+        self.assertSameAsReference("<p>&#0; &#xD800; &#1114112;</p>")
+        self.assertSameAsReference("<p>&#65 &#x41</p>")
+
+    def test_known_entities(self):
+        self.assertSameAsReference(
+            "<p>&amp; &lt; &gt; &quot; &nbsp; &copy; &copy &euro; &#8217; &#x41; &#128;</p>"
+        )
+
+    def test_stray_ampersands(self):
+        self.assertSameAsReference("<p>R&D grants for a&b, 1 & 2</p><a href='?a=1&b=2'>next</a>", "R&D grants for a&b, 1 & 2 next")
+
+    def test_cdata_section(self):
+        self.assertSameAsReference("<p>a</p><![CDATA[ raw ]]><p>b</p>")
+
+    def test_xml_declaration(self):
+        self.assertSameAsReference('<?xml version="1.0" encoding="utf-8"?><html><body><p>x</p></body></html>', "x")
+
+    def test_whitespace_is_collapsed(self):
+        self.assertSameAsReference("<p>  a \n\n b\t</p>\n\n<div>\n c </div>", "a b c")
+
+
+class InMemoryBatchBackend(BatchBackend):
+    """Keeps submitted batches in memory; answer(custom_id, body) gives each request's content (None = failed)."""
+
+    def __init__(self, answer, status="completed"):
+        self.answer = answer
+        self.status = status
+        self.batches = {}
+
+    def submit(self, jsonl, metadata=None):
+        batch_id = f"batch_{len(self.batches)}"
+        self.batches[batch_id] = [json.loads(line) for line in jsonl.splitlines()]
+        return batch_id
+
+    def poll(self, batch_id):
+        if self.status != "completed":
+            return self.status, None
+        return "completed", {r["custom_id"]: self.answer(r["custom_id"], r["body"]) for r in self.batches[batch_id]}
+
+
+def make_cleaned(text, simhash):
+    # a simhash marks the document as through the near-duplicate pass, ready for extraction
+    raw = RawOpportunity.objects.create(source_type="static", source_name="test", url=f"https://example.org/{text}", raw_content="c")
+    return CleanedOpportunity.objects.create(
+        raw_opportunity=raw, source_name="test", url=raw.url, cleaned_content=text, main_content=text, simhash=simhash
+    )
+
+
+def extraction_answer(title):
+    return json.dumps({
+        "is_opportunity": True, "geo_scope": "ethiopia", "title": title,
+        "deadline": "2099-01-31", "description": "Grant for Ethiopian startups",
+    })
+
+
+@mock.patch("processing.batch.relevance_filter", lambda items: list(items))
+class ExtractionBatchTests(TestCase):
+    def setUp(self):
+        self.items = [make_cleaned(f"Ethiopia startup grant call {i}, apply by 31 January 2099", simhash=i) for i in range(3)]
+
+    def statuses(self):
+        return [item.status for item in CleanedOpportunity.objects.order_by("id")]
+
+    def test_submit_records_the_job_and_marks_items_batched(self):
+        backend = InMemoryBatchBackend(lambda custom_id, body: None)
+        job = submit_extraction_batch(backend=backend)
+        self.assertEqual(sorted(job.item_ids), [item.id for item in self.items])
+        self.assertEqual(len(backend.batches[job.batch_id]), 3)
+        self.assertEqual(self.statuses(), ["batched"] * 3)
+
+    def test_partial_results_are_applied_and_failed_requests_go_back_to_pending(self):
+        failed = str(self.items[1].id)
+        backend = InMemoryBatchBackend(lambda custom_id, body: None if custom_id == failed else extraction_answer(custom_id))
+        job = submit_extraction_batch(backend=backend)
+        self.assertEqual(poll_batches(backend=backend), 1)
+        self.assertEqual(self.statuses(), ["processed", "pending", "processed"])
+        self.assertEqual(ProcessedOpportunity.objects.count(), 2)
+        job.refresh_from_db()
+        self.assertEqual(job.status, "applied")
+
+    def test_batch_in_progress_is_left_alone(self):
+        backend = InMemoryBatchBackend(lambda custom_id, body: None, status="in_progress")
+        submit_extraction_batch(backend=backend)
+        self.assertEqual(poll_batches(backend=backend), 0)
+        self.assertEqual(self.statuses(), ["batched"] * 3)
+
+    def test_failed_batch_returns_items_to_pending(self):
+        backend = InMemoryBatchBackend(lambda custom_id, body: None)
+        job = submit_extraction_batch(backend=backend)
+        backend.status = "failed"
+        self.assertEqual(poll_batches(backend=backend), 1)
+        self.assertEqual(self.statuses(), ["pending"] * 3)
+        job.refresh_from_db()
+        self.assertEqual(job.status, "failed")
+
+    def test_recording_failure_after_upload_leaves_items_claimable(self):
+        backend = InMemoryBatchBackend(lambda custom_id, body: None)
+        with mock.patch("processing.batch.mark_batched", side_effect=RuntimeError("db down")):
+            with self.assertRaises(RuntimeError):
+                submit_extraction_batch(backend=backend)
+        self.assertEqual(len(backend.batches), 1)  # uploaded, so the error log names it for cancelling
+        self.assertFalse(LLMBatchJob.objects.exists())
+        self.assertEqual(self.statuses(), ["pending"] * 3)
+
+
+def make_raw(count):
+    return [
+        RawOpportunity.objects.create(source_type="static", source_name="test", url=f"https://example.org/{i}", raw_content="c")
+        for i in range(count)
+    ]
+
+
+class WorkQueueTests(TestCase):
+    def setUp(self):
+        self.queue = WorkQueue(RawOpportunity, cleaner_logger)
+        self.rows = make_raw(5)
+
+    def pending(self):
+        return RawOpportunity.objects.filter(status="pending").order_by("id")
+
+    def status_of(self, row):
+        return RawOpportunity.objects.values_list("status", flat=True).get(id=row.id)
+
+    def test_claims_are_disjoint(self):
+        first = self.queue.claim(self.pending(), 2)
+        second = self.queue.claim(self.pending(), 2)
+        third = self.queue.claim(self.pending(), 2)
+        claimed = [row.id for row in first + second + third]
+        self.assertEqual(sorted(claimed), [row.id for row in self.rows])
+        self.assertEqual(len(third), 1)
+        self.assertEqual(self.queue.claim(self.pending(), 2), [])
+        self.assertTrue(all(row.status == IN_PROGRESS and row.lease_expires_at for row in first))
+        self.assertEqual(RawOpportunity.objects.filter(status=IN_PROGRESS).count(), 5)
+
+    def test_claim_among_ids(self):
+        wanted = [self.rows[1].id, self.rows[3].id]
+        self.assertEqual(sorted(row.id for row in self.queue.claim(self.pending(), 10, ids=wanted)), wanted)
+
+    def test_release_returns_only_unfinished_rows(self):
+        claimed = self.queue.claim(self.pending(), 2)
+        RawOpportunity.objects.filter(id=claimed[0].id).update(status="cleaned", lease_expires_at=None)
+        self.assertEqual(self.queue.release(claimed), 1)
+        self.assertEqual([self.status_of(row) for row in claimed], ["cleaned", "pending"])
+
+    def test_expired_lease_is_reclaimed(self):
+        crashed = self.queue.claim(self.pending(), 5)
+        RawOpportunity.objects.filter(id=crashed[0].id).update(lease_expires_at=timezone.now() - timedelta(seconds=1))
+        with self.assertLogs(cleaner_logger, level="WARNING"):
+            reclaimed = self.queue.claim(self.pending(), 5)
+        self.assertEqual([row.id for row in reclaimed], [crashed[0].id])
+
+    def test_stale_release_is_ignored(self):
+        slow = self.queue.claim(self.pending(), 1)
+        RawOpportunity.objects.filter(id=slow[0].id).update(lease_expires_at=timezone.now() - timedelta(seconds=1))
+        with self.assertLogs(cleaner_logger, level="WARNING"):
+            taken_over = self.queue.claim(self.pending(), 1)
+        self.assertEqual(taken_over[0].id, slow[0].id)
+        # the first worker finally gives up its rows: the new owner's claim stands
+        self.assertEqual(self.queue.release(slow), 0)
+        self.assertEqual(self.status_of(slow[0]), IN_PROGRESS)
+        self.assertEqual(self.queue.release(taken_over), 1)
+        self.assertEqual(self.status_of(slow[0]), "pending")
+
+
+WORDS = " ".join(f"word{i}" for i in range(300))
+
+
+class SimHashTests(SimpleTestCase):
+    def test_near_identical_texts_are_close_and_different_texts_far(self):
+        original = simhash("Green innovation grant for Ethiopian startups. " + WORDS)
+        edited = simhash("Green innovation grant for Ethiopian startups! " + WORDS.replace("word150 ", "changed "))
+        other = simhash("Bakery news from Ohio with recipes and more. " * 5)
+        self.assertLessEqual(hamming_distance(original, edited), 3)
+        self.assertGreater(hamming_distance(original, other), 3)
+
+    def test_bands_split_the_hash(self):
+        value = simhash(WORDS)
+        bands = simhash_bands(value)
+        self.assertEqual([band for band, _ in bands], list(range(SIMHASH_BANDS)))
+        self.assertEqual(sum(key << (band * 16) for band, key in bands), value)
+
+    def test_hashes_within_three_bits_share_a_band(self):
+        value = simhash(WORDS)
+        # one flipped bit in each of three bands leaves the fourth identical
+        flipped = value ^ (1 << 0) ^ (1 << 17) ^ (1 << 34)
+        self.assertEqual(hamming_distance(value, flipped), 3)
+        shared = set(simhash_bands(value)) & set(simhash_bands(flipped))
+        self.assertEqual(shared, {simhash_bands(value)[3]})
+
+    def test_signed_storage_round_trips(self):
+        for value in (0, 1, (1 << 63) - 1, 1 << 63, (1 << 64) - 1):
+            self.assertEqual(to_unsigned(to_signed(value)), value)
+            self.assertGreaterEqual(to_signed(value), -(1 << 63))
+
+
+class NearDuplicateClusteringTests(TestCase):
+    def make(self, text):
+        raw = make_raw(1)[0]
+        return CleanedOpportunity.objects.create(raw_opportunity=raw, source_name="test", url=raw.url, cleaned_content=text)
+
+    def test_near_duplicate_joins_the_first_copy(self):
+        original = self.make("Green innovation grant for Ethiopian startups. " + WORDS)
+        copy = self.make("Green innovation grant for Ethiopian startups! " + WORDS.replace("word150 ", "changed "))
+        other = self.make("Bakery news from Ohio with recipes and more. " * 5)
+        self.assertEqual(cluster_near_duplicates(), 1)
+        copy.refresh_from_db()
+        self.assertEqual((copy.status, copy.duplicate_of_id), ("duplicate", original.id))
+        # representatives are indexed; the duplicate only keeps its hash
+        self.assertEqual(
+            set(SimHashBand.objects.values_list("cleaned_opportunity_id", flat=True)), {original.id, other.id}
+        )
+        self.assertFalse(CleanedOpportunity.objects.filter(simhash__isnull=True).exists())
+
+    def test_only_the_given_ids_are_handled(self):
+        first, second = self.make("first page " + WORDS), self.make("Bakery news from Ohio. " * 5)
+        cluster_near_duplicates(ids=[second.id])
+        self.assertEqual(
+            list(CleanedOpportunity.objects.filter(simhash__isnull=False).values_list("id", flat=True)), [second.id]
+        )
+
+
+class ParseDateTests(SimpleTestCase):
+    def test_ambiguous_numeric_dates_are_unknown(self):
+        self.assertIsNone(_parse_date("03/04/2026"))
+        self.assertIsNone(_parse_date("12/1/2026"))
+
+    def test_numeric_dates_that_read_one_way(self):
+        self.assertEqual(_parse_date("13/04/2026"), date(2026, 4, 13))
+        self.assertEqual(_parse_date("04/13/2026"), date(2026, 4, 13))
+        self.assertEqual(_parse_date("05/05/2026"), date(2026, 5, 5))
+
+    def test_iso_dates_are_year_month_day(self):
+        self.assertEqual(_parse_date("2026-03-04"), date(2026, 3, 4))
+        self.assertIsNone(_parse_date("2026-02-30"))
+
+    def test_written_dates(self):
+        self.assertEqual(_parse_date("30 June 2026"), date(2026, 6, 30))
+
+    def test_ambiguous_deadline_is_not_used(self):
+        self.assertEqual(deadline_dates("Deadline: 03/04/2026"), [])
+        self.assertEqual(deadline_dates("Deadline: 30/04/2026"), [date(2026, 4, 30)])
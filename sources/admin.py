@@ -1,6 +1,7 @@
 from django.contrib import admin
-from .models import RawOpportunity, SourceRegistry
+from .models import RawOpportunity, SourceRegistry, FetchedPage
 
 
 admin.site.register(RawOpportunity)
-admin.site.register(SourceRegistry) 
\ No newline at end of file
+admin.site.register(SourceRegistry)
+admin.site.register(FetchedPage)
\ No newline at end of file
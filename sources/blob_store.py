@@ -0,0 +1,88 @@
+import gzip
+import hashlib
+import os
+from datetime import timedelta
+from django.db import transaction
+from django.utils import timezone
+from core.logging import cleaner_logger
+from core.work_queue import IN_PROGRESS
+from sources.models import RawContentBlob, RawOpportunity
+
+
+# -------------------- Config --------------------
+RAW_BLOB_COMPRESSION_LEVEL = int(os.getenv("RAW_BLOB_COMPRESSION_LEVEL", 6))
+# cleaned pages keep their HTML this long (for re-cleaning after a cleaner fix), then it is purged
+RAW_BLOB_RETENTION_DAYS = int(os.getenv("RAW_BLOB_RETENTION_DAYS", 7))
+PURGE_BATCH_SIZE = 1000
+
+
+def content_key(html):
+    return hashlib.sha256(html.encode("utf-8")).hexdigest()
+
+
+def store_raw_html(html):
+    """
+    Store page HTML compressed and return (key, size) for the RawOpportunity row.
+    Content seen before is not compressed or written again, only marked as used.
+    """
+    data = html.encode("utf-8")
+    key = hashlib.sha256(data).hexdigest()
+    now = timezone.now()
+    if not RawContentBlob.objects.filter(key=key).update(last_used_at=now):
+        compressed = gzip.compress(data, compresslevel=RAW_BLOB_COMPRESSION_LEVEL)
+        RawContentBlob.objects.bulk_create(
+            [RawContentBlob(key=key, data=compressed, size=len(data), compressed_size=len(compressed), last_used_at=now)],
+            ignore_conflicts=True,  # the same page saved concurrently by another worker
+        )
+    return key, len(data)
+
+
+def load_raw_html(raws):
+    """
+    HTML of each RawOpportunity, in order, decompressed only when the cleaner
+    gets to it: one query fetches the chunk's compressed blobs, and each page
+    is inflated as it is consumed. Rows saved before blob storage fall back to
+    their inline raw_content. Purged content comes back as "".
+    """
+    keys = {raw.content_hash for raw in raws if raw.content_hash}
+    blobs = dict(RawContentBlob.objects.filter(key__in=keys).values_list("key", "data")) if keys else {}
+    for raw in raws:
+        if not raw.content_hash:
+            yield raw.raw_content or ""
+            continue
+        data = blobs.get(raw.content_hash)
+        yield gzip.decompress(bytes(data)).decode("utf-8") if data is not None else ""
+
+
+def purge_cleaned_blobs(retention_days=RAW_BLOB_RETENTION_DAYS, batch_size=PURGE_BATCH_SIZE):
+    """
+    Delete blobs unused for retention_days that no pending or in-progress
+    RawOpportunity still needs. Rows keep their content_hash and content_size as a record of the page.
+    """
+    cutoff = timezone.now() - timedelta(days=retention_days)
+    still_needed = RawOpportunity.objects.filter(
+        status__in=("pending", IN_PROGRESS), content_hash__isnull=False
+    ).values("content_hash")
+    purged = freed = 0
+    while True:
+        batch = list(
+            RawContentBlob.objects.filter(last_used_at__lt=cutoff)
+            .exclude(key__in=still_needed)
+            .values_list("id", flat=True)[:batch_size]
+        )
+        if not batch:
+            break
+        with transaction.atomic():
+            # re-check under lock: store_raw_html may have reused a blob since it was selected
+            doomed = list(
+                RawContentBlob.objects.select_for_update()
+                .filter(id__in=batch, last_used_at__lt=cutoff)
+                .exclude(key__in=still_needed)
+                .values_list("id", "compressed_size")
+            )
+            RawContentBlob.objects.filter(id__in=[blob_id for blob_id, _ in doomed]).delete()
+        purged += len(doomed)
+        freed += sum(size for _, size in doomed)
+    if purged:
+        cleaner_logger.info(f"Purged {purged} raw HTML blobs ({freed / 1_000_000:.1f} MB compressed)")
+    return purged
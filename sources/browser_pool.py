@@ -0,0 +1,241 @@
+import asyncio
+import os
+import threading
+from contextlib import asynccontextmanager
+from playwright.async_api import async_playwright
+from playwright.async_api import Error as PlaywrightError
+from core.logging import scraper_logger
+
+
+# -------------------- Config --------------------
+POOL_SIZE = int(os.getenv("BROWSER_POOL_SIZE", 4))               # reusable contexts/pages per worker process
+MAX_PAGES_PER_BROWSER = int(os.getenv("BROWSER_MAX_PAGES", 200))   # recycle the browser after this many navigations
+MAX_BROWSER_MEMORY_MB = int(os.getenv("BROWSER_MAX_MEMORY_MB", 1500))
+PAGE_ACQUIRE_TIMEOUT = 60  # seconds
+
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64)"
+
+
+def _children_of(pid):
+    try:
+        with open(f"/proc/{pid}/task/{pid}/children") as f:
+            return [int(c) for c in f.read().split()]
+    except OSError:
+        return []
+
+
+def _is_playwright_driver(pid):
+    try:
+        with open(f"/proc/{pid}/cmdline", "rb") as f:
+            return b"playwright" in f.read()
+    except OSError:
+        return False
+
+
+def _process_tree_rss_mb(pid):
+    """Resident memory of a process and all of its descendants (Linux only, 0 elsewhere)."""
+    total_kb = 0
+    stack = [pid]
+    while stack:
+        current = stack.pop()
+        try:
+            with open(f"/proc/{current}/status") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        total_kb += int(line.split()[1])
+                        break
+        except OSError:
+            continue
+        stack.extend(_children_of(current))
+    return total_kb / 1024
+
+
+class BrowserPool:
+    """
+    Long-lived headless Chromium shared by every fetch in the current process.
+
+    The pool keeps POOL_SIZE isolated contexts, each with a single page, and hands
+    them out through a queue. The browser is relaunched when it crashes, after
+    MAX_PAGES_PER_BROWSER navigations, or once the Playwright process tree grows
+    past MAX_BROWSER_MEMORY_MB (the driver and Chromium only, not the worker
+    itself with its ML models). It is bound to the process's browser loop, so
+    only use it from coroutines run with run_on_browser_loop().
+    """
+
+    def __init__(self, size=POOL_SIZE):
+        self.size = size
+        self._lock = asyncio.Lock()
+        self._playwright = None
+        self._browser = None
+        self._slots = asyncio.Queue()
+        self._pages_served = 0
+        self._generation = 0
+
+    # ---------- lifecycle ----------
+
+    async def _start(self):
+        if self._playwright is None:
+            self._playwright = await async_playwright().start()
+        self._browser = await self._playwright.chromium.launch(headless=True)
+        self._generation += 1
+        self._pages_served = 0
+        # refill the same queue: checkouts already waiting on it get the new slots
+        while not self._slots.empty():
+            self._slots.get_nowait()
+        for _ in range(self.size):
+            self._slots.put_nowait(await self._new_slot())
+        scraper_logger.info(f"Browser pool started (generation {self._generation}, {self.size} contexts)")
+
+    async def _new_slot(self):
+        context = await self._browser.new_context(java_script_enabled=True, user_agent=USER_AGENT)
+        return {"context": context, "page": await context.new_page(), "generation": self._generation}
+
+    async def _stop_browser(self):
+        if self._browser is not None:
+            try:
+                await self._browser.close()
+            except PlaywrightError:
+                pass
+        self._browser = None
+
+    async def close(self):
+        async with self._lock:
+            await self._stop_browser()
+            if self._playwright is not None:
+                try:
+                    await self._playwright.stop()
+                except PlaywrightError:
+                    pass
+                self._playwright = None
+            scraper_logger.info("Browser pool closed")
+
+    # ---------- health ----------
+
+    def is_healthy(self):
+        return self._browser is not None and self._browser.is_connected()
+
+    def memory_mb(self):
+        """Resident memory of the Playwright driver and the Chromium processes it launched."""
+        if self._playwright is None:
+            return 0
+        drivers = [child for child in _children_of(os.getpid()) if _is_playwright_driver(child)]
+        return sum(_process_tree_rss_mb(driver) for driver in drivers)
+
+    def _needs_recycle(self):
+        if not self.is_healthy():
+            return True
+        if self._pages_served >= MAX_PAGES_PER_BROWSER:
+            return True
+        return self.memory_mb() > MAX_BROWSER_MEMORY_MB
+
+    async def _ensure_browser(self):
+        async with self._lock:
+            if self._browser is None:
+                await self._start()
+            elif self._slots.qsize() == self.size and self._needs_recycle():
+                # only recycle while every slot is idle so no fetch is cut off mid-navigation
+                scraper_logger.info(
+                    f"Recycling browser after {self._pages_served} pages "
+                    f"({self.memory_mb():.0f} MB, connected={self.is_healthy()})"
+                )
+                await self._stop_browser()
+                await self._start()
+
+    async def _relaunch(self, generation):
+        async with self._lock:
+            if self._generation != generation or self.is_healthy():
+                return  # another checkout already relaunched it
+            scraper_logger.warning(f"Browser crashed after {self._pages_served} pages, relaunching")
+            await self._stop_browser()
+            try:
+                await self._start()
+            except PlaywrightError as e:
+                # leave it stopped; the next checkout tries to launch it again
+                scraper_logger.error(f"Could not relaunch browser: {e}")
+                await self._stop_browser()
+
+    # ---------- checkout ----------
+
+    @asynccontextmanager
+    async def page(self):
+        """Borrow a page from the pool; it is returned (or replaced if broken) on exit."""
+        await self._ensure_browser()
+        slot = await asyncio.wait_for(self._slots.get(), timeout=PAGE_ACQUIRE_TIMEOUT)
+        broken = False
+        try:
+            if slot["page"].is_closed():
+                slot["page"] = await slot["context"].new_page()
+            yield slot["page"]
+        except PlaywrightError:
+            broken = True
+            raise
+        finally:
+            self._pages_served += 1
+            await self._release(slot, broken)
+
+    async def _release(self, slot, broken):
+        if slot["generation"] != self._generation:
+            # browser was recycled while this slot was out; its context died with it
+            return
+        if broken or not self.is_healthy():
+            try:
+                await slot["context"].close()
+            except PlaywrightError:
+                pass
+            if self.is_healthy():
+                slot = await self._new_slot()
+            else:
+                # browser crashed: relaunch now, so checkouts waiting on the queue are not left hanging
+                await self._relaunch(slot["generation"])
+                return
+        else:
+            try:
+                await slot["page"].goto("about:blank")
+                await slot["context"].clear_cookies()
+            except PlaywrightError:
+                slot = await self._new_slot()
+        self._slots.put_nowait(slot)
+
+
+_pool = None
+_loop = None
+_owner_pid = None
+_loop_lock = threading.Lock()
+
+
+def _ensure_process_state():
+    # a forked child inherits the parent's loop and pool objects but not its browser
+    global _pool, _loop, _owner_pid
+    if _owner_pid != os.getpid():
+        _pool = None
+        _loop = asyncio.new_event_loop()
+        _owner_pid = os.getpid()
+
+
+def run_on_browser_loop(coro):
+    """
+    Run coro to completion on this process's long-lived event loop. The pooled
+    browser is bound to that loop, so it survives from one call to the next
+    (asyncio.run() would tear it down with a fresh loop every time). Calls from
+    several threads take turns.
+    """
+    with _loop_lock:
+        _ensure_process_state()
+        return _loop.run_until_complete(coro)
+
+
+def get_browser_pool():
+    """Return the browser pool for this process, creating it on first use (and after a fork)."""
+    global _pool
+    _ensure_process_state()
+    if _pool is None:
+        _pool = BrowserPool()
+    return _pool
+
+
+def shutdown_browser_pool():
+    global _pool
+    with _loop_lock:
+        if _pool is not None and _owner_pid == os.getpid():
+            _loop.run_until_complete(_pool.close())
+        _pool = None
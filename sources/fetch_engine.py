@@ -0,0 +1,248 @@
+import asyncio
+import hashlib
+import importlib.util
+import random
+import re
+import time
+from collections import defaultdict
+from dataclasses import dataclass
+from urllib.parse import urlparse
+import httpx
+from playwright.async_api import Error as PlaywrightError
+from playwright.async_api import TimeoutError as PlaywrightTimeoutError
+from core.logging import scraper_logger
+from sources.browser_pool import USER_AGENT, get_browser_pool, run_on_browser_loop
+
+
+# -------------------- Config --------------------
+MAX_CONCURRENCY = 12        # pages in flight across all hosts
+PER_DOMAIN_CONCURRENCY = 2  # pages in flight against a single host
+PAGE_TIMEOUT_MS = 23000
+HTTP_TIMEOUT = 20           # seconds
+
+HTTP_HEADERS = {
+    "User-Agent": USER_AGENT,
+    "Accept": "text/html,application/xhtml+xml;q=0.9,*/*;q=0.8",
+    "Accept-Language": "en-US,en;q=0.8",
+}
+# HTTP/2 needs the optional h2 package (httpx[http2]); fall back to HTTP/1.1 keep-alive without it
+HTTP2_ENABLED = importlib.util.find_spec("h2") is not None
+
+# A page whose visible text is shorter than this and which ships scripts is treated as a JS shell
+MIN_STATIC_TEXT_CHARS = 300
+JS_SHELL_MARKERS = (
+    "enable javascript",
+    "javascript is required",
+    "javascript to run this app",
+    '<div id="root"></div>',
+    '<div id="app"></div>',
+    '<div id="__next"></div>',
+    "<app-root></app-root>",
+)
+
+_SCRIPT_STYLE_RE = re.compile(r"<(script|style|noscript|template)\b.*?</\1\s*>", re.IGNORECASE | re.DOTALL)
+_TAG_RE = re.compile(r"<[^>]+>")
+_SCRIPT_RE = re.compile(r"<script\b", re.IGNORECASE)
+
+
+def looks_like_js_shell(html):
+    """Cheap check for pages that only render their content client-side."""
+    if not html:
+        return True
+    lowered = html.lower()
+    if any(marker in lowered for marker in JS_SHELL_MARKERS):
+        return True
+    text = _TAG_RE.sub(" ", _SCRIPT_STYLE_RE.sub(" ", html))
+    visible_chars = len("".join(text.split()))
+    return visible_chars < MIN_STATIC_TEXT_CHARS and bool(_SCRIPT_RE.search(html))
+
+
+def content_fingerprint(html):
+    """sha256 of the page's visible text, stable across script nonces and markup churn."""
+    text = _TAG_RE.sub(" ", _SCRIPT_STYLE_RE.sub(" ", html or ""))
+    return hashlib.sha256(" ".join(text.split()).encode("utf-8")).hexdigest()
+
+
+def conditional_headers(validators):
+    headers = {}
+    if validators and validators.get("etag"):
+        headers["If-None-Match"] = validators["etag"]
+    if validators and validators.get("last_modified"):
+        headers["If-Modified-Since"] = validators["last_modified"]
+    return headers
+
+
+def is_html_response(response):
+    content_type = response.headers.get("content-type", "")
+    return response.status_code == 200 and ("html" in content_type or not content_type)
+
+
+def is_file_response(response):
+    """Successful responses that are documents/media rather than a web page."""
+    content_type = response.headers.get("content-type", "")
+    return response.status_code == 200 and bool(content_type) and "html" not in content_type and "text/plain" not in content_type
+
+
+@dataclass
+class FetchResult:
+    url: str
+    html: str = None
+    rendered: bool = False  # True when the page needed the headless browser
+    not_modified: bool = False  # server answered 304 to our validators
+    etag: str = None
+    last_modified: str = None
+
+    @property
+    def content_hash(self):
+        return content_fingerprint(self.html) if self.html else None
+
+
+class HostScheduler:
+    """
+    Per-host politeness: consecutive requests to the same host are spaced by a
+    random delay between min_delay and max_delay seconds. Different hosts never
+    wait on each other.
+    """
+
+    def __init__(self, min_delay, max_delay):
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self._next_allowed = {}
+        self._locks = defaultdict(asyncio.Lock)
+
+    async def wait_turn(self, host):
+        async with self._locks[host]:
+            now = time.monotonic()
+            start_at = max(now, self._next_allowed.get(host, now))
+            self._next_allowed[host] = start_at + random.uniform(self.min_delay, self.max_delay)
+        delay = start_at - now
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+class FetchEngine:
+    """
+    Tiered asyncio fetcher.
+
+    Pages are first requested with a pooled keep-alive HTTP client; only pages
+    asked to be rendered, non-HTML responses or pages that look like an empty
+    JS shell go to the process's pooled headless Chromium (sources.browser_pool),
+    which outlives the engine.
+    Concurrency is bounded globally by max_concurrency and per host by
+    per_domain_concurrency; the HostScheduler adds the politeness delay.
+    Use as an async context manager on the browser loop, or the fetch_many()
+    helper from sync code.
+    """
+
+    def __init__(self, min_delay, max_delay, max_concurrency=MAX_CONCURRENCY,
+                 per_domain_concurrency=PER_DOMAIN_CONCURRENCY):
+        self.scheduler = HostScheduler(min_delay, max_delay)
+        self.max_concurrency = max_concurrency
+        self.per_domain_concurrency = per_domain_concurrency
+        self._global = asyncio.Semaphore(max_concurrency)
+        self._domains = defaultdict(lambda: asyncio.Semaphore(self.per_domain_concurrency))
+
+    async def __aenter__(self):
+        self._http = httpx.AsyncClient(
+            http2=HTTP2_ENABLED,
+            headers=HTTP_HEADERS,
+            timeout=HTTP_TIMEOUT,
+            follow_redirects=True,
+            limits=httpx.Limits(max_connections=self.max_concurrency, max_keepalive_connections=self.max_concurrency),
+        )
+        return self
+
+    async def __aexit__(self, *exc):
+        await self._http.aclose()
+
+    async def _fetch_http(self, url, validators=None):
+        try:
+            return await self._http.get(url, headers=conditional_headers(validators))
+        except httpx.HTTPError as e:
+            scraper_logger.warning(f"HTTP fetch failed for {url}: {e}")
+            return None
+
+    async def fetch(self, url, render=False, validators=None):
+        """
+        Fetch one page. With a stored validator ({"etag", "last_modified"}) a
+        conditional request is sent first, even for pages that will be rendered,
+        so unchanged pages cost a single 304 and never reach the browser.
+        """
+        host = urlparse(url).netloc.lower()
+        async with self._domains[host]:
+            await self.scheduler.wait_turn(host)
+            async with self._global:
+                response = None
+                # a dynamic page is only pre-checked over HTTP when there is a validator to send
+                if not render or conditional_headers(validators):
+                    response = await self._fetch_http(url, validators)
+                if response is not None:
+                    etag = response.headers.get("etag")
+                    last_modified = response.headers.get("last-modified")
+                    if response.status_code == 304:
+                        return FetchResult(url, not_modified=True, etag=etag, last_modified=last_modified)
+                    if is_file_response(response):
+                        scraper_logger.info(f"Skipping non-HTML response: {url}")
+                        return FetchResult(url)
+                    if not render and is_html_response(response) and not looks_like_js_shell(response.text):
+                        return FetchResult(url, response.text, etag=etag, last_modified=last_modified)
+                else:
+                    etag = last_modified = None
+                if not render:
+                    scraper_logger.info(f"Falling back to browser rendering for {url}")
+                html = await self._render(url)
+                return FetchResult(url, html, rendered=True, etag=etag, last_modified=last_modified)
+
+    async def _render(self, url):
+        try:
+            async with get_browser_pool().page() as page:
+                try:
+                    await page.goto(url, wait_until="domcontentloaded", timeout=PAGE_TIMEOUT_MS)
+                except PlaywrightTimeoutError:
+                    scraper_logger.warning(f"Timeout reached for {url}, extracting partial content")
+                return await page.content()
+        except (PlaywrightError, asyncio.TimeoutError) as e:
+            scraper_logger.error(f"Playwright failed to fetch {url}: {e}")
+            return None
+
+    async def _fetch_or_empty(self, url, render, validators):
+        # one broken page must not take the rest of the batch down with it
+        try:
+            return await self.fetch(url, render=render, validators=validators)
+        except Exception as e:
+            scraper_logger.error(f"Fetching {url} failed: {e}", exc_info=True)
+            return FetchResult(url)
+
+    async def fetch_all(self, urls, render_urls=(), validators=None):
+        urls = list(dict.fromkeys(urls))
+        render_urls = set(render_urls)
+        validators = validators or {}
+        results = await asyncio.gather(*(
+            self._fetch_or_empty(url, url in render_urls, validators.get(url)) for url in urls
+        ))
+        return dict(zip(urls, results))
+
+
+async def _fetch_many(urls, render_urls, validators, **engine_kwargs):
+    async with FetchEngine(**engine_kwargs) as engine:
+        return await engine.fetch_all(urls, render_urls, validators)
+
+
+def fetch_many(urls, render_urls=(), validators=None, **engine_kwargs):
+    """
+    Fetch every URL concurrently and return {url: FetchResult}.
+    URLs listed in render_urls skip the HTTP fast path and go straight to the browser;
+    validators maps a URL to the {"etag", "last_modified"} stored from its previous fetch.
+    """
+    if not urls:
+        return {}
+    started = time.monotonic()
+    results = run_on_browser_loop(_fetch_many(urls, render_urls, validators, **engine_kwargs))
+    fetched = sum(1 for result in results.values() if result.html)
+    rendered = sum(1 for result in results.values() if result.rendered)
+    not_modified = sum(1 for result in results.values() if result.not_modified)
+    scraper_logger.info(
+        f"Fetched {fetched}/{len(results)} pages in {time.monotonic() - started:.1f}s "
+        f"({rendered} rendered in browser, {not_modified} not modified)"
+    )
+    return results
@@ -9,8 +9,8 @@ import os
 import re
 from core.utils import init_django
 init_django()
-from sources.models import  SourceRegistry
-from sources.models import SourceRegistry
+from sources.models import SourceRegistry, MAX_CANONICAL_URL_LENGTH
+from core.utils import canonicalize_url
 
 
 
@@ -38,24 +38,52 @@ def google_search(query, num_results=10):
         return []
 
 
-def save_to_registry(results, search_term):
-    """Insert into DB if new."""
-    for item in results:
-        link = normalize_url(item.get("link", ""))
-        if not link:
-            continue
-        name = urlparse(link).netloc
-        if not SourceRegistry.objects.filter(base_url=link).exists():
-            SourceRegistry.objects.create(
-                name=name,
+def bulk_save_to_registry(results_by_query):
+    """
+    Insert new links from several searches at once.
+    Results are normalized in memory, existing entries are resolved with one
+    canonical_url__in query and new ones are inserted with a single bulk_create;
+    the unique canonical_url column makes concurrent runs safe.
+    Returns the ids of the entries added.
+    """
+    candidates = {}
+    for search_term, results in results_by_query:
+        for item in results:
+            raw_link = item.get("link", "")
+            if not raw_link:
+                continue
+            link = normalize_url(raw_link)
+            canonical = canonicalize_url(link)
+            if len(canonical) > MAX_CANONICAL_URL_LENGTH:
+                google_logger.warning(f"Skipping overlong URL: {link[:200]}...")
+                continue
+            candidates.setdefault(canonical, SourceRegistry(
+                name=urlparse(link).netloc,
                 source_type="google",
                 search_term=search_term,
                 base_url=link,
+                canonical_url=canonical,
                 active=True,
-            )
-            google_logger.info(f"Added: {name} -> {link}")
-        else:
-            google_logger.info(f"Exists: {link}")
+            ))
+
+    existing = set(
+        SourceRegistry.objects.filter(canonical_url__in=list(candidates)).values_list("canonical_url", flat=True)
+    )
+    new_entries = [entry for canonical, entry in candidates.items() if canonical not in existing]
+    SourceRegistry.objects.bulk_create(new_entries, ignore_conflicts=True)
+
+    for entry in new_entries:
+        google_logger.info(f"Added: {entry.name} -> {entry.base_url}")
+    google_logger.info(f"Registry ingest: {len(new_entries)} added, {len(existing)} already known.")
+    # ignore_conflicts leaves the primary keys unset
+    return list(SourceRegistry.objects.filter(
+        canonical_url__in=[entry.canonical_url for entry in new_entries]
+    ).values_list("id", flat=True)) if new_entries else []
+
+
+def save_to_registry(results, search_term):
+    """Insert into DB if new."""
+    return bulk_save_to_registry([(search_term, results)])
 
 
 def refresh_google_queries_task():
@@ -123,10 +151,9 @@ def main():
                        'Consulting procurement notices Ethiopia 2025 tender', 
                        'Horn of Africa tenders Ethiopia 2025 government portal']
     # print(refresh_google_queries_task())
-    for query in list_of_queries:
-        results = google_search(query, num_results=10)
-        save_to_registry(results, query)
-        google_logger.info("Source registry updated successfully.")
+    results_by_query = [(query, google_search(query, num_results=10)) for query in list_of_queries]
+    bulk_save_to_registry(results_by_query)
+    google_logger.info("Source registry updated successfully.")
 
 
 if __name__ == "__main__":
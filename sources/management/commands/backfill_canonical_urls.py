@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+from core.utils import canonicalize_url
+from sources.models import MAX_CANONICAL_URL_LENGTH, RawOpportunity
+
+
+class Command(BaseCommand):
+    help = (
+        "Fill in canonical_url on RawOpportunity rows saved before it existed, so the scraper "
+        "recognizes those pages as already stored. Run move_raw_content_to_blobs first: the "
+        "check also needs the row's content_hash."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        last_id = filled = 0
+        while True:
+            batch = list(
+                RawOpportunity.objects
+                .filter(id__gt=last_id, canonical_url__isnull=True, url__isnull=False)
+                .exclude(url="")
+                .order_by("id")
+                .only("id", "url")[:options["batch_size"]]
+            )
+            if not batch:
+                break
+            last_id = batch[-1].id
+            for raw in batch:
+                # capped like the scraper's value so it fits the btree index
+                raw.canonical_url = canonicalize_url(raw.url)[:MAX_CANONICAL_URL_LENGTH]
+            RawOpportunity.objects.bulk_update(batch, ["canonical_url"])
+            filled += len(batch)
+            self.stdout.write(f"Up to id {last_id}: {filled} filled")
+        self.stdout.write(self.style.SUCCESS(f"Done: {filled} canonical URLs filled"))
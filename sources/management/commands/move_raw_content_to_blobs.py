@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from sources.blob_store import store_raw_html
+from sources.models import RawOpportunity
+
+
+class Command(BaseCommand):
+    help = "Move HTML stored inline on RawOpportunity rows into compressed RawContentBlob storage."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=200)
+        parser.add_argument("--drop-cleaned", action="store_true",
+                            help="drop inline HTML of already cleaned rows instead of keeping it as a blob")
+
+    def handle(self, *args, **options):
+        last_id = moved = dropped = 0
+        while True:
+            batch = list(
+                RawOpportunity.objects
+                .filter(id__gt=last_id, content_hash__isnull=True)
+                .exclude(raw_content="")
+                .order_by("id")
+                .only("id", "raw_content", "status")[:options["batch_size"]]
+            )
+            if not batch:
+                break
+            last_id = batch[-1].id
+            with transaction.atomic():
+                for raw in batch:
+                    if options["drop_cleaned"] and raw.status == "cleaned":
+                        dropped += 1
+                    else:
+                        raw.content_hash, raw.content_size = store_raw_html(raw.raw_content)
+                        moved += 1
+                    raw.raw_content = ""
+                RawOpportunity.objects.bulk_update(batch, ["raw_content", "content_hash", "content_size"])
+            self.stdout.write(f"Up to id {last_id}: {moved} moved, {dropped} dropped")
+        self.stdout.write(self.style.SUCCESS(f"Done: {moved} pages moved to blob storage, {dropped} dropped"))
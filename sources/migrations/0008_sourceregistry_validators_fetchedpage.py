@@ -0,0 +1,41 @@
+# Generated by Django 5.2.6 on 2026-10-17 10:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sources', '0007_sourceregistry_search_term'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sourceregistry',
+            name='etag',
+            field=models.CharField(blank=True, max_length=255, null=True),
+        ),
+        migrations.AddField(
+            model_name='sourceregistry',
+            name='last_modified',
+            field=models.CharField(blank=True, max_length=64, null=True),
+        ),
+        migrations.AddField(
+            model_name='sourceregistry',
+            name='content_hash',
+            field=models.CharField(blank=True, max_length=64, null=True),
+        ),
+        migrations.CreateModel(
+            name='FetchedPage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('url', models.TextField()),
+                ('url_hash', models.CharField(help_text='sha256 of url, used as the lookup key', max_length=64, unique=True)),
+                ('etag', models.CharField(blank=True, max_length=255, null=True)),
+                ('last_modified', models.CharField(blank=True, max_length=64, null=True)),
+                ('content_hash', models.CharField(blank=True, max_length=64, null=True)),
+                ('last_fetched', models.DateTimeField(auto_now=True)),
+                ('last_changed', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.2.6 on 2026-10-17 11:40
+
+import hashlib
+from django.db import migrations, models
+from core.utils import canonicalize_url
+
+
+def rekey_fetched_pages(apps, schema_editor):
+    FetchedPage = apps.get_model('sources', 'FetchedPage')
+    seen = set()
+    for page in FetchedPage.objects.order_by('-last_fetched').iterator():
+        canonical = canonicalize_url(page.url)
+        url_hash = hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+        if url_hash in seen:
+            page.delete()
+            continue
+        seen.add(url_hash)
+        FetchedPage.objects.filter(pk=page.pk).update(url=canonical, url_hash=url_hash)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sources', '0008_sourceregistry_validators_fetchedpage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='rawopportunity',
+            name='canonical_url',
+            field=models.TextField(blank=True, help_text='url with tracking params, www., scheme and trailing slash normalized', null=True),
+        ),
+        migrations.AlterField(
+            model_name='fetchedpage',
+            name='url',
+            field=models.TextField(help_text='canonical url'),
+        ),
+        migrations.AlterField(
+            model_name='fetchedpage',
+            name='url_hash',
+            field=models.CharField(help_text='sha256 of the canonical url, used as the lookup key', max_length=64, unique=True),
+        ),
+        migrations.RunPython(rekey_fetched_pages, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.6 on 2026-10-17 13:05
+
+from django.db import migrations, models
+from core.utils import canonicalize_url
+
+
+def populate_canonical_url(apps, schema_editor):
+    """Fill canonical_url for existing rows; later copies of the same page keep it empty."""
+    SourceRegistry = apps.get_model('sources', 'SourceRegistry')
+    seen = set()
+    to_update = []
+    for source in SourceRegistry.objects.order_by('id').only('id', 'base_url').iterator():
+        canonical = canonicalize_url(source.base_url)
+        if len(canonical) > 2048 or canonical in seen:
+            continue
+        seen.add(canonical)
+        source.canonical_url = canonical
+        to_update.append(source)
+    SourceRegistry.objects.bulk_update(to_update, ['canonical_url'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sources', '0009_rawopportunity_canonical_url'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sourceregistry',
+            name='canonical_url',
+            field=models.CharField(blank=True, help_text='canonicalized base_url, enforces one registry entry per page', max_length=2048, null=True),
+        ),
+        migrations.RunPython(populate_canonical_url, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='sourceregistry',
+            name='canonical_url',
+            field=models.CharField(blank=True, help_text='canonicalized base_url, enforces one registry entry per page', max_length=2048, null=True, unique=True),
+        ),
+    ]
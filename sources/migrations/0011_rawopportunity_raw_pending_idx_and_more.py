@@ -0,0 +1,28 @@
+# Generated by Django 5.2.6 on 2026-10-17 20:40
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY can't run in a transaction; it doesn't block scraper writes
+    atomic = False
+
+    dependencies = [
+        ('sources', '0010_sourceregistry_canonical_url'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='rawopportunity',
+            index=models.Index(condition=models.Q(('status', 'pending')), fields=['id'], name='raw_pending_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='sourceregistry',
+            index=models.Index(condition=models.Q(('active', True), ('last_scraped__isnull', True), ('source_type', 'google')), fields=['id'], name='registry_unscraped_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='sourceregistry',
+            index=models.Index(condition=models.Q(('active', True)), fields=['last_scraped'], name='registry_recrawl_idx'),
+        ),
+    ]
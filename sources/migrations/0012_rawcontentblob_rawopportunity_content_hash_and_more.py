@@ -0,0 +1,39 @@
+# Generated by Django 5.2.6 on 2026-10-17 21:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sources', '0011_rawopportunity_raw_pending_idx_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RawContentBlob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(help_text='sha256 of the uncompressed HTML', max_length=64, unique=True)),
+                ('data', models.BinaryField()),
+                ('size', models.PositiveIntegerField(help_text='uncompressed bytes')),
+                ('compressed_size', models.PositiveIntegerField()),
+                ('last_used_at', models.DateTimeField(db_index=True, help_text='last time a fetch stored or referenced this content')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='rawopportunity',
+            name='content_hash',
+            field=models.CharField(blank=True, help_text='sha256 of the raw HTML, key of its RawContentBlob', max_length=64, null=True),
+        ),
+        migrations.AddField(
+            model_name='rawopportunity',
+            name='content_size',
+            field=models.PositiveIntegerField(blank=True, help_text='uncompressed bytes of the raw HTML', null=True),
+        ),
+        migrations.AlterField(
+            model_name='rawopportunity',
+            name='raw_content',
+            field=models.TextField(blank=True, default=''),
+        ),
+    ]
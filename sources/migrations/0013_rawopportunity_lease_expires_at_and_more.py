@@ -0,0 +1,30 @@
+# Generated by Django 5.2.6 on 2026-10-17 21:10
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY can't run in a transaction; it doesn't block scraper writes
+    atomic = False
+
+    dependencies = [
+        ('sources', '0012_rawcontentblob_rawopportunity_content_hash_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='rawopportunity',
+            name='lease_expires_at',
+            field=models.DateTimeField(blank=True, help_text='when an in-progress claim lapses and the row goes back to pending', null=True),
+        ),
+        migrations.AlterField(
+            model_name='rawopportunity',
+            name='status',
+            field=models.CharField(choices=[('pending', ' Pending Processing '), ('in_progress', ' Claimed by a cleaner '), ('cleaned', ' Cleaned Successfully ')], default='pending', help_text='This shows status of the html content (i.e content has been extracted or not)', max_length=20),
+        ),
+        AddIndexConcurrently(
+            model_name='rawopportunity',
+            index=models.Index(condition=models.Q(('status', 'in_progress')), fields=['lease_expires_at'], name='raw_lease_idx'),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.6 on 2026-10-17 23:40
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+from django.db.models.functions import Length, Substr
+
+
+def truncate_long_canonical_urls(apps, schema_editor):
+    # longer values don't fit a btree index entry; the scraper truncates new ones the same way
+    RawOpportunity = apps.get_model('sources', 'RawOpportunity')
+    RawOpportunity.objects.annotate(url_length=Length('canonical_url')).filter(url_length__gt=2048).update(
+        canonical_url=Substr('canonical_url', 1, 2048)
+    )
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY can't run in a transaction; it doesn't block scraper writes
+    atomic = False
+
+    dependencies = [
+        ('sources', '0013_rawopportunity_lease_expires_at_and_more'),
+    ]
+
+    operations = [
+        migrations.RunPython(truncate_long_canonical_urls, migrations.RunPython.noop),
+        AddIndexConcurrently(
+            model_name='rawopportunity',
+            index=models.Index(fields=['canonical_url'], name='raw_canonical_url_idx'),
+        ),
+    ]
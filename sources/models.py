@@ -1,5 +1,10 @@
 # sources/models.py
+import hashlib
 from django.db import models
+from core.utils import canonicalize_url
+
+# longer URLs don't fit a btree unique index; the collector skips them
+MAX_CANONICAL_URL_LENGTH = 2048
 
 class RawOpportunity(models.Model):
     SOURCE_TYPES = [
@@ -13,21 +18,53 @@ class RawOpportunity(models.Model):
     source_type = models.CharField(max_length=20, choices=SOURCE_TYPES)
     source_name = models.TextField()  
     url = models.TextField(blank=True, null=True)  
-    raw_content = models.TextField() 
+    canonical_url = models.TextField(blank=True, null=True, help_text="url with tracking params, www., scheme and trailing slash normalized")
+    # page HTML lives gzip-compressed in RawContentBlob; raw_content only holds rows saved before that
+    raw_content = models.TextField(blank=True, default="")
+    content_hash = models.CharField(max_length=64, blank=True, null=True, help_text="sha256 of the raw HTML, key of its RawContentBlob")
+    content_size = models.PositiveIntegerField(blank=True, null=True, help_text="uncompressed bytes of the raw HTML")
     file_name = models.TextField(blank=True, null=True)  
     fetched_at = models.DateTimeField(auto_now_add=True)
 
     STATUS_CHOICES = [
         ("pending", " Pending Processing "),
+        ("in_progress", " Claimed by a cleaner "),
         ("cleaned", " Cleaned Successfully "),
     ]
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="pending" , help_text="This shows status of the html content (i.e content has been extracted or not)")
-    
+    lease_expires_at = models.DateTimeField(blank=True, null=True, help_text="when an in-progress claim lapses and the row goes back to pending")
+
+    class Meta:
+        indexes = [
+            # cleaner keyset poll: status='pending' AND id > last ORDER BY id
+            models.Index(fields=["id"], condition=models.Q(status="pending"), name="raw_pending_idx"),
+            # work queue reclaim: status='in_progress' AND lease_expires_at < now
+            models.Index(fields=["lease_expires_at"], condition=models.Q(status="in_progress"), name="raw_lease_idx"),
+            # scraper skips pages already stored with the same content under the same canonical url
+            models.Index(fields=["canonical_url"], name="raw_canonical_url_idx"),
+        ]
+
     def __str__(self):
         return f"{self.source_name} | {self.source_type} | status {self.status}"
 
 
 
+class RawContentBlob(models.Model):
+    """
+    gzip-compressed raw page HTML, content-addressed by sha256 so refetches of an
+    unchanged page share one blob. Kept out of RawOpportunity so status polls,
+    vacuum and admin listings never drag page bodies along.
+    """
+    key = models.CharField(max_length=64, unique=True, help_text="sha256 of the uncompressed HTML")
+    data = models.BinaryField()
+    size = models.PositiveIntegerField(help_text="uncompressed bytes")
+    compressed_size = models.PositiveIntegerField()
+    last_used_at = models.DateTimeField(db_index=True, help_text="last time a fetch stored or referenced this content")
+
+    def __str__(self):
+        return f"{self.key[:12]} | {self.size} -> {self.compressed_size} bytes"
+
+
 class SourceRegistry(models.Model):
     SOURCE_TYPES = [
         ('google', "Google Search Result"),
@@ -42,10 +79,56 @@ class SourceRegistry(models.Model):
     source_type = models.CharField(max_length=20, choices=SOURCE_TYPES)
     search_term = models.CharField(max_length=1500, blank=True, null=True)
     base_url = models.URLField(max_length=7000)
+    canonical_url = models.CharField(
+        max_length=MAX_CANONICAL_URL_LENGTH, unique=True, blank=True, null=True,
+        help_text="canonicalized base_url, enforces one registry entry per page"
+    )
     active = models.BooleanField(default=True)       
     web_type = models.CharField(max_length=20, choices=WEB_TYPES, default='static')
     last_scraped = models.DateTimeField(blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    # validators of the base page from the last fetch, used for conditional re-crawls
+    etag = models.CharField(max_length=255, blank=True, null=True)
+    last_modified = models.CharField(max_length=64, blank=True, null=True)
+    content_hash = models.CharField(max_length=64, blank=True, null=True)
+
+    class Meta:
+        indexes = [
+            # unscraped Google results: scraper poll (ORDER BY id DESC) and the backlog count
+            models.Index(
+                fields=["id"],
+                condition=models.Q(active=True, source_type="google", last_scraped__isnull=True),
+                name="registry_unscraped_idx",
+            ),
+            # re-crawl poll: active AND last_scraped < cutoff ORDER BY last_scraped
+            models.Index(fields=["last_scraped"], condition=models.Q(active=True), name="registry_recrawl_idx"),
+        ]
+
+    def save(self, *args, **kwargs):
+        if not self.canonical_url and self.base_url:
+            self.canonical_url = canonicalize_url(self.base_url)[:MAX_CANONICAL_URL_LENGTH]
+        super().save(*args, **kwargs)
 
     def __str__(self):
         return f"{self.name} | {self.source_type}"
+
+
+class FetchedPage(models.Model):
+    """
+    Validators and content hash of every opportunity page fetched from a source,
+    keyed by canonical URL so URL variants of the same page share one entry.
+    """
+    url = models.TextField(help_text="canonical url")
+    url_hash = models.CharField(max_length=64, unique=True, help_text="sha256 of the canonical url, used as the lookup key")
+    etag = models.CharField(max_length=255, blank=True, null=True)
+    last_modified = models.CharField(max_length=64, blank=True, null=True)
+    content_hash = models.CharField(max_length=64, blank=True, null=True)
+    last_fetched = models.DateTimeField(auto_now=True)
+    last_changed = models.DateTimeField(blank=True, null=True)
+
+    @staticmethod
+    def hash_url(url):
+        return hashlib.sha256(canonicalize_url(url).encode("utf-8")).hexdigest()
+
+    def __str__(self):
+        return f"{self.url} | changed {self.last_changed}"
@@ -1,15 +1,18 @@
 from core.utils import init_django
 init_django()
 import os
-from openai import OpenAI
-import time
+from concurrent.futures import ThreadPoolExecutor
 from bs4 import BeautifulSoup
 from urllib.parse import urljoin, urlparse
-from sources.models import RawOpportunity, SourceRegistry
-from playwright.sync_api import sync_playwright
-from playwright.sync_api import TimeoutError as PlaywrightTimeoutError
+from sources.models import RawOpportunity, SourceRegistry, FetchedPage, MAX_CANONICAL_URL_LENGTH
+from sources.blob_store import content_key, store_raw_html
+from datetime import timedelta
 from django.utils import timezone
 from core.logging import scraper_logger
+from core.utils import canonicalize_url
+from core.llm_cache import cached_chat_completion
+from sources.browser_pool import shutdown_browser_pool
+from sources.fetch_engine import fetch_many
 
 
 # -------------------- Config --------------------
@@ -32,37 +35,11 @@ BLOCKED_EXTENSIONS = (
 IGNORED_TAGS = ["header", "footer", "nav"]
 
 LLM_MODEL = "gpt-5-mini"  
+LINK_FILTER_PROMPT_VERSION = "link-filter-v1"
 LLM_MAX_LINKS = 30         
+LLM_FILTER_WORKERS = 8
 
-# -------------------- Fetch HTML --------------------
-
-
-def fetch_html(url):
-    parsed = urlparse(url)
-    if parsed.path.lower().endswith(BLOCKED_EXTENSIONS):
-        scraper_logger.info(f"Skipping file URL (not HTML): {url}")
-        return None
-    
-    try:
-        with sync_playwright() as p:
-            browser = p.chromium.launch(headless=True)
-            context = browser.new_context(
-                java_script_enabled=True,
-                user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64)"
-            )
-            page = context.new_page()
-            try:
-                page.goto(url, wait_until="domcontentloaded", timeout=23000)
-            except PlaywrightTimeoutError:
-                scraper_logger.warning(f"Timeout reached for {url}, extracting partial content")
-
-            html = page.content()
-            browser.close()
-            return html
-
-    except Exception as e:
-        scraper_logger.error(f"Playwright failed to fetch {url}: {e}", exc_info=True)
-        return None
+RECRAWL_INTERVAL = timedelta(days=1)
 
 # -------------------- Extract Candidate Links --------------------
 
@@ -107,7 +84,6 @@ def filter_links_with_llm(links):
 
     # Limit number of links sent to LLM to reduce tokens
     links = links[:LLM_MAX_LINKS]
-    client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
     prompt = """
     
         You are an expert funding analyst. From the list of URLs below, identify which ones are likely real **funding opportunities, grants, tenders, or calls for proposals** that a company could apply to. 
@@ -122,15 +98,15 @@ def filter_links_with_llm(links):
     for idx, (url, text) in enumerate(links, 1):
         prompt += f"{url} - {text}\n"
     try:
-        response = client.chat.completions.create(
-            model=LLM_MODEL,
-            messages=[{"role": "user", "content": prompt}],
-        )
-        llm_output = response.choices[0].message.content.strip()
+        llm_output = cached_chat_completion(
+            LINK_FILTER_PROMPT_VERSION,
+            LLM_MODEL,
+            [{"role": "user", "content": prompt}],
+        ).strip()
         # Extract URLs from LLM response
         filtered_urls = [line.strip() for line in llm_output.splitlines()
                          if line.strip().startswith("http")]
-        print(f' llm approved links: {filtered_urls} out of {links}')
+        scraper_logger.debug(f"LLM approved {len(filtered_urls)} of {len(links)} links: {filtered_urls}")
         return filtered_urls
     except Exception as e:
         scraper_logger.error(f"LLM evaluation failed: {e}", exc_info=True)
@@ -138,55 +114,278 @@ def filter_links_with_llm(links):
 
 # -------------------- Scraper --------------------
 
-def scrape_google_source(source_registry_entry):
-    base_url = source_registry_entry.base_url
-    domain = urlparse(base_url).netloc
-
-    scraper_logger.info(f"Scraping Google-suggested page: {base_url}")
-    html = fetch_html(base_url)
-    if not html:
-        return
-    # save base page as RawOpportunity
+def _stored_canonical_url(url):
+    # capped like SourceRegistry.canonical_url so it fits the btree index; the content hash keeps lookups exact
+    return canonicalize_url(url)[:MAX_CANONICAL_URL_LENGTH]
+
+
+def _already_stored(pages):
+    """
+    URLs of {url: html} whose exact content is already a RawOpportunity under
+    the same canonical URL (e.g. a base page that another source links to),
+    found with one query on the canonical_url index.
+    """
+    keys = {url: (_stored_canonical_url(url), content_key(html)) for url, html in pages.items()}
+    if not keys:
+        return set()
+    stored = set(
+        RawOpportunity.objects.filter(canonical_url__in={canonical for canonical, _ in keys.values()})
+        .values_list("canonical_url", "content_hash")
+    )
+    return {url for url, key in keys.items() if key in stored}
+
+
+def _save_raw_page(source_registry_entry, url, html):
+    domain = urlparse(source_registry_entry.base_url).netloc
     try:
-        RawOpportunity.objects.create(
-            source_type="google",
+        content_hash, content_size = store_raw_html(html)
+        raw = RawOpportunity.objects.create(
+            source_type=source_registry_entry.source_type,
             source_name=domain,
-            url=base_url,
-            raw_content=html
+            url=url,
+            canonical_url=_stored_canonical_url(url),
+            content_hash=content_hash,
+            content_size=content_size,
         )
-        source_registry_entry.last_scraped = timezone.now()
-        source_registry_entry.save()
+        return raw.id
     except Exception as e:
-        scraper_logger.error(f"Failed to save BaseURL RawOpportunity for {base_url}: {e}", exc_info=True)
-        
+        scraper_logger.error(f"Failed to save RawOpportunity for {url}: {e}", exc_info=True)
+        return None
+
+
+def _is_html_url(url):
+    if urlparse(url).path.lower().endswith(BLOCKED_EXTENSIONS):
+        scraper_logger.info(f"Skipping file URL (not HTML): {url}")
+        return False
+    return True
+
+
+def _approved_links(base_url, html):
     candidate_links = extract_candidate_links(base_url, html)
     scraper_logger.info(f"Extracted {len(candidate_links)} candidate links from {base_url}")
-    filtered_links = filter_links_with_llm(candidate_links)
-    saved_links_count = 0
-    for link in filtered_links:
-        scraper_logger.info(f"Fetching LLM-approved link: {link}")
-        page_html = fetch_html(link)
-        if page_html:
-            try:
-                RawOpportunity.objects.create(
-                    source_type="google",
-                    source_name=domain,
-                    url=link,
-                    raw_content=page_html
-                )
-                source_registry_entry.last_scraped = timezone.now()
-                source_registry_entry.save()
+    return [link for link in filter_links_with_llm(candidate_links) if _is_html_url(link)]
+
+
+def _record_web_type(source_registry_entry, result):
+    """Remember whether the source needed the browser so later runs pick the right tier."""
+    observed = "dynamic" if result.rendered else "static"
+    if source_registry_entry.web_type != observed:
+        scraper_logger.info(
+            f"web_type for {source_registry_entry.base_url}: {source_registry_entry.web_type} -> {observed}"
+        )
+        source_registry_entry.web_type = observed
+
+
+def _base_page_changed(source_registry_entry, result):
+    """
+    Tell whether the base page content changed since the last scrape. An
+    unchanged page gets its validators refreshed here; a changed one only once
+    it is stored (_record_base_page), so a failed save is retried on the next
+    crawl instead of looking unchanged forever.
+    """
+    source_registry_entry.last_scraped = timezone.now()
+    if result.not_modified:
+        source_registry_entry.save(update_fields=["last_scraped"])
+        return False
+
+    _record_web_type(source_registry_entry, result)
+    if result.content_hash != source_registry_entry.content_hash:
+        source_registry_entry.save(update_fields=["last_scraped", "web_type"])
+        return True
+    source_registry_entry.etag = result.etag
+    source_registry_entry.last_modified = result.last_modified
+    source_registry_entry.save(update_fields=["last_scraped", "web_type", "etag", "last_modified"])
+    return False
+
+
+def _record_base_page(source_registry_entry, result):
+    """Store the validators and content hash of a base page whose RawOpportunity was saved."""
+    source_registry_entry.etag = result.etag
+    source_registry_entry.last_modified = result.last_modified
+    source_registry_entry.content_hash = result.content_hash
+    source_registry_entry.save(update_fields=["etag", "last_modified", "content_hash"])
+
+
+def _unique_links(fetched, approved):
+    """
+    Drop links whose canonical URL was already seen in this run, either as a
+    base page or as a link of an earlier source, so each page is fetched once.
+    """
+    seen = {canonicalize_url(source.base_url) for source, _ in fetched}
+    unique = []
+    for source_links in approved:
+        kept = []
+        for link in source_links:
+            canonical = canonicalize_url(link)
+            if canonical in seen:
+                scraper_logger.info(f"Skipping duplicate URL variant: {link}")
+                continue
+            seen.add(canonical)
+            kept.append(link)
+        unique.append(kept)
+    return unique
+
+
+def _link_validators(links):
+    """Map each link to the FetchedPage stored under its canonical URL."""
+    hashes = {FetchedPage.hash_url(link): link for link in links}
+    known = FetchedPage.objects.filter(url_hash__in=list(hashes))
+    return {hashes[page.url_hash]: page for page in known}
+
+
+def _changed_link_pages(link_pages, known_pages):
+    """
+    Return {url: FetchedPage} for the links whose content is new or changed.
+    Those entries are not written yet: _record_fetched_pages() stores them once
+    the page is saved, so a failed save is retried on the next crawl. Unchanged
+    pages only get their validators refreshed here.
+    """
+    now = timezone.now()
+    changed, unchanged = {}, []
+    for link, result in link_pages.items():
+        if result.not_modified or not result.html:
+            continue
+        content_hash = result.content_hash
+        page = known_pages.get(link)
+        if page is None:
+            changed[link] = FetchedPage(
+                url=canonicalize_url(link), url_hash=FetchedPage.hash_url(link), etag=result.etag,
+                last_modified=result.last_modified, content_hash=content_hash, last_changed=now,
+            )
+            continue
+        page.etag, page.last_modified, page.last_fetched = result.etag, result.last_modified, now
+        if page.content_hash != content_hash:
+            page.content_hash, page.last_changed = content_hash, now
+            changed[link] = page
+        else:
+            unchanged.append(page)
+
+    FetchedPage.objects.bulk_update(unchanged, ["etag", "last_modified", "last_fetched"])
+    return changed
+
+
+def _record_fetched_pages(pages):
+    """Store the validators and content hash of link pages whose RawOpportunity was saved."""
+    FetchedPage.objects.bulk_create([page for page in pages if page.pk is None], ignore_conflicts=True)
+    FetchedPage.objects.bulk_update(
+        [page for page in pages if page.pk is not None],
+        ["etag", "last_modified", "content_hash", "last_fetched", "last_changed"],
+    )
+
+
+def scrape_sources(source_registry_entries):
+    """
+    Scrape several registry entries at once.
+
+    Base pages are fetched concurrently: those of sources already known to be
+    'dynamic' go straight to the browser, the rest through the HTTP fast path
+    (falling back to the browser for JS shells, which marks the source dynamic).
+    Requests carry the ETag/Last-Modified stored from the previous scrape, and a
+    base page that answers 304 or whose content hash is unchanged is not saved
+    and its links are not re-discovered. Candidate links are filtered by the LLM
+    in a thread pool, then every approved link across all sources is fetched
+    concurrently (links of 'dynamic' sources go straight to the browser); URL
+    variants (tracking params, www., http/https, trailing slash) are fetched
+    once and only pages that are new or changed become RawOpportunity rows;
+    a page already stored with the same content under its canonical URL is not
+    saved twice.
+    Politeness per host is enforced by the fetch engine.
+    Returns the ids of the RawOpportunity rows saved, base pages included.
+    """
+    entries = [s for s in source_registry_entries if _is_html_url(s.base_url)]
+    if not entries:
+        return []
+
+    base_pages = fetch_many(
+        [s.base_url for s in entries],
+        render_urls=[s.base_url for s in entries if s.web_type == "dynamic"],
+        validators={s.base_url: {"etag": s.etag, "last_modified": s.last_modified} for s in entries},
+        min_delay=MIN_DELAY,
+        max_delay=MAX_DELAY,
+    )
+
+    fetched, saved_ids = [], []
+    for source in entries:
+        result = base_pages.get(source.base_url)
+        if not result or not (result.html or result.not_modified):
+            continue
+        if not _base_page_changed(source, result):
+            scraper_logger.info(f"Unchanged since last scrape, skipping: {source.base_url}")
+            continue
+        scraper_logger.info(f"Scraped Google-suggested page: {source.base_url}")
+        fetched.append((source, result.html))
+
+    stored_bases = _already_stored({source.base_url: html for source, html in fetched})
+    for source, html in fetched:
+        if source.base_url in stored_bases:
+            scraper_logger.info(f"Already stored with this content, not saving again: {source.base_url}")
+            _record_base_page(source, base_pages[source.base_url])
+            continue
+        raw_id = _save_raw_page(source, source.base_url, html)
+        if raw_id:
+            saved_ids.append(raw_id)
+            _record_base_page(source, base_pages[source.base_url])
+
+    with ThreadPoolExecutor(max_workers=LLM_FILTER_WORKERS) as pool:
+        approved = list(pool.map(lambda item: _approved_links(item[0].base_url, item[1]), fetched))
+    approved = _unique_links(fetched, approved)
+
+    links = [link for source_links in approved for link in source_links]
+    render_links = [
+        link
+        for (source, _), source_links in zip(fetched, approved) if source.web_type == "dynamic"
+        for link in source_links
+    ]
+    known_pages = _link_validators(links)
+    link_pages = fetch_many(
+        links,
+        render_urls=render_links,
+        validators={url: {"etag": page.etag, "last_modified": page.last_modified} for url, page in known_pages.items()},
+        min_delay=MIN_DELAY,
+        max_delay=MAX_DELAY,
+    )
+    changed_links = _changed_link_pages(link_pages, known_pages)
+    stored_links = _already_stored({link: link_pages[link].html for link in changed_links})
+
+    saved_pages = []
+    for (source, _), source_links in zip(fetched, approved):
+        saved_links_count = 0
+        for link in source_links:
+            if link not in changed_links:
+                continue
+            if link in stored_links:
+                scraper_logger.info(f"Already stored with this content, not saving again: {link}")
+                saved_pages.append(changed_links[link])
+                continue
+            raw_id = _save_raw_page(source, link, link_pages[link].html)
+            if raw_id:
                 scraper_logger.info(f"Saved RawOpportunity for {link}")
+                saved_ids.append(raw_id)
+                saved_pages.append(changed_links[link])
                 saved_links_count += 1
-            except Exception as e:
-                scraper_logger.error(f"Failed to save RawOpportunity for {link}: {e}", exc_info=True)
+        scraper_logger.info(f"Scraping complete for {source.base_url}. Saved {saved_links_count} opportunities.")
+    _record_fetched_pages(saved_pages)
+    return saved_ids
+
+
+def scrape_google_source(source_registry_entry):
+    return scrape_sources([source_registry_entry])
+
+
+def sources_due_for_recrawl(limit):
+    """Active sources whose last scrape is older than RECRAWL_INTERVAL, stalest first."""
+    cutoff = timezone.now() - RECRAWL_INTERVAL
+    return SourceRegistry.objects.filter(
+        active=True, last_scraped__lt=cutoff
+    ).order_by("last_scraped")[:limit]
 
-    scraper_logger.info(f"Scraping complete for {base_url}. Saved {saved_links_count} opportunities.")
 
 def run_scraper():
     sources = SourceRegistry.objects.filter(active=True, source_type="google", last_scraped__isnull=True).order_by('-id')[:50]
-    for source in sources:
-        scrape_google_source(source)
+    scrape_sources(list(sources))
 
 if __name__ == "__main__":
-    run_scraper()
+    try:
+        run_scraper()
+    finally:
+        shutdown_browser_pool()
@@ -1,12 +1,16 @@
 from celery import shared_task
+from celery.signals import worker_process_shutdown
 from core.logging import scraper_logger, google_logger
-from sources.scraper import scrape_google_source
+from sources.scraper import scrape_sources, sources_due_for_recrawl
+from sources.browser_pool import shutdown_browser_pool
 from sources.models import SourceRegistry
 from processing.models import CleanedOpportunity
+from processing.tasks import run_cleaning_task
 from sources.google_search_collector import google_search, save_to_registry
-from datetime import datetime , timezone
+from datetime import datetime , timedelta, timezone
 from django.core.cache import cache
-from openai import OpenAI
+from core.llm_cache import cached_chat_completion
+from core.pipeline import enqueue_stage
 import json
 import os
 import re
@@ -14,6 +18,8 @@ import re
 
 Max_Pending_Items_in_cleaned_opportunity = 50
 Max_unscraped_source_registry_items = 100
+Max_recrawl_sources_per_run = 100
+QUERY_PROMPT_VERSION = "google-queries-v1"
 
 def extraction_backlog_high():
     return CleanedOpportunity.objects.filter(status="pending").count() >= Max_Pending_Items_in_cleaned_opportunity
@@ -21,29 +27,62 @@ def extraction_backlog_high():
 def source_registry_backlog_high():
     return SourceRegistry.objects.filter(active=True, source_type="google", last_scraped__isnull=True).count() >= Max_unscraped_source_registry_items
 
+@worker_process_shutdown.connect
+def close_browser_pool(**kwargs):
+    shutdown_browser_pool()
+
+
 @shared_task
-def run_scraper_task():
+def run_scraper_task(source_ids=None):
     if extraction_backlog_high():
         scraper_logger.warning(
             "Extraction backlog is high. Skipping scraping to prioritize processing."
         )
         return "Skipped scraping due to high extraction backlog."
     sources = SourceRegistry.objects.filter(
-        active=True, source_type="google", last_scraped__isnull=True).order_by('-id')[:40]
+        active=True, source_type="google", last_scraped__isnull=True)
+    if source_ids is not None:
+        sources = sources.filter(id__in=source_ids)
+    sources = sources.order_by('-id')[:40]
     if not sources.exists():
         scraper_logger.warning("No active static sources found.")
         return "No sources to scrape."
 
-    scraper_logger.info(f"Found {sources.count()} static sources to scrape.")
+    sources = list(sources)
+    scraper_logger.info(f"Found {len(sources)} static sources to scrape.")
+
+    try:
+        saved = scrape_sources(sources)
+    except Exception as e:
+        scraper_logger.error(f"Error scraping batch of {len(sources)} sources: {e}", exc_info=True)
+        return "Scraping failed."
+
+    enqueue_stage(run_cleaning_task, saved, scraper_logger)
+    return f"Scraped {len(sources)} static sources successfully. Saved {len(saved)} opportunities."
+
 
-    for source in sources:
-        try:
-            scraper_logger.info(f"Scraping source: {source.base_url}")
-            scrape_google_source(source)
-        except Exception as e:
-            scraper_logger.error(f"Error scraping {source.base_url}: {e}", exc_info=True)
+@shared_task
+def run_recrawl_task():
+    """Incrementally re-crawl already scraped sources; unchanged pages are skipped before RawOpportunity."""
+    if extraction_backlog_high():
+        scraper_logger.warning(
+            "Extraction backlog is high. Skipping re-crawl to prioritize processing."
+        )
+        return "Skipped re-crawl due to high extraction backlog."
+    sources = list(sources_due_for_recrawl(limit=Max_recrawl_sources_per_run))
+    if not sources:
+        scraper_logger.info("No sources due for re-crawl.")
+        return "No sources to re-crawl."
+
+    scraper_logger.info(f"Re-crawling {len(sources)} sources.")
+    try:
+        saved = scrape_sources(sources)
+    except Exception as e:
+        scraper_logger.error(f"Error re-crawling batch of {len(sources)} sources: {e}", exc_info=True)
+        return "Re-crawl failed."
 
-    return f"Scraped {sources.count()} static sources successfully."
+    enqueue_stage(run_cleaning_task, saved, scraper_logger)
+    return f"Re-crawled {len(sources)} sources. Saved {len(saved)} new or changed opportunities."
 
 
 @shared_task
@@ -74,7 +113,8 @@ def collect_links_via_google_api_task():
 
     results = google_search(query, num_results=10)
     google_logger.info(f"Collected {len(results)}")
-    save_to_registry(results, query)
+    added = save_to_registry(results, query)
+    enqueue_stage(run_scraper_task, added, google_logger)
 
     google_logger.info(
         f"Used query '{query}' → collected {len(results)} links."
@@ -84,7 +124,6 @@ def collect_links_via_google_api_task():
 
 @shared_task
 def refresh_google_queries_task():
-    client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
     now_utc = datetime.now(timezone.utc)
     current_date = now_utc.strftime("%Y-%m-%d")
     current_year = now_utc.year
@@ -134,13 +173,16 @@ def refresh_google_queries_task():
             ]
         """
 
-    response = client.chat.completions.create(
-        model="gpt-5-mini",
-        messages=[{"role": "user", "content": prompt}],
+    # short TTL: only retries of the same run should reuse the generated queries
+    content = cached_chat_completion(
+        QUERY_PROMPT_VERSION,
+        "gpt-5-mini",
+        [{"role": "user", "content": prompt}],
+        validate=lambda c: re.search(r"\[.*\]", c, re.DOTALL) is not None,
+        ttl=timedelta(hours=1),
     )
     try:
-        message = response.choices[0].message
-        content = message.content.strip()
+        content = content.strip()
         match = re.search(r"\[.*\]", content, re.DOTALL)
         if not match:
             google_logger.error("No JSON array found in GPT response")
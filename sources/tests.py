@@ -0,0 +1,34 @@
+from django.test import SimpleTestCase
+from core.utils import canonicalize_url
+
+
+class CanonicalizeUrlTests(SimpleTestCase):
+    def test_variants_of_one_page_share_a_key(self):
+        variants = [
+            "https://example.org/calls/green-grant",
+            "http://example.org/calls/green-grant",
+            "https://www.example.org/calls/green-grant/",
+            "https://EXAMPLE.org:443/calls/green-grant#apply",
+            "http://example.org:80/calls/green-grant",
+            "https://example.org/calls/green-grant?utm_source=newsletter&utm_medium=email&fbclid=abc",
+            "  https://example.org/calls/green-grant?ref=home&mc_cid=1  ",
+        ]
+        self.assertEqual({canonicalize_url(url) for url in variants}, {"https://example.org/calls/green-grant"})
+
+    def test_meaningful_query_is_kept_and_sorted(self):
+        self.assertEqual(
+            canonicalize_url("https://example.org/calls?page=2&lang=en&utm_campaign=x"),
+            "https://example.org/calls?lang=en&page=2",
+        )
+        self.assertEqual(canonicalize_url("https://example.org/?q="), "https://example.org?q=")
+
+    def test_path_case_and_other_ports_matter(self):
+        self.assertNotEqual(canonicalize_url("https://example.org/Calls"), canonicalize_url("https://example.org/calls"))
+        self.assertEqual(canonicalize_url("https://example.org:8443/calls"), "https://example.org:8443/calls")
+
+    def test_subdomains_other_than_www_are_kept(self):
+        self.assertEqual(canonicalize_url("https://grants.example.org/"), "https://grants.example.org")
+
+    def test_values_without_a_host_are_returned_unchanged(self):
+        self.assertEqual(canonicalize_url("/relative/path"), "/relative/path")
+        self.assertIsNone(canonicalize_url(None))